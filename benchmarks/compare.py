@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files
+
+    python benchmarks/compare.py baseline.json results.json --threshold 1.2
+
+Prints the median time of every benchmark in both runs and flags those
+that got slower by more than the threshold ratio. Exits with status 1
+when anything regressed, so it can gate a CI job.
+"""
+
+import sys
+import json
+import argparse
+from typing import Dict, Iterator, Tuple
+
+def timings(results: Dict) -> Iterator[Tuple[str, float]]:
+    """Yield (benchmark name, median ms) for every timed benchmark."""
+    for scale, groups in results.get('scales', {}).items():
+        for group in ('database', 'reports', 'endpoints'):
+            for name, result in groups.get(group, {}).items():
+                variants = result.items() if 'cold' in result else [('', result)]
+                for variant, stats in variants:
+                    if 'median_ms' in stats:
+                        label = f'{scale}/{group}/{name}' + (f' [{variant}]' if variant else '')
+                        yield label, stats['median_ms']
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark runs')
+    parser.add_argument('baseline', help='Baseline results JSON')
+    parser.add_argument('current', help='New results JSON')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Slowdown ratio reported as a regression')
+    parser.add_argument('--min-ms', type=float, default=1.0,
+                        help='Ignore benchmarks faster than this in both runs')
+    args = parser.parse_args()
+    
+    with open(args.baseline) as f:
+        baseline = dict(timings(json.load(f)))
+    with open(args.current) as f:
+        current = dict(timings(json.load(f)))
+    
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        before, after = baseline[name], current[name]
+        if before < args.min_ms and after < args.min_ms:
+            continue
+        ratio = after / before if before else float('inf')
+        marker = ''
+        if ratio > args.threshold:
+            marker = '  REGRESSION'
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            marker = '  faster'
+        print(f"{name:70} {before:10.2f} {after:10.2f} {ratio:6.2f}x{marker}")
+    
+    for name in sorted(set(current) - set(baseline)):
+        print(f"{name:70} {'-':>10} {current[name]:10.2f}    new")
+    
+    print(f"\n{regressions} regression(s) above {args.threshold:.2f}x")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Query plan check for ActivityDatabase
+
+    python benchmarks/plans.py --days 14
+
+Fills a scratch database with synthetic history, calls every
+ActivityDatabase.get_* method, and runs EXPLAIN QUERY PLAN on each SQL
+statement it executed. Any full scan of a table (a SCAN step on a table
+rather than a subquery, view or CTE) is reported and the script exits
+with status 1, so an index change that pushes a query back to reading
+every row fails a CI job.
+"""
+
+import os
+import re
+import sys
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCHMARKS_DIR.parent / 'src'
+
+SCAN_STEP = re.compile(r'^SCAN (\S+)')
+# Steps naming subqueries and CTEs, whose later SCAN steps read temporary results
+SUBQUERY_STEP = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\S+)')
+
+def full_scans(conn, sql: str) -> List[str]:
+    """Plan steps of ``sql`` that scan a whole table.
+    
+    Tables appear under their alias in the plan, so a SCAN step counts
+    unless it reads a subquery, a CTE or a constant row.
+    """
+    plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+    subqueries = {match.group(1) for match in map(SUBQUERY_STEP.match, plan) if match}
+    scans = []
+    for detail in plan:
+        match = SCAN_STEP.match(detail)
+        if match and not match.group(1).startswith('(') and match.group(1) not in subqueries | {'CONSTANT'}:
+            scans.append(detail)
+    return scans
+
+def check_plans(db, calls: Dict[str, tuple]) -> Dict[str, List[str]]:
+    """Full scans per get_* method, keyed by method name.
+    
+    Every connection the pool opens from here on records the statements
+    it runs, with parameters bound, so each query is explained exactly
+    as the method issued it.
+    """
+    statements = []
+    prepare = db.pool.on_connect
+    
+    def traced(conn):
+        if prepare:
+            prepare(conn)
+        conn.set_trace_callback(statements.append)
+    
+    db.pool.close()
+    db.pool.on_connect = traced
+    
+    results = {}
+    for name in sorted(dir(db)):
+        if not name.startswith('get_') or not callable(getattr(db, name)):
+            continue
+        del statements[:]
+        getattr(db, name)(*calls.get(name, ()))
+        queries = [sql for sql in statements if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+        
+        scans = []
+        with db.pool.reader() as conn:
+            conn.set_trace_callback(None)
+            for sql in queries:
+                scans.extend(full_scans(conn, sql))
+            conn.set_trace_callback(statements.append)
+        results[name] = scans
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail when an ActivityDatabase query scans a whole table')
+    parser.add_argument('--days', type=int, default=14, help='Days of synthetic history to generate')
+    parser.add_argument('--seed', type=int, default=42, help='Workload generator seed')
+    args = parser.parse_args()
+    
+    sys.path.insert(0, str(SRC_DIR))
+    sys.path.insert(0, str(BENCHMARKS_DIR))
+    
+    with tempfile.TemporaryDirectory(prefix='aw-plans-') as scratch:
+        # Keep the global database and config created on import away from real user data
+        os.environ['HOME'] = os.environ['USERPROFILE'] = scratch
+        
+        import database
+        from run import database_calls
+        from workload import populate
+        
+        db = database.ActivityDatabase(Path(scratch) / 'plans.db', archive_dir=Path(scratch) / 'archive')
+        populate(db, args.days, seed=args.seed)
+        
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        top_apps = db.get_top_apps(days=args.days, limit=1)
+        top_app = top_apps[0]['app_name'] if top_apps else 'code'
+        results = check_plans(db, database_calls(args.days, today, top_app))
+        db.close()
+    
+    failed = 0
+    for name, scans in results.items():
+        print(f"{'FULL SCAN' if scans else 'ok':<10} {name}")
+        for detail in scans:
+            print(f"           {detail}")
+        failed += bool(scans)
+    
+    if failed:
+        print(f"\n{failed} method(s) scan a whole table", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Local Activity Watcher
+
+Generates a synthetic history at each requested scale and times every
+ActivityDatabase.get_* query, every ReportGenerator.generate_* report,
+ingest throughput and the dashboard's GET endpoints through the Flask
+test client. Results are written as JSON; compare two runs with
+compare.py.
+
+    python benchmarks/run.py --scale day --scale year -o results.json
+
+Each scale runs in its own process with HOME pointed at a scratch
+directory, so the application's global database, config and caches
+belong to that scale's synthetic data and never touch real user data.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCHMARKS_DIR.parent / 'src'
+
+# Endpoints that never finish or that change state
+SKIPPED_ENDPOINTS = {'/api/stream', '/static/<path:filename>'}
+
+def measure(fn: Callable, repeat: int) -> Dict:
+    """Time ``fn``: one cold run, then ``repeat`` warm runs, in milliseconds."""
+    try:
+        start = time.perf_counter()
+        fn()
+        first = (time.perf_counter() - start) * 1000
+        
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+    
+    timings.sort()
+    return {
+        'first_ms': round(first, 3),
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'max_ms': round(timings[-1], 3),
+        'runs': repeat
+    }
+
+def database_calls(days: int, today: datetime, top_app: str) -> Dict[str, tuple]:
+    """Arguments for each ActivityDatabase.get_* method; unlisted ones take none."""
+    start = today - timedelta(days=days)
+    return {
+        'get_app_stats': (days,),
+        'get_daily_stats': (today.strftime('%Y-%m-%d'),),
+        'get_hourly_breakdown': (today.strftime('%Y-%m-%d'),),
+        'get_range_breakdown': (start, today + timedelta(days=1)),
+        'get_top_apps': (days,),
+        'get_window_titles': (top_app, days),
+        'get_usage_patterns': (days,),
+        'get_export_page': (start.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')),
+        'get_enhanced_stats': (days,),
+        'get_browser_activity': (days,),
+        'get_productivity_trends': (days,)
+    }
+
+def report_calls(days: int, today: datetime, top_app: str) -> Dict[str, tuple]:
+    """Arguments for each ReportGenerator.generate_* method."""
+    return {
+        'generate_daily_report': (today.strftime('%Y-%m-%d'),),
+        'generate_weekly_report': (today.strftime('%Y-%m-%d'),),
+        'generate_monthly_report': (today.strftime('%Y-%m'),),
+        'generate_app_report': (top_app, days)
+    }
+
+def endpoint_queries(days: int, today: datetime, top_app: str) -> Dict[str, Dict]:
+    """Path arguments and query strings for endpoints that need them."""
+    date_range = {
+        'start_date': (today - timedelta(days=days)).strftime('%Y-%m-%d'),
+        'end_date': (today + timedelta(days=1)).strftime('%Y-%m-%d')
+    }
+    return {
+        '/api/apps/<app_name>/windows': {'path': {'app_name': top_app}, 'query': {'days': days}},
+        '/api/stats/range': {'query': date_range},
+        '/api/export': {'query': date_range},
+        '/api/apps/top': {'query': {'days': days}},
+        '/api/enhanced/stats': {'query': {'days': days}},
+        '/api/enhanced/browser-activity': {'query': {'days': days}},
+        '/api/enhanced/productivity-trends': {'query': {'days': days}}
+    }
+
+def bench_database(db, days: int, repeat: int, today: datetime, top_app: str) -> Dict:
+    """Time every ActivityDatabase.get_* method."""
+    calls = database_calls(days, today, top_app)
+    results = {}
+    for name in sorted(dir(db)):
+        if name.startswith('get_') and callable(getattr(db, name)):
+            method = getattr(db, name)
+            args = calls.get(name, ())
+            results[name] = measure(lambda: method(*args), repeat)
+    return results
+
+def bench_reports(generator, days: int, repeat: int, today: datetime, top_app: str) -> Dict:
+    """Time every ReportGenerator.generate_* method."""
+    calls = report_calls(days, today, top_app)
+    results = {}
+    for name in sorted(dir(generator)):
+        if name.startswith('generate_') and callable(getattr(generator, name)):
+            method = getattr(generator, name)
+            args = calls.get(name, ())
+            results[name] = measure(lambda: method(*args), repeat)
+    return results
+
+def bench_endpoints(app, response_cache, days: int, repeat: int, today: datetime, top_app: str) -> Dict:
+    """Time every GET endpoint, with the response cache cleared (cold) and primed (warm)."""
+    queries = endpoint_queries(days, today, top_app)
+    client = app.test_client()
+    results = {}
+    
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if 'GET' not in rule.methods or rule.rule in SKIPPED_ENDPOINTS:
+            continue
+        spec = queries.get(rule.rule, {})
+        path = rule.rule
+        for argument, value in spec.get('path', {}).items():
+            path = path.replace(f'<{argument}>', str(value))
+        query = spec.get('query')
+        
+        def request(path=path, query=query):
+            response = client.get(path, query_string=query)
+            # Read the whole body so streamed responses are timed in full
+            response.get_data()
+            if response.status_code >= 400:
+                raise RuntimeError(f'HTTP {response.status_code}')
+            response.close()
+        
+        def cold_request(request=request):
+            response_cache.invalidate()
+            request()
+        
+        results[rule.rule] = {
+            'cold': measure(cold_request, repeat),
+            'warm': measure(request, repeat)
+        }
+    return results
+
+def bench_ingest(database_module, workdir: Path, batches: int, batch_size: int) -> Dict:
+    """Measure write throughput of sample batches and session start/end pairs."""
+    db = database_module.ActivityDatabase(workdir / 'ingest.db', archive_dir=workdir / 'ingest-archive')
+    now = datetime.now()
+    sample = {
+        'app_name': 'code', 'window_title': 'main.py - Visual Studio Code', 'duration': 5,
+        'category': 'development', 'productivity_score': 0.9, 'activity_intensity': 0.6,
+        'is_idle': False, 'cpu_percent': 10.0, 'memory_percent': 40.0, 'idle_time': 1.0
+    }
+    
+    start = time.perf_counter()
+    for batch in range(batches):
+        rows = []
+        for index in range(batch_size):
+            row = dict(sample)
+            row['timestamp'] = now + timedelta(seconds=5 * (batch * batch_size + index))
+            rows.append(row)
+        db.record_enhanced_activities(rows)
+    sample_seconds = time.perf_counter() - start
+    
+    sessions = batches * 5
+    start = time.perf_counter()
+    for index in range(sessions):
+        begin = now + timedelta(seconds=30 * index)
+        session_id = db.start_session('code', 'main.py', begin)
+        db.end_session(session_id, begin + timedelta(seconds=25))
+    session_seconds = time.perf_counter() - start
+    db.close()
+    
+    return {
+        'samples': batches * batch_size,
+        'batch_size': batch_size,
+        'samples_per_second': round(batches * batch_size / sample_seconds, 1),
+        'batches_per_second': round(batches / sample_seconds, 1),
+        'sessions': sessions,
+        'sessions_per_second': round(sessions / session_seconds, 1)
+    }
+
+def run_scale(args) -> Dict:
+    """Generate one scale's data and run every benchmark on it (child process)."""
+    sys.path.insert(0, str(SRC_DIR))
+    sys.path.insert(0, str(BENCHMARKS_DIR))
+    # create_app() writes its templates relative to the working directory
+    os.chdir(os.environ['HOME'])
+    
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    
+    import database
+    from config import config
+    from reports import ReportGenerator
+    from response_cache import response_cache
+    from web_dashboard import create_app
+    from workload import SCALES, populate
+    
+    days = SCALES[args.child]
+    db = database.db
+    start = time.perf_counter()
+    counts = populate(db, days, seed=args.seed, sample_interval=args.sample_interval)
+    generate_seconds = time.perf_counter() - start
+    
+    if args.archive_after is not None:
+        counts['archived'] = db.archive_old_data(args.archive_after)
+    
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    top_apps = db.get_top_apps(days=days, limit=1)
+    top_app = top_apps[0]['app_name'] if top_apps else 'code'
+    # Query windows cover the whole history, capped at a month for the 'days' parameters
+    window = max(1, min(days, 30))
+    
+    return {
+        'scale': args.child,
+        'days': days,
+        'rows': counts,
+        'db_size_bytes': db_size(db, config.db_file),
+        'generate_seconds': round(generate_seconds, 3),
+        'database': bench_database(db, window, args.repeat, today, top_app),
+        'reports': bench_reports(ReportGenerator(), window, args.repeat, today, top_app),
+        'endpoints': bench_endpoints(create_app(), response_cache, window, args.repeat, today, top_app),
+        'ingest': bench_ingest(database, Path(os.environ['HOME']), args.ingest_batches, args.ingest_batch_size)
+    }
+
+def run_child(scale: str, args, workdir: Path) -> Dict:
+    """Run one scale in a fresh interpreter with HOME set to its own directory."""
+    home = workdir / scale
+    home.mkdir(parents=True, exist_ok=True)
+    result_file = home / 'result.json'
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    
+    command = [
+        sys.executable, str(Path(__file__).resolve()),
+        '--child', scale, '--result-file', str(result_file),
+        '--seed', str(args.seed), '--repeat', str(args.repeat),
+        '--sample-interval', str(args.sample_interval),
+        '--ingest-batches', str(args.ingest_batches),
+        '--ingest-batch-size', str(args.ingest_batch_size)
+    ]
+    if args.archive_after is not None:
+        command += ['--archive-after', str(args.archive_after)]
+    
+    subprocess.run(command, env=env, check=True)
+    return json.loads(result_file.read_text())
+
+def db_size(db, path: Path) -> int:
+    """Database file size after folding the WAL back into it."""
+    with db.pool.writer() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return path.stat().st_size
+
+def sqlite_version() -> str:
+    import sqlite3
+    return sqlite3.sqlite_version
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Activity Watcher benchmarks')
+    parser.add_argument('--scale', action='append', choices=['day', 'year', '5years'],
+                        help='Data scale to benchmark (repeatable, default: day)')
+    parser.add_argument('--seed', type=int, default=42, help='Workload generator seed')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark after one cold run')
+    parser.add_argument('--sample-interval', type=int, default=5, help='Seconds between generated samples')
+    parser.add_argument('--archive-after', type=int,
+                        help='Archive closed days older than this many days before timing (needs pyarrow)')
+    parser.add_argument('--ingest-batches', type=int, default=200, help='Sample batches written in the ingest benchmark')
+    parser.add_argument('--ingest-batch-size', type=int, default=50, help='Samples per ingest batch')
+    parser.add_argument('--workdir', help='Directory for generated databases (default: a temporary directory)')
+    parser.add_argument('-o', '--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        result = run_scale(args)
+        Path(args.result_file).write_text(json.dumps(result, indent=2, default=str))
+        return
+    
+    scales = args.scale or ['day']
+    with tempfile.TemporaryDirectory(prefix='aw-bench-') as scratch:
+        workdir = Path(args.workdir) if args.workdir else Path(scratch)
+        results = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlite': sqlite_version(),
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'sample_interval': args.sample_interval
+            },
+            'scales': {}
+        }
+        for scale in scales:
+            print(f"Running {scale} benchmarks...", file=sys.stderr)
+            results['scales'][scale] = run_child(scale, args, workdir)
+    
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Synthetic activity workload
+
+Deterministically generates realistic activity history for benchmarking:
+workdays with a morning start, lunch break and evening end, lighter
+weekends, Zipf-distributed apps, window titles and URLs, log-normal
+session lengths, short switching gaps, longer away gaps and idle
+stretches inside long sessions. The same seed always produces the same
+history relative to the end time.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from categorizer import categorizer
+
+# Benchmark scales: name -> days of history
+SCALES = {
+    'day': 1,
+    'year': 365,
+    '5years': 5 * 365
+}
+
+PROJECTS = ['activity-watcher', 'billing-api', 'infra', 'website', 'ml-pipeline', 'notes']
+SOURCE_FILES = ['main', 'database', 'reports', 'utils', 'models', 'views', 'config', 'tests', 'cli', 'server']
+CHANNELS = ['general', 'dev', 'random', 'incidents', 'design', 'standup', 'releases']
+PAGES = [
+    ('Pull requests · {project}', 'https://github.com/example/{project}/pulls'),
+    ('Issue #{n} · {project}', 'https://github.com/example/{project}/issues/{n}'),
+    ('python - question {n} - Stack Overflow', 'https://stackoverflow.com/questions/{n}'),
+    ('sqlite3 — Python documentation', 'https://docs.python.org/3/library/sqlite3.html'),
+    ('Video {n} - YouTube', 'https://www.youtube.com/watch?v={n}'),
+    ('Inbox ({n}) - Mail', 'https://mail.example.com/inbox'),
+    ('News - article {n}', 'https://news.example.com/article/{n}'),
+    ('Dashboard - Grafana', 'https://grafana.example.com/d/{n}')
+]
+
+# app -> (workday weight, weekend weight, title kind)
+APPS = {
+    'code': (30, 4, 'editor'),
+    'firefox': (18, 20, 'browser'),
+    'chrome': (10, 10, 'browser'),
+    'terminal': (14, 2, 'terminal'),
+    'slack': (12, 2, 'chat'),
+    'zoom': (4, 0.5, 'meeting'),
+    'obsidian': (4, 3, 'notes'),
+    'excel': (3, 0.5, 'sheet'),
+    'spotify': (2, 8, 'music'),
+    'steam': (0.2, 6, 'game')
+}
+
+def _zipf_index(rng: random.Random, n: int, skew: float = 1.1) -> int:
+    """Index in [0, n) where low indexes are much more likely."""
+    return min(int(rng.paretovariate(skew)) - 1, n - 1)
+
+class WorkloadGenerator:
+    """Generate sessions, legacy activities and enhanced samples."""
+    
+    def __init__(self, seed: int = 42, sample_interval: int = 5):
+        self.seed = seed
+        self.sample_interval = sample_interval
+    
+    def _title(self, rng: random.Random, kind: str) -> str:
+        """A window title for an app of the given kind."""
+        project = PROJECTS[_zipf_index(rng, len(PROJECTS))]
+        n = _zipf_index(rng, 5000, 0.6)
+        if kind == 'editor':
+            source = SOURCE_FILES[_zipf_index(rng, len(SOURCE_FILES))]
+            return f'/home/user/projects/{project}/src/{source}.py - Visual Studio Code'
+        if kind == 'browser':
+            title, url = PAGES[_zipf_index(rng, len(PAGES), 0.8)]
+            return f'{title} - {url}'.format(project=project, n=n)
+        if kind == 'terminal':
+            return f'user@workstation: ~/projects/{project}'
+        if kind == 'chat':
+            return f'#{CHANNELS[_zipf_index(rng, len(CHANNELS))]} - Slack'
+        if kind == 'meeting':
+            return 'Zoom Meeting'
+        if kind == 'notes':
+            return f'{project} notes - Obsidian'
+        if kind == 'sheet':
+            return f'Budget {2020 + n % 6}.xlsx - Excel'
+        if kind == 'music':
+            return f'Artist {n % 300} - Track {n}'
+        return f'Game {n % 40}'
+    
+    def _day_window(self, rng: random.Random, day: datetime) -> List[Tuple[datetime, datetime]]:
+        """Active stretches of a day, or none for a day off."""
+        if day.weekday() >= 5:
+            if rng.random() > 0.4:
+                return []
+            start = day + timedelta(hours=rng.uniform(10, 14))
+            return [(start, start + timedelta(hours=rng.uniform(0.5, 4)))]
+        
+        if rng.random() < 0.04:
+            return []
+        start = day + timedelta(hours=rng.gauss(9, 0.5))
+        lunch = day + timedelta(hours=rng.gauss(12.25, 0.25))
+        back = lunch + timedelta(minutes=rng.uniform(30, 70))
+        end = day + timedelta(hours=rng.gauss(17.5, 0.75))
+        stretches = [(start, lunch), (back, end)]
+        if rng.random() < 0.25:
+            evening = day + timedelta(hours=rng.uniform(20, 22))
+            stretches.append((evening, evening + timedelta(minutes=rng.uniform(15, 90))))
+        return stretches
+    
+    def days(self, days: int, end: Optional[datetime] = None) -> Iterator[Dict[str, List[Tuple]]]:
+        """Yield one day of rows at a time, oldest first.
+        
+        Each day maps table name to rows in the column order of
+        ``COLUMNS``. Nothing is generated after ``end`` (default: the
+        start of the current hour).
+        """
+        end = end or datetime.now().replace(minute=0, second=0, microsecond=0)
+        first_day = (end - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        apps = list(APPS)
+        
+        for offset in range(days + 1):
+            day = first_day + timedelta(days=offset)
+            # Seed per day so any day is reproducible on its own
+            rng = random.Random(f'{self.seed}:{day:%Y-%m-%d}')
+            weekend = day.weekday() >= 5
+            weights = [APPS[app][1 if weekend else 0] for app in apps]
+            rows = {'app_sessions': [], 'activities': [], 'enhanced_activities': []}
+            
+            for stretch_start, stretch_end in self._day_window(rng, day):
+                stretch_end = min(stretch_end, end)
+                t = stretch_start
+                while t < stretch_end:
+                    app = rng.choices(apps, weights)[0]
+                    title = self._title(rng, APPS[app][2])
+                    # Median ~3 minutes, long tail up to two hours
+                    length = min(rng.lognormvariate(math.log(180), 1.2), 7200)
+                    session_end = min(t + timedelta(seconds=length), stretch_end)
+                    self._session(rng, rows, app, title, t, session_end)
+                    
+                    if rng.random() < 0.05:
+                        gap = rng.uniform(120, 1800)
+                    else:
+                        gap = rng.uniform(0, 3)
+                    t = session_end + timedelta(seconds=gap)
+            yield rows
+    
+    def _session(self, rng: random.Random, rows: Dict[str, List[Tuple]], app: str, title: str,
+                 start: datetime, end: datetime):
+        """Append one session, its legacy activity row and its samples.
+        
+        Samples are drawn per tick and merged into one row per run of
+        identical ticks, an active run and possibly an idle one, like the
+        tracker writes them.
+        """
+        duration = int((end - start).total_seconds())
+        rows['app_sessions'].append((app, title, start, end, duration))
+        rows['activities'].append((start, app, title, duration))
+        
+        info = categorizer.classify(app, title)
+        # Long sessions sometimes end with the user away from the keyboard
+        idle_from = end
+        if duration > 600 and rng.random() < 0.2:
+            idle_from = start + timedelta(seconds=duration * rng.uniform(0.5, 0.9))
+        
+        intensity = rng.uniform(0.2, 0.9)
+        runs = {}
+        t = start
+        step = timedelta(seconds=self.sample_interval)
+        while t < end:
+            is_idle = t >= idle_from
+            idle_time = (t - idle_from).total_seconds() if is_idle else rng.uniform(0, 5)
+            readings = (
+                0.0 if is_idle else min(1.0, max(0.0, rng.gauss(intensity, 0.15))),
+                max(0.0, rng.gauss(12, 6)),
+                max(0.0, rng.gauss(45, 5)),
+                idle_time
+            )
+            run = runs.setdefault(is_idle, [t, 0, [0.0] * len(readings)])
+            run[1] += 1
+            run[2] = [total + value for total, value in zip(run[2], readings)]
+            t += step
+        
+        for is_idle, (run_start, samples, totals) in runs.items():
+            # The active run lasts until the first idle tick
+            run_end = runs[True][0] if not is_idle and True in runs else end
+            intensity_avg, cpu, memory, idle_time = (total / samples for total in totals)
+            rows['enhanced_activities'].append((
+                run_start, app, title, int((run_end - run_start).total_seconds()), info.url, info.file_path,
+                info.category, info.productivity_score, intensity_avg, is_idle, cpu, memory, idle_time, samples
+            ))
+
+# Insert column order of the rows produced by WorkloadGenerator.days()
+COLUMNS = {
+    'app_sessions': ['app_name', 'window_title', 'start_time', 'end_time', 'duration'],
+    'activities': ['timestamp', 'app_name', 'window_title', 'duration'],
+    'enhanced_activities': [
+        'timestamp', 'app_name', 'window_title', 'duration', 'url', 'file_path',
+        'category', 'productivity_score', 'activity_intensity', 'is_idle',
+        'cpu_percent', 'memory_percent', 'idle_time', 'samples'
+    ]
+}
+
+def populate(db, days: int, seed: int = 42, sample_interval: int = 5,
+             end: Optional[datetime] = None) -> Dict[str, int]:
+    """Fill an ActivityDatabase with ``days`` of history and rebuild its rollups.
+    
+    Rows are bulk-inserted one day per transaction, bypassing the write
+    paths that maintain the rollups, which are rebuilt once at the end.
+    Returns the number of rows per table.
+    """
+    generator = WorkloadGenerator(seed, sample_interval)
+    counts = {table: 0 for table in COLUMNS}
+    
+    for rows in generator.days(days, end):
+        with db.pool.writer() as conn:
+            for table, columns in COLUMNS.items():
+                if not rows[table]:
+                    continue
+                db._insert_rows(conn, table, columns, rows[table])
+                counts[table] += len(rows[table])
+    
+    with db.pool.writer() as conn:
+        db._rebuild_rollups(conn)
+    return counts
\ No newline at end of file
@@ -12,11 +12,17 @@ import time
 import psutil
 import platform
 import logging
-from datetime import datetime
-from typing import Dict, Optional, Tuple, List
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple, List
+from array import array
 from threading import Thread, Event, Lock
 from abc import ABC, abstractmethod
 
+try:
+    from metrics import metrics
+except ImportError:
+    from .metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 class ActivityMonitor(ABC):
@@ -36,6 +42,10 @@ class ActivityMonitor(ABC):
     def get_keyboard_activity(self) -> bool:
         """Check if keyboard activity detected recently."""
         pass
+    
+    def begin_tick(self):
+        """Start a new sampling tick, dropping any memoized readings."""
+        pass
 
 class WindowsActivityMonitor(ActivityMonitor):
     """Windows-specific activity monitor."""
@@ -96,27 +106,83 @@ class WindowsActivityMonitor(ActivityMonitor):
         return self.get_idle_time() < 1.0
 
 class LinuxActivityMonitor(ActivityMonitor):
-    """Linux-specific activity monitor."""
+    """Linux-specific activity monitor.
     
-    def __init__(self):
+    Idle time comes from the MIT-SCREEN-SAVER extension's ``QueryInfo``
+    request over a persistent python-xlib connection, so no process is
+    spawned per sample. Readings are memoized until the next
+    ``begin_tick`` (or for at most ``memo_ttl`` seconds).
+    """
+    
+    def __init__(self, display_name: Optional[str] = None, memo_ttl: float = 1.0):
         self.available = False
+        self.display_name = display_name
+        self.memo_ttl = memo_ttl
+        self.disp = None
+        self._lock = Lock()
+        self._has_screensaver = None
+        self._idle_memo = None  # (monotonic time, idle seconds)
+        self._warned_no_idle_source = False
         try:
             from Xlib import display
             from Xlib.ext import record
             self.display = display
             self.record = record
-            self.disp = None
             self.available = True
         except ImportError:
             logger.warning("Linux activity monitoring not available")
     
+    def _get_display(self):
+        """Return the persistent display connection, opening it if needed."""
+        if self.disp is None:
+            self.disp = self.display.Display(self.display_name)
+            self._has_screensaver = self.disp.has_extension('MIT-SCREEN-SAVER')
+            if not self._has_screensaver:
+                logger.warning("MIT-SCREEN-SAVER extension not available, falling back to xprintidle")
+        return self.disp
+    
+    def _reset_display(self):
+        """Drop the display connection so the next call reconnects."""
+        if self.disp is not None:
+            try:
+                self.disp.close()
+            except Exception:
+                pass
+        self.disp = None
+        self._has_screensaver = None
+    
+    def begin_tick(self):
+        """Invalidate memoized readings at the start of a sampling tick."""
+        self._idle_memo = None
+    
     def get_idle_time(self) -> int:
         """Get idle time in seconds on Linux."""
         if not self.available:
             return 0
         
+        memo = self._idle_memo
+        if memo is not None and time.monotonic() - memo[0] < self.memo_ttl:
+            return memo[1]
+        
+        idle_time = self._query_idle_time()
+        self._idle_memo = (time.monotonic(), idle_time)
+        return idle_time
+    
+    def _query_idle_time(self) -> float:
+        """Ask the X server how long the user has been idle."""
+        with self._lock:
+            try:
+                d = self._get_display()
+                if self._has_screensaver:
+                    info = d.screen().root.screensaver_query_info()
+                    return info.idle / 1000.0
+            except Exception as e:
+                logger.error(f"Error getting idle time on Linux: {e}")
+                self._reset_display()
+                return 0
+        
+        # Servers without the extension: one xprintidle call per tick at most
         try:
-            # Try to get idle time from X11 screensaver extension
             import subprocess
             result = subprocess.run(['xprintidle'], capture_output=True, text=True)
             if result.returncode == 0:
@@ -124,31 +190,25 @@ class LinuxActivityMonitor(ActivityMonitor):
         except Exception:
             pass
         
-        # Fallback: check /proc/stat for rough estimate
-        try:
-            with open('/proc/stat', 'r') as f:
-                line = f.readline()
-                idle_time = int(line.split()[4])
-                return idle_time / 100.0  # Convert to seconds
-        except Exception as e:
-            logger.error(f"Error getting idle time on Linux: {e}")
-            return 0
+        if not self._warned_no_idle_source:
+            logger.warning("No idle time source available on this X server")
+            self._warned_no_idle_source = True
+        return 0
     
     def get_mouse_position(self) -> Tuple[int, int]:
         """Get current mouse position on Linux."""
         if not self.available:
             return (0, 0)
         
-        try:
-            if not self.disp:
-                self.disp = self.display.Display()
-            
-            root = self.disp.screen().root
-            pointer = root.query_pointer()
-            return (pointer.root_x, pointer.root_y)
-        except Exception as e:
-            logger.error(f"Error getting mouse position on Linux: {e}")
-            return (0, 0)
+        with self._lock:
+            try:
+                root = self._get_display().screen().root
+                pointer = root.query_pointer()
+                return (pointer.root_x, pointer.root_y)
+            except Exception as e:
+                logger.error(f"Error getting mouse position on Linux: {e}")
+                self._reset_display()
+                return (0, 0)
     
     def get_keyboard_activity(self) -> bool:
         """Check keyboard activity on Linux."""
@@ -197,6 +257,316 @@ class MacOSActivityMonitor(ActivityMonitor):
         """Check keyboard activity on macOS."""
         return self.get_idle_time() < 1.0
 
+class ProcessTable:
+    """Persistent process table keyed by pid.
+    
+    ``psutil.Process`` objects are kept across ticks so ``cpu_percent``
+    reports real deltas, and each ``refresh`` only inspects pids that
+    appeared or disappeared since the previous one. Parent links are
+    recorded at discovery, which lets the foreground app's process tree
+    be resolved from its window pid without scanning every process.
+    CPU counters are primed at discovery and again when a process joins
+    the foreground, so each reading covers the last tick only.
+    """
+    
+    def __init__(self):
+        self._procs = {}  # pid -> psutil.Process
+        self._names = {}  # pid -> lowercase process name
+        self._children = {}  # pid -> set of child pids
+        self._parents = {}  # pid -> parent pid
+        self._foreground = set()  # pids measured by the previous usage() call
+        self._lock = Lock()
+    
+    def refresh(self):
+        """Discover new pids and forget dead ones."""
+        with self._lock:
+            current = set(psutil.pids())
+            known = set(self._procs)
+            for pid in known - current:
+                self._forget(pid)
+            for pid in current - known:
+                self._discover(pid)
+    
+    def _discover(self, pid: int):
+        """Add a newly seen pid to the table."""
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                ppid = proc.ppid()
+                name = proc.name()
+            # The first call only sets the baseline for the next one
+            proc.cpu_percent(None)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return
+        
+        self._procs[pid] = proc
+        self._names[pid] = name.lower()
+        self._parents[pid] = ppid
+        self._children.setdefault(ppid, set()).add(pid)
+    
+    def _forget(self, pid: int):
+        """Drop a pid that has exited."""
+        self._procs.pop(pid, None)
+        self._names.pop(pid, None)
+        ppid = self._parents.pop(pid, None)
+        if ppid is not None and ppid in self._children:
+            self._children[ppid].discard(pid)
+            if not self._children[ppid]:
+                del self._children[ppid]
+        # The OS re-parents orphans outside this tree, and a reused pid must
+        # not inherit them
+        for child in self._children.pop(pid, ()):
+            self._parents.pop(child, None)
+        self._foreground.discard(pid)
+    
+    def tree(self, pid: int) -> List[int]:
+        """Get pid and all of its descendants."""
+        pids = []
+        stack = [pid]
+        while stack:
+            current = stack.pop()
+            if current in self._procs:
+                pids.append(current)
+            stack.extend(self._children.get(current, ()))
+        return pids
+    
+    def find_by_name(self, app_name: str) -> List[int]:
+        """Get pids whose process name contains app_name."""
+        needle = app_name.lower()
+        return [pid for pid, name in self._names.items() if needle in name]
+    
+    @metrics.timed('process_scan_seconds')
+    def usage(self, app_name: str, pid: Optional[int] = None) -> Dict:
+        """Get summed CPU and memory usage for an app's processes.
+        
+        Uses the process tree rooted at ``pid`` when it is known, falling
+        back to a name match for platforms that do not report a pid.
+        """
+        self.refresh()
+        
+        with self._lock:
+            pids = self.tree(pid) if pid in self._procs else self.find_by_name(app_name)
+            
+            total_cpu = 0.0
+            total_memory = 0.0
+            count = 0
+            measured = set()
+            for member in pids:
+                proc = self._procs[member]
+                try:
+                    if not proc.is_running():
+                        # Pid was reused since discovery
+                        self._forget(member)
+                        continue
+                    cpu = proc.cpu_percent(None)
+                    # Just focused: the reading spans the whole time since it was last
+                    # measured, so it only primes the counter for the next tick
+                    if member in self._foreground:
+                        total_cpu += cpu
+                    total_memory += proc.memory_percent()
+                    measured.add(member)
+                    count += 1
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+            self._foreground = measured
+        
+        return {
+            'cpu_percent': total_cpu,
+            'memory_percent': total_memory,
+            'process_count': count
+        }
+
+class ActivityRingBuffer:
+    """Fixed-capacity ring buffer of recent activity samples.
+    
+    Samples are stored column-wise in preallocated ``array`` buffers, so
+    appends are O(1) with no per-sample objects and memory stays constant
+    however long the tracker runs. Windowed queries walk back from the
+    newest sample only as far as the requested window.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._timestamps = array('d', [0.0]) * self.capacity
+        self._intensity = array('d', [0.0]) * self.capacity
+        self._idle = array('b', [0]) * self.capacity
+        self._idle_time = array('d', [0.0]) * self.capacity
+        self._cpu = array('d', [0.0]) * self.capacity
+        self._memory = array('d', [0.0]) * self.capacity
+        self._head = 0  # next slot to write
+        self._size = 0
+        self._lock = Lock()
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def append(self, timestamp: float, intensity: float, is_idle: bool, idle_time: float,
+               cpu_percent: float, memory_percent: float):
+        """Add a sample, overwriting the oldest one when full."""
+        with self._lock:
+            i = self._head
+            self._timestamps[i] = timestamp
+            self._intensity[i] = intensity or 0.0
+            self._idle[i] = 1 if is_idle else 0
+            self._idle_time[i] = idle_time or 0.0
+            self._cpu[i] = cpu_percent or 0.0
+            self._memory[i] = memory_percent or 0.0
+            self._head = (i + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+    
+    def clear(self):
+        """Drop all samples."""
+        with self._lock:
+            self._head = 0
+            self._size = 0
+    
+    def latest(self) -> Optional[Dict]:
+        """Get the newest sample, or None when empty."""
+        with self._lock:
+            if not self._size:
+                return None
+            i = (self._head - 1) % self.capacity
+            return {
+                'timestamp': self._timestamps[i],
+                'intensity': self._intensity[i],
+                'is_idle': bool(self._idle[i]),
+                'idle_time': self._idle_time[i],
+                'cpu_percent': self._cpu[i],
+                'memory_percent': self._memory[i]
+            }
+    
+    def _window_indices(self, seconds: float, now: Optional[float] = None) -> List[int]:
+        """Slots of samples newer than ``now - seconds``, newest first."""
+        cutoff = (now if now is not None else time.time()) - seconds
+        indices = []
+        i = self._head
+        for _ in range(self._size):
+            i = (i - 1) % self.capacity
+            if self._timestamps[i] < cutoff:
+                break
+            indices.append(i)
+        return indices
+    
+    def mean_intensity(self, seconds: float) -> float:
+        """Mean activity intensity over the last ``seconds``."""
+        with self._lock:
+            indices = self._window_indices(seconds)
+            return sum(self._intensity[i] for i in indices) / len(indices) if indices else 0.0
+    
+    def idle_fraction(self, seconds: float) -> float:
+        """Fraction of samples over the last ``seconds`` taken while idle."""
+        with self._lock:
+            indices = self._window_indices(seconds)
+            return sum(self._idle[i] for i in indices) / len(indices) if indices else 0.0
+    
+    def summary(self, seconds: float) -> Dict:
+        """Aggregate intensity, idle and resource usage over the last ``seconds``."""
+        with self._lock:
+            indices = self._window_indices(seconds)
+            count = len(indices)
+            if not count:
+                return {'samples': 0, 'mean_intensity': 0.0, 'idle_fraction': 0.0,
+                        'mean_cpu': 0.0, 'mean_memory': 0.0}
+            return {
+                'samples': count,
+                'mean_intensity': sum(self._intensity[i] for i in indices) / count,
+                'idle_fraction': sum(self._idle[i] for i in indices) / count,
+                'mean_cpu': sum(self._cpu[i] for i in indices) / count,
+                'mean_memory': sum(self._memory[i] for i in indices) / count
+            }
+
+class TickSnapshot:
+    """Everything one tracker tick reads from the OS, captured exactly once.
+    
+    Built by ``EnhancedActivityTracker.take_snapshot`` at the start of a
+    tick and passed to every consumer, so a tick costs one window lookup,
+    one idle query, one pointer query and one process sample, and the
+    session row and enhanced row share the same timestamp.
+    """
+    
+    __slots__ = ('timestamp', 'window', 'pid', 'idle_time', 'mouse_position', 'system_usage')
+    
+    def __init__(self, timestamp: datetime, window: Optional[Tuple[str, str]], pid: Optional[int],
+                 idle_time: float, mouse_position: Tuple[int, int], system_usage: Dict):
+        self.timestamp = timestamp
+        self.window = window
+        self.pid = pid
+        self.idle_time = idle_time
+        self.mouse_position = mouse_position
+        self.system_usage = system_usage
+    
+    @property
+    def app_name(self) -> Optional[str]:
+        return self.window[0] if self.window else None
+    
+    @property
+    def window_title(self) -> Optional[str]:
+        return self.window[1] if self.window else None
+
+class SampleMerger:
+    """Merge consecutive identical samples into one row per run.
+    
+    A sample whose app, title, URL, file, category and idle state match
+    the open run extends it instead of becoming a row of its own. The
+    run's duration reaches up to the tick that ends it, ``samples``
+    counts the ticks it covers and the readings in ``AVERAGED_FIELDS``
+    are averaged over them. A run is handed to ``emit`` when a different
+    sample arrives, when no tick came for ``max_gap`` seconds, when it
+    has lasted ``max_duration`` seconds (bounding what a crash loses) or
+    on ``flush()``.
+    """
+    
+    KEY_FIELDS = ('app_name', 'window_title', 'url', 'file_path', 'category', 'is_idle')
+    AVERAGED_FIELDS = ('activity_intensity', 'cpu_percent', 'memory_percent', 'idle_time')
+    
+    def __init__(self, emit: Callable[[Dict], None], max_gap: float, max_duration: float):
+        self.emit = emit
+        self.max_gap = max_gap
+        self.max_duration = max_duration
+        self._lock = Lock()
+        self._run = None
+        self._sums = {}
+        self._last_tick = None
+        self._last_duration = 0.0
+    
+    def add(self, sample: Dict, duration: float):
+        """Add one tick's sample, which stands for ``duration`` seconds if it ends a run."""
+        timestamp = sample['timestamp']
+        with self._lock:
+            run = self._run
+            if run is not None:
+                if (timestamp - self._last_tick).total_seconds() > self.max_gap:
+                    self._close(self._last_tick + timedelta(seconds=self._last_duration))
+                elif (any(run[field] != sample[field] for field in self.KEY_FIELDS)
+                      or (timestamp - run['timestamp']).total_seconds() >= self.max_duration):
+                    self._close(timestamp)
+            
+            if self._run is None:
+                self._run = dict(sample, samples=1)
+                self._sums = {field: sample.get(field) or 0 for field in self.AVERAGED_FIELDS}
+            else:
+                self._run['samples'] += 1
+                for field in self.AVERAGED_FIELDS:
+                    self._sums[field] += sample.get(field) or 0
+            self._last_tick = timestamp
+            self._last_duration = duration
+    
+    def flush(self):
+        """Close the open run at the end of its last tick."""
+        with self._lock:
+            if self._run is not None:
+                self._close(self._last_tick + timedelta(seconds=self._last_duration))
+    
+    def _close(self, end: datetime):
+        """Emit the open run as lasting until ``end``."""
+        run = self._run
+        run['duration'] = round((end - run['timestamp']).total_seconds())
+        for field in self.AVERAGED_FIELDS:
+            run[field] = self._sums[field] / run['samples']
+        self._run = None
+        self.emit(run)
+
 class EnhancedActivityTracker:
     """Enhanced activity tracker with improved data gathering."""
     
@@ -207,16 +577,49 @@ class EnhancedActivityTracker:
         self.keyboard_events = 0
         self.activity_intensity = 0.0
         self.idle_threshold = 60  # seconds
-        self.tracking_data = []
-        self.data_lock = Lock()
+        self.process_table = ProcessTable()
         
         # Import database
         try:
             from database import db
+            from config import config
+            from ingest import WriteBehindBuffer
+            from categorizer import categorizer
             self.db = db
         except ImportError:
             from .database import db
+            from .config import config
+            from .ingest import WriteBehindBuffer
+            from .categorizer import categorizer
             self.db = db
+        
+        self.categorizer = categorizer
+        
+        # Keep the last few minutes of samples in memory for live queries
+        interval = max(1, config.get('tracking_interval', 5))
+        self.sample_interval = interval
+        self.recent_samples = ActivityRingBuffer(config.get('ring_buffer_minutes', 60) * 60 // interval)
+        
+        # Samples are committed in batches by a background flusher
+        self.ingest_buffer = WriteBehindBuffer(
+            self.db.record_enhanced_activities,
+            capacity=config.get('ingest_queue_size', 10000),
+            batch_size=config.get('ingest_batch_size', 50),
+            flush_interval=config.get('ingest_flush_interval', 30),
+            name='enhanced-ingest'
+        )
+        
+        # Identical consecutive samples become one row per run
+        self.sample_merger = SampleMerger(
+            self.ingest_buffer.put,
+            max_gap=2 * interval,
+            max_duration=config.get('sample_merge_max_seconds', 300)
+        )
+        
+        metrics.register_callback('ingest_queue_depth', self.ingest_buffer.depth,
+                                  help='Enhanced samples waiting to be written')
+        metrics.register_callback('ingest_dropped_total', lambda: self.ingest_buffer.dropped, kind='counter',
+                                  help='Enhanced samples dropped because the ingest buffer was full')
     
     def _get_platform_monitor(self) -> ActivityMonitor:
         """Get the appropriate activity monitor for the current platform."""
@@ -234,119 +637,48 @@ class EnhancedActivityTracker:
     
     def get_enhanced_window_info(self, app_name: str, window_title: str) -> Dict:
         """Get enhanced window information with additional context."""
-        enhanced_info = {
+        classification = self.categorizer.classify(app_name, window_title)
+        return {
             'app_name': app_name,
             'window_title': window_title,
-            'url': None,
-            'file_path': None,
-            'category': self._categorize_activity(app_name, window_title),
-            'productivity_score': self._calculate_productivity_score(app_name, window_title)
+            'url': classification.url,
+            'file_path': classification.file_path,
+            'category': classification.category,
+            'productivity_score': classification.productivity_score
         }
-        
-        # Extract URLs for browsers
-        if self._is_browser(app_name):
-            enhanced_info['url'] = self._extract_url_from_title(window_title)
-        
-        # Extract file paths for editors
-        if self._is_editor(app_name):
-            enhanced_info['file_path'] = self._extract_file_path(window_title)
-        
-        return enhanced_info
-    
-    def _is_browser(self, app_name: str) -> bool:
-        """Check if the application is a web browser."""
-        browsers = [
-            'chrome', 'firefox', 'safari', 'edge', 'opera', 'brave',
-            'chromium', 'vivaldi', 'chrome.exe', 'firefox.exe', 'msedge.exe'
-        ]
-        return any(browser in app_name.lower() for browser in browsers)
-    
-    def _is_editor(self, app_name: str) -> bool:
-        """Check if the application is a code editor or text editor."""
-        editors = [
-            'code', 'atom', 'sublime', 'notepad', 'vim', 'emacs',
-            'vscode', 'pycharm', 'intellij', 'eclipse', 'visualstudio'
-        ]
-        return any(editor in app_name.lower() for editor in editors)
-    
-    def _extract_url_from_title(self, window_title: str) -> Optional[str]:
-        """Extract URL from browser window title."""
-        # Simple heuristic - look for common URL patterns
-        import re
-        url_pattern = r'https?://[^\s\)]+|www\.[^\s\)]+'
-        matches = re.findall(url_pattern, window_title)
-        return matches[0] if matches else None
-    
-    def _extract_file_path(self, window_title: str) -> Optional[str]:
-        """Extract file path from editor window title."""
-        # Look for file path patterns
-        import re
-        # Match paths like /path/to/file.ext or C:\path\to\file.ext
-        path_patterns = [
-            r'[A-Za-z]:\\[^<>:"|?*\n]+',  # Windows paths
-            r'/[^<>:"|?*\n]+',             # Unix paths
-        ]
-        
-        for pattern in path_patterns:
-            matches = re.findall(pattern, window_title)
-            if matches:
-                return matches[0]
-        return None
-    
-    def _categorize_activity(self, app_name: str, window_title: str) -> str:
-        """Categorize the activity based on app and window title."""
-        app_lower = app_name.lower()
-        title_lower = window_title.lower()
-        
-        # Work/Development
-        if any(word in app_lower for word in ['code', 'ide', 'terminal', 'cmd', 'powershell']):
-            return 'development'
-        
-        # Communication
-        if any(word in app_lower for word in ['slack', 'teams', 'discord', 'zoom', 'skype']):
-            return 'communication'
-        
-        # Entertainment
-        if any(word in app_lower for word in ['spotify', 'netflix', 'youtube', 'steam', 'game']):
-            return 'entertainment'
-        
-        # Productivity
-        if any(word in app_lower for word in ['excel', 'word', 'powerpoint', 'notion', 'obsidian']):
-            return 'productivity'
-        
-        # Web browsing needs more context
-        if self._is_browser(app_name):
-            if any(word in title_lower for word in ['github', 'stackoverflow', 'documentation']):
-                return 'development'
-            elif any(word in title_lower for word in ['youtube', 'netflix', 'twitch']):
-                return 'entertainment'
-            else:
-                return 'web_browsing'
-        
-        return 'other'
     
-    def _calculate_productivity_score(self, app_name: str, window_title: str) -> float:
-        """Calculate a productivity score for the activity."""
-        category = self._categorize_activity(app_name, window_title)
+    @metrics.timed('tracker_snapshot_seconds')
+    def take_snapshot(self, window: Optional[Tuple[str, str]], pid: Optional[int] = None) -> TickSnapshot:
+        """Read every OS signal needed for one tick of the given window.
         
-        productivity_scores = {
-            'development': 0.9,
-            'productivity': 0.8,
-            'communication': 0.6,
-            'web_browsing': 0.4,
-            'entertainment': 0.1,
-            'other': 0.5
-        }
+        ``pid`` is the window's owning process, when the platform tracker
+        knows it.
+        """
+        monitor = self.activity_monitor
+        if monitor:
+            monitor.begin_tick()
         
-        return productivity_scores.get(category, 0.5)
+        return TickSnapshot(
+            timestamp=datetime.now(),
+            window=window,
+            pid=pid,
+            idle_time=monitor.get_idle_time() if monitor else 0,
+            mouse_position=monitor.get_mouse_position() if monitor else (0, 0),
+            system_usage=self.get_system_usage(window[0], pid) if window else {}
+        )
     
-    def get_activity_intensity(self) -> float:
+    def get_activity_intensity(self, snapshot: Optional[TickSnapshot] = None) -> float:
         """Calculate current activity intensity based on mouse/keyboard activity."""
         if not self.activity_monitor:
             return 0.0
         
         # Get current mouse position
-        current_pos = self.activity_monitor.get_mouse_position()
+        if snapshot is not None:
+            current_pos = snapshot.mouse_position
+            keyboard_active = snapshot.idle_time < 1.0
+        else:
+            current_pos = self.activity_monitor.get_mouse_position()
+            keyboard_active = self.activity_monitor.get_keyboard_activity()
         
         # Calculate mouse movement
         if self.last_mouse_pos != current_pos:
@@ -354,7 +686,7 @@ class EnhancedActivityTracker:
             self.last_mouse_pos = current_pos
         
         # Check keyboard activity
-        if self.activity_monitor.get_keyboard_activity():
+        if keyboard_active:
             self.keyboard_events += 1
         
         # Calculate intensity (normalized between 0 and 1)
@@ -367,68 +699,89 @@ class EnhancedActivityTracker:
         
         return intensity
     
-    def is_user_idle(self) -> bool:
+    def is_user_idle(self, snapshot: Optional[TickSnapshot] = None) -> bool:
         """Check if user is currently idle."""
         if not self.activity_monitor:
             return False
         
-        idle_time = self.activity_monitor.get_idle_time()
+        idle_time = snapshot.idle_time if snapshot is not None else self.activity_monitor.get_idle_time()
         return idle_time > self.idle_threshold
     
-    def get_system_usage(self, app_name: str) -> Dict:
+    def get_system_usage(self, app_name: str, pid: Optional[int] = None) -> Dict:
         """Get system resource usage for an application."""
         try:
-            # Find processes by name
-            processes = [p for p in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent'])
-                        if app_name.lower() in p.info['name'].lower()]
-            
-            if not processes:
-                return {'cpu_percent': 0, 'memory_percent': 0}
-            
-            # Sum up resources for all processes with this name
-            total_cpu = sum(p.info['cpu_percent'] or 0 for p in processes)
-            total_memory = sum(p.info['memory_percent'] or 0 for p in processes)
-            
-            return {
-                'cpu_percent': total_cpu,
-                'memory_percent': total_memory,
-                'process_count': len(processes)
-            }
+            return self.process_table.usage(app_name, pid)
         except Exception as e:
             logger.error(f"Error getting system usage: {e}")
             return {'cpu_percent': 0, 'memory_percent': 0}
     
-    def record_enhanced_activity(self, app_name: str, window_title: str, duration: int = 0):
-        """Record enhanced activity data."""
+    @metrics.timed('enhanced_sample_seconds')
+    def record_enhanced_activity(self, app_name: str, window_title: str, duration: Optional[float] = None,
+                                 snapshot: Optional[TickSnapshot] = None):
+        """Record enhanced activity data.
+        
+        ``snapshot`` carries this tick's OS readings; one is taken if omitted.
+        ``duration`` is how long the sample stands for when no tick follows
+        it, by default the tracking interval.
+        """
+        if snapshot is None:
+            snapshot = self.take_snapshot((app_name, window_title))
         enhanced_info = self.get_enhanced_window_info(app_name, window_title)
-        system_usage = self.get_system_usage(app_name)
+        system_usage = snapshot.system_usage
         
         activity_data = {
-            'timestamp': datetime.now(),
+            'timestamp': snapshot.timestamp,
             'app_name': app_name,
             'window_title': window_title,
-            'duration': duration,
+            'duration': 0,
             'url': enhanced_info.get('url'),
             'file_path': enhanced_info.get('file_path'),
             'category': enhanced_info.get('category'),
             'productivity_score': enhanced_info.get('productivity_score'),
-            'activity_intensity': self.get_activity_intensity(),
-            'is_idle': self.is_user_idle(),
+            'activity_intensity': self.get_activity_intensity(snapshot),
+            'is_idle': self.is_user_idle(snapshot),
             'cpu_percent': system_usage.get('cpu_percent', 0),
             'memory_percent': system_usage.get('memory_percent', 0),
-            'idle_time': self.activity_monitor.get_idle_time() if self.activity_monitor else 0
+            'idle_time': snapshot.idle_time
         }
         
-        with self.data_lock:
-            self.tracking_data.append(activity_data)
+        self.recent_samples.append(
+            snapshot.timestamp.timestamp(),
+            activity_data['activity_intensity'],
+            activity_data['is_idle'],
+            activity_data['idle_time'],
+            activity_data['cpu_percent'],
+            activity_data['memory_percent']
+        )
         
-        # Store in database (extend the existing database schema)
+        # Merged into the open run; finished runs are queued for the background flusher
+        self.sample_merger.add(activity_data, self.sample_interval if duration is None else duration)
+    
+    def flush(self):
+        """Close the open run and write all buffered samples to the database now."""
         try:
-            self.db.record_enhanced_activity(activity_data)
+            self.sample_merger.flush()
+            self.ingest_buffer.flush()
         except Exception as e:
-            logger.error(f"Error recording enhanced activity: {e}")
-            # Fallback to basic recording
-            self.db.record_activity(app_name, window_title, duration)
+            logger.error(f"Error flushing enhanced activity: {e}")
+    
+    def stop(self):
+        """Close the open run, flush buffered samples and stop the background flusher."""
+        self.sample_merger.flush()
+        self.ingest_buffer.stop()
+    
+    def get_recent_activity(self, seconds: float = 300) -> Dict:
+        """Get the latest sample and aggregates over the last ``seconds`` from memory."""
+        latest = self.recent_samples.latest()
+        summary = self.recent_samples.summary(seconds)
+        summary['intensity'] = latest['intensity'] if latest else 0.0
+        summary['is_idle'] = latest['is_idle'] if latest else False
+        summary['window_seconds'] = seconds
+        return summary
+    
+    def get_ingest_stats(self) -> Dict:
+        """Get write-behind queue depth and flush latency."""
+        return self.ingest_buffer.stats()
     
     def get_productivity_stats(self, days: int = 7) -> Dict:
         """Get productivity statistics."""
@@ -0,0 +1,299 @@
+"""
+Columnar activity archive
+
+Closed days of ``app_sessions`` and ``enhanced_activities`` are moved out
+of SQLite into zstd-compressed Parquet files with dictionary-encoded text
+columns, one file per day, grouped in monthly directories:
+
+    <root>/<table>/month=YYYY-MM/part-YYYY-MM-DD-<first id>.parquet
+
+The rollup tables keep covering archived rows, so only queries that scan
+raw rows read the archive. Requires pyarrow; without it nothing is
+archived and the archive reads as empty.
+"""
+
+import os
+import shutil
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    from timestamps import TimeValue, to_epoch_ms, from_epoch_ms
+except ImportError:
+    from .timestamps import TimeValue, to_epoch_ms, from_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+# Archived table -> (time column, [(column, kind)]). Days are taken from
+# the time column; kinds map to Arrow types in _arrow_type().
+ARCHIVE_TABLES = {
+    'app_sessions': ('start_time', [
+        ('id', 'int'), ('app_name', 'text'), ('window_title', 'text'),
+        ('start_time', 'time'), ('end_time', 'time'), ('duration', 'int')
+    ]),
+    'enhanced_activities': ('timestamp', [
+        ('id', 'int'), ('timestamp', 'time'), ('app_name', 'text'), ('window_title', 'text'),
+        ('duration', 'int'), ('url', 'text'), ('file_path', 'text'), ('category', 'text'),
+        ('productivity_score', 'real'), ('activity_intensity', 'real'), ('is_idle', 'bool'),
+        ('cpu_percent', 'real'), ('memory_percent', 'real'), ('idle_time', 'real'), ('samples', 'int')
+    ])
+}
+
+# Columns added after the first part files were written -> value for
+# files that lack them
+COLUMN_DEFAULTS = {
+    'samples': 1
+}
+
+def _arrow_type(kind: str):
+    """Arrow type for a column kind."""
+    return {
+        'int': pa.int64(),
+        'real': pa.float64(),
+        'bool': pa.bool_(),
+        'text': pa.string(),
+        'time': pa.timestamp('us')
+    }[kind]
+
+def _parse_time(value: Optional[TimeValue]) -> Optional[datetime]:
+    """Parse a SQLite timestamp (epoch ms) or ISO text, or pass a datetime through."""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, int):
+        return from_epoch_ms(value)
+    return datetime.fromisoformat(value)
+
+def _from_sqlite(value, kind: str):
+    """Convert a SQLite column value for Arrow."""
+    if value is None:
+        return None
+    if kind == 'time':
+        return _parse_time(value)
+    if kind == 'bool':
+        return bool(value)
+    if kind == 'int':
+        return int(value)
+    if kind == 'real':
+        return float(value)
+    return value
+
+def _to_sqlite(value, kind: str):
+    """Convert an Arrow value back to what SQLite would have returned."""
+    if value is None:
+        return None
+    if kind == 'time':
+        return to_epoch_ms(value)
+    if kind == 'bool':
+        return int(value)
+    return value
+
+class ActivityArchive:
+    """Day-partitioned Parquet store for closed activity data."""
+    
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.available = PYARROW_AVAILABLE
+        if not self.available and any(self._files(table) for table in ARCHIVE_TABLES):
+            logger.warning("Activity archive found but pyarrow is not installed; "
+                           "archived rows are left out of raw queries")
+    
+    def schema(self, table: str):
+        """Arrow schema of an archived table."""
+        _, columns = ARCHIVE_TABLES[table]
+        return pa.schema([pa.field(name, _arrow_type(kind)) for name, kind in columns])
+    
+    def _files(self, table: str, start: Optional[TimeValue] = None,
+               end: Optional[TimeValue] = None) -> List[Tuple[str, Path]]:
+        """(day, path) of every part file overlapping [start, end], in day order."""
+        table_dir = self.root / table
+        if not table_dir.is_dir():
+            return []
+        
+        first = _parse_time(start).strftime('%Y-%m-%d') if start is not None else None
+        last = _parse_time(end).strftime('%Y-%m-%d') if end is not None else None
+        files = []
+        for month_dir in table_dir.glob('month=*'):
+            month = month_dir.name[len('month='):]
+            if (first and month < first[:7]) or (last and month > last[:7]):
+                continue
+            for path in month_dir.glob('part-*.parquet'):
+                day = path.name[len('part-'):len('part-') + 10]
+                if (first and day < first) or (last and day > last):
+                    continue
+                files.append((day, path))
+        files.sort()
+        return files
+    
+    def has_data(self, table: str, start: Optional[TimeValue] = None) -> bool:
+        """Whether any archived day of ``table`` is on or after ``start``."""
+        return self.available and bool(self._files(table, start))
+    
+    def archived_ids(self, table: str, day: str) -> Set[int]:
+        """Ids already archived for a day."""
+        ids = set()
+        for _, path in self._files(table, day, day):
+            ids.update(pq.read_table(path, columns=['id']).column('id').to_pylist())
+        return ids
+    
+    def write_day(self, table: str, day: str, rows: List[Dict]) -> int:
+        """Write one day of rows (as read from SQLite) to a new part file.
+        
+        Rows whose id is already archived are skipped, so re-running after
+        an interrupted move does not duplicate them. Returns the number of
+        rows written.
+        """
+        time_column, columns = ARCHIVE_TABLES[table]
+        existing = self.archived_ids(table, day)
+        rows = [row for row in rows if row['id'] not in existing]
+        if not rows:
+            return 0
+        
+        rows.sort(key=lambda row: (_parse_time(row[time_column]), row['id']))
+        data = {name: [_from_sqlite(row[name], kind) for row in rows] for name, kind in columns}
+        arrow_table = pa.Table.from_pydict(data, schema=self.schema(table))
+        
+        month_dir = self.root / table / f'month={day[:7]}'
+        month_dir.mkdir(parents=True, exist_ok=True)
+        path = month_dir / f'part-{day}-{rows[0]["id"]}.parquet'
+        tmp_path = path.with_name(path.name + '.tmp')
+        pq.write_table(
+            arrow_table, tmp_path,
+            compression='zstd',
+            use_dictionary=[name for name, kind in columns if kind == 'text']
+        )
+        os.replace(tmp_path, path)
+        return len(rows)
+    
+    def _dataset(self, table: str, paths: Iterable[Path]):
+        return ds.dataset([str(path) for path in paths], schema=self.schema(table), format='parquet')
+    
+    def _time_filter(self, table: str, start: Optional[TimeValue], end: Optional[TimeValue],
+                     end_inclusive: bool = False):
+        """Expression selecting rows with start <= time < end (or <= end)."""
+        time_column, _ = ARCHIVE_TABLES[table]
+        field = ds.field(time_column)
+        expression = None
+        if start is not None:
+            expression = field >= pa.scalar(_parse_time(start), type=pa.timestamp('us'))
+        if end is not None:
+            bound = pa.scalar(_parse_time(end), type=pa.timestamp('us'))
+            condition = field <= bound if end_inclusive else field < bound
+            expression = condition if expression is None else expression & condition
+        return expression
+    
+    def _fill_defaults(self, arrow_table):
+        """Replace nulls read for columns missing from older files with COLUMN_DEFAULTS."""
+        for name, value in COLUMN_DEFAULTS.items():
+            index = arrow_table.schema.get_field_index(name)
+            if index >= 0 and arrow_table.column(index).null_count:
+                filled = pc.fill_null(arrow_table.column(index), value)
+                arrow_table = arrow_table.set_column(index, name, filled)
+        return arrow_table
+    
+    def _to_rows(self, table: str, arrow_table) -> List[Dict]:
+        kinds = dict(ARCHIVE_TABLES[table][1])
+        return [{name: _to_sqlite(value, kinds[name]) for name, value in row.items()}
+                for row in arrow_table.to_pylist()]
+    
+    def read_page(self, table: str, start: TimeValue, end: TimeValue,
+                  after: Optional[Tuple[str, int]] = None, limit: int = 1000,
+                  columns: Optional[List[str]] = None) -> List[Dict]:
+        """Up to ``limit`` rows with start <= time <= end, ordered by (time, id).
+        
+        ``after`` is a (time, id) key as returned by the database's export
+        pages. Day files are read in order and reading stops once a whole
+        day has filled the page.
+        """
+        if not self.available:
+            return []
+        time_column, _ = ARCHIVE_TABLES[table]
+        first = max(_parse_time(start), _parse_time(after[0])) if after else start
+        expression = self._time_filter(table, start, end, end_inclusive=True)
+        if after is not None:
+            after_time = pa.scalar(_parse_time(after[0]), type=pa.timestamp('us'))
+            field = ds.field(time_column)
+            expression &= (field > after_time) | ((field == after_time) & (ds.field('id') > after[1]))
+        
+        by_day = {}
+        for day, path in self._files(table, first, end):
+            by_day.setdefault(day, []).append(path)
+        
+        pieces = []
+        count = 0
+        for day in sorted(by_day):
+            piece = self._dataset(table, by_day[day]).to_table(columns=columns, filter=expression)
+            pieces.append(piece)
+            count += piece.num_rows
+            if count >= limit:
+                break
+        if not count:
+            return []
+        
+        result = pa.concat_tables(pieces).sort_by([(time_column, 'ascending'), ('id', 'ascending')])
+        return self._to_rows(table, self._fill_defaults(result.slice(0, limit)))
+    
+    def iter_rows(self, table: str, end: Optional[TimeValue] = None,
+                  batch_size: int = 10000) -> Iterator[List[Dict]]:
+        """Yield archived rows in batches, optionally only those before ``end``."""
+        if not self.available:
+            return
+        expression = self._time_filter(table, None, end)
+        for _, path in self._files(table, None, end):
+            arrow_table = self._fill_defaults(self._dataset(table, [path]).to_table(filter=expression))
+            for batch in arrow_table.to_batches(max_chunksize=batch_size):
+                yield self._to_rows(table, batch)
+    
+    def aggregate(self, table: str, keys: List[str], aggregations: List[Tuple[str, str]],
+                  start: Optional[TimeValue] = None, where: Optional[Dict] = None,
+                  not_null: Iterable[str] = (), weights: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """Group archived rows from ``start`` onwards by ``keys``.
+        
+        ``aggregations`` are (column, function) pairs such as
+        ('duration', 'sum'); results are named ``<column>_<function>``.
+        ``where`` holds column == value conditions and ``not_null``
+        columns that must be set. ``weights`` maps a column to another
+        column it is multiplied by before aggregating.
+        """
+        if not self.available:
+            return []
+        files = self._files(table, start)
+        if not files:
+            return []
+        
+        expression = self._time_filter(table, start, None)
+        for column, value in (where or {}).items():
+            condition = ds.field(column) == value
+            expression = condition if expression is None else expression & condition
+        for column in not_null:
+            condition = ds.field(column).is_valid()
+            expression = condition if expression is None else expression & condition
+        
+        weights = weights or {}
+        needed = list(dict.fromkeys(keys + [column for column, _ in aggregations] + list(weights.values())))
+        arrow_table = self._fill_defaults(self._dataset(table, [path for _, path in files]).to_table(
+            columns=needed, filter=expression
+        ))
+        if not arrow_table.num_rows:
+            return []
+        for column, weight in weights.items():
+            index = arrow_table.schema.get_field_index(column)
+            weighted = pc.multiply(arrow_table.column(column), arrow_table.column(weight))
+            arrow_table = arrow_table.set_column(index, column, weighted)
+        return arrow_table.group_by(keys).aggregate(aggregations).to_pylist()
+    
+    def clear(self, table: Optional[str] = None):
+        """Delete the archive of one table, or all of it."""
+        target = self.root / table if table else self.root
+        if target.exists():
+            shutil.rmtree(target)
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Live event broadcaster
+
+Fans tracker events (focus changes, session ticks, idle transitions,
+running totals) out to every connected Server-Sent Events client. Each
+event is serialized once and the same message is queued for every
+subscriber, so extra dashboard tabs cost one queue slot each.
+"""
+
+import json
+import logging
+from queue import Queue, Empty, Full
+from threading import Lock
+from typing import Dict, Iterable, Iterator, Optional
+
+try:
+    from metrics import metrics
+except ImportError:
+    from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def format_event(event: str, data: Dict) -> str:
+    """Serialize an event in the text/event-stream wire format."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class EventBroadcaster:
+    """Publish events to any number of bounded subscriber queues.
+    
+    Publishing never blocks: a subscriber that falls more than
+    ``max_pending`` events behind loses its oldest events.
+    """
+    
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._subscribers = set()
+        self._lock = Lock()
+        
+        self.published = 0
+        self.dropped = 0
+    
+    def subscribe(self) -> Queue:
+        """Register a new subscriber and return its message queue."""
+        queue = Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: Queue):
+        """Remove a subscriber."""
+        with self._lock:
+            self._subscribers.discard(queue)
+    
+    def has_subscribers(self) -> bool:
+        """Whether anyone is listening, so producers can skip expensive payloads."""
+        return bool(self._subscribers)
+    
+    def subscriber_count(self) -> int:
+        """Number of connected subscribers."""
+        with self._lock:
+            return len(self._subscribers)
+    
+    def publish(self, event: str, data: Dict):
+        """Queue an event for every subscriber."""
+        if not self._subscribers:
+            return
+        
+        message = format_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        
+        for queue in subscribers:
+            self._offer(queue, message)
+        self.published += 1
+    
+    def close_streams(self):
+        """End every open stream, e.g. before the web server shuts down."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for queue in subscribers:
+            self._offer(queue, None)
+    
+    def _offer(self, queue: Queue, message: Optional[str]):
+        """Queue a message without blocking, dropping the oldest one if full."""
+        while True:
+            try:
+                queue.put_nowait(message)
+                return
+            except Full:
+                # Drop the oldest event for slow consumers
+                try:
+                    queue.get_nowait()
+                    self.dropped += 1
+                except Empty:
+                    pass
+    
+    def stream(self, initial: Optional[Iterable[str]] = None, heartbeat: float = 15.0) -> Iterator[str]:
+        """Yield SSE messages for one client until it disconnects.
+        
+        ``initial`` messages are sent first so a new client starts from the
+        current state. A comment line is sent every ``heartbeat`` seconds
+        to keep proxies from closing the connection and to notice
+        disconnected clients.
+        """
+        queue = self.subscribe()
+        try:
+            for message in initial or ():
+                yield message
+            while True:
+                try:
+                    message = queue.get(timeout=heartbeat)
+                except Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(queue)
+
+# Global broadcaster instance
+broadcaster = EventBroadcaster()
+
+metrics.register_callback('stream_subscribers', broadcaster.subscriber_count,
+                          help='Connected live event stream clients')
+metrics.register_callback('stream_events_dropped_total', lambda: broadcaster.dropped, kind='counter',
+                          help='Live events dropped for slow stream clients')
\ No newline at end of file
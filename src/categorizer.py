@@ -0,0 +1,193 @@
+"""
+Activity categorizer
+
+Rule-driven classification of (app_name, window_title) pairs into a
+category, productivity score, URL and file path. Rules are compiled once
+into combined regular expressions and results are memoized, so a steady
+tracker pays a dictionary lookup per sample.
+
+Rules, scores and the browser/editor app lists can be overridden in
+config.json with the ``category_rules``, ``productivity_scores``,
+``browser_apps`` and ``editor_apps`` settings.
+"""
+
+import re
+import logging
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rules are checked in order; the first match wins. A rule matches when
+# any of its ``app`` keywords is a substring of the lowercased app name,
+# any of its ``title`` keywords is a substring of the lowercased window
+# title, and (with ``browser``) the app is a web browser. Omitted
+# conditions always match.
+DEFAULT_CATEGORY_RULES = [
+    {'category': 'development', 'app': ['code', 'ide', 'terminal', 'cmd', 'powershell']},
+    {'category': 'communication', 'app': ['slack', 'teams', 'discord', 'zoom', 'skype']},
+    {'category': 'entertainment', 'app': ['spotify', 'netflix', 'youtube', 'steam', 'game']},
+    {'category': 'productivity', 'app': ['excel', 'word', 'powerpoint', 'notion', 'obsidian']},
+    {'category': 'development', 'browser': True, 'title': ['github', 'stackoverflow', 'documentation']},
+    {'category': 'entertainment', 'browser': True, 'title': ['youtube', 'netflix', 'twitch']},
+    {'category': 'web_browsing', 'browser': True},
+]
+
+DEFAULT_PRODUCTIVITY_SCORES = {
+    'development': 0.9,
+    'productivity': 0.8,
+    'communication': 0.6,
+    'web_browsing': 0.4,
+    'entertainment': 0.1,
+    'other': 0.5
+}
+
+DEFAULT_BROWSER_APPS = [
+    'chrome', 'firefox', 'safari', 'edge', 'opera', 'brave',
+    'chromium', 'vivaldi', 'chrome.exe', 'firefox.exe', 'msedge.exe'
+]
+
+DEFAULT_EDITOR_APPS = [
+    'code', 'atom', 'sublime', 'notepad', 'vim', 'emacs',
+    'vscode', 'pycharm', 'intellij', 'eclipse', 'visualstudio'
+]
+
+URL_PATTERN = re.compile(r'https?://[^\s\)]+|www\.[^\s\)]+')
+
+# Match paths like C:\path\to\file.ext first, then /path/to/file.ext
+FILE_PATH_PATTERNS = [
+    re.compile(r'[A-Za-z]:\\[^<>:"|?*\n]+'),
+    re.compile(r'/[^<>:"|?*\n]+'),
+]
+
+Classification = namedtuple('Classification', [
+    'category', 'productivity_score', 'url', 'file_path', 'is_browser', 'is_editor'
+])
+
+_BROWSER = 'browser'
+_EDITOR = 'editor'
+
+def _keyword_matcher(keywords) -> Optional[re.Pattern]:
+    """Compile keywords into one regex that reports every (overlapping) occurrence."""
+    keywords = sorted({k.lower() for k in keywords if k}, key=len, reverse=True)
+    if not keywords:
+        return None
+    return re.compile('(?=(' + '|'.join(re.escape(k) for k in keywords) + '))')
+
+def _inherit_substring_tags(tags: Dict[str, set]) -> Dict[str, set]:
+    """Give each keyword the tags of every keyword it contains.
+    
+    The matcher reports only the longest keyword at each position, so a
+    keyword that is a prefix of a longer one (``note`` in ``notepad``)
+    would otherwise never contribute its tags there.
+    """
+    return {keyword: set().union(*(other_tags for other, other_tags in tags.items() if other in keyword))
+            for keyword in tags}
+
+class ActivityCategorizer:
+    """Classify activities in a single pass using precompiled rules."""
+    
+    def __init__(self, rules: Optional[List[Dict]] = None, scores: Optional[Dict[str, float]] = None,
+                 browsers: Optional[List[str]] = None, editors: Optional[List[str]] = None,
+                 cache_size: int = 4096):
+        self.rules = rules if rules is not None else DEFAULT_CATEGORY_RULES
+        self.scores = scores if scores is not None else DEFAULT_PRODUCTIVITY_SCORES
+        
+        # keyword -> tags it contributes (rule indexes, browser, editor)
+        app_tags = {}
+        title_tags = {}
+        for keyword in (browsers if browsers is not None else DEFAULT_BROWSER_APPS):
+            app_tags.setdefault(keyword.lower(), set()).add(_BROWSER)
+        for keyword in (editors if editors is not None else DEFAULT_EDITOR_APPS):
+            app_tags.setdefault(keyword.lower(), set()).add(_EDITOR)
+        for index, rule in enumerate(self.rules):
+            for keyword in rule.get('app', ()):
+                app_tags.setdefault(keyword.lower(), set()).add(index)
+            for keyword in rule.get('title', ()):
+                title_tags.setdefault(keyword.lower(), set()).add(index)
+        
+        self._app_tags = _inherit_substring_tags(app_tags)
+        self._title_tags = _inherit_substring_tags(title_tags)
+        self._app_matcher = _keyword_matcher(app_tags)
+        self._title_matcher = _keyword_matcher(title_tags)
+        self._needs_title = any(rule.get('title') for rule in self.rules)
+        
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+    
+    def _tags(self, matcher, tags: Dict, text: str) -> set:
+        """Collect the tags of every keyword occurring in text."""
+        found = set()
+        if matcher is not None and text:
+            for match in matcher.finditer(text.lower()):
+                found |= tags[match.group(1)]
+        return found
+    
+    def _classify(self, app_name: str, window_title: str) -> Classification:
+        """Classify one (app_name, window_title) pair."""
+        app_name = app_name or ''
+        window_title = window_title or ''
+        
+        app_hits = self._tags(self._app_matcher, self._app_tags, app_name)
+        is_browser = _BROWSER in app_hits
+        is_editor = _EDITOR in app_hits
+        title_hits = self._tags(self._title_matcher, self._title_tags, window_title) if self._needs_title else set()
+        
+        category = 'other'
+        for index, rule in enumerate(self.rules):
+            if rule.get('app') and index not in app_hits:
+                continue
+            if rule.get('browser') and not is_browser:
+                continue
+            if rule.get('title') and index not in title_hits:
+                continue
+            category = rule['category']
+            break
+        
+        url = None
+        if is_browser:
+            match = URL_PATTERN.search(window_title)
+            url = match.group(0) if match else None
+        
+        file_path = None
+        if is_editor:
+            for pattern in FILE_PATH_PATTERNS:
+                match = pattern.search(window_title)
+                if match:
+                    file_path = match.group(0)
+                    break
+        
+        return Classification(
+            category=category,
+            productivity_score=self.scores.get(category, 0.5),
+            url=url,
+            file_path=file_path,
+            is_browser=is_browser,
+            is_editor=is_editor
+        )
+    
+    def cache_info(self):
+        """Get memoization hit/miss statistics."""
+        return self.classify.cache_info()
+
+def load_categorizer() -> ActivityCategorizer:
+    """Build a categorizer from config.json overrides, falling back to the defaults."""
+    try:
+        from config import config
+    except ImportError:
+        from .config import config
+    
+    try:
+        return ActivityCategorizer(
+            rules=config.get('category_rules'),
+            scores=config.get('productivity_scores'),
+            browsers=config.get('browser_apps'),
+            editors=config.get('editor_apps'),
+            cache_size=config.get('category_cache_size', 4096)
+        )
+    except Exception as e:
+        logger.error(f"Invalid categorization rules in config, using defaults: {e}")
+        return ActivityCategorizer()
+
+# Global categorizer instance
+categorizer = load_categorizer()
\ No newline at end of file
@@ -33,7 +33,30 @@ class Config:
             "activity_sampling_rate": 5,  # how often to sample activity data
             "browser_url_tracking": True,  # Track URLs in browser windows
             "productivity_tracking": True,  # Track productivity metrics
-            "resource_monitoring": True  # Monitor CPU/memory usage
+            "resource_monitoring": True,  # Monitor CPU/memory usage
+            "db_reader_connections": 4,  # pooled read-only SQLite connections
+            "db_cache_size_kb": 8192,  # SQLite page cache per connection
+            "db_mmap_size_mb": 64,  # memory-mapped I/O window per connection
+            "ingest_queue_size": 10000,  # max buffered enhanced samples before dropping oldest
+            "ingest_batch_size": 50,  # flush after this many buffered samples
+            "ingest_flush_interval": 30,  # or after this many seconds
+            "sample_merge_max_seconds": 300,  # identical consecutive samples merge into rows up to this long
+            "linux_event_tracking": True,  # X11: react to focus events instead of polling
+            "ring_buffer_minutes": 60,  # minutes of samples kept in memory for live queries
+            "stream_heartbeat": 15,  # seconds between keepalives on the live event stream
+            "api_cache_ttls": {},  # per-endpoint response cache TTL overrides, in seconds
+            "web_backend": "auto",  # auto, waitress, werkzeug or asgi
+            "web_threads": 16,  # worker threads for the waitress backend
+            "web_keep_alive": 5,  # seconds an idle keep-alive connection stays open
+            "web_compression": True,  # gzip/brotli compress JSON and HTML responses
+            "web_compression_min_size": 1024,  # bytes; smaller responses are sent as-is
+            "archive_enabled": True,  # move old sessions/samples to Parquet files instead of deleting them
+            "archive_after_days": 30,  # closed days older than this are archived on cleanup
+            "metrics_enabled": True,  # record latency histograms and counters for /api/metrics
+            "retention_enabled": True,  # delete expired data in the background while the user is idle
+            "retention_days": 90,  # days of raw data kept per table
+            "retention_table_days": {},  # per-table overrides of retention_days; null keeps a table forever
+            "retention_interval_hours": 24  # hours between background retention runs
         }
         
         # Load or create config
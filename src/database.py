@@ -1,40 +1,397 @@
 import sqlite3
 import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from queue import LifoQueue, Empty
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 from config import config
 
+try:
+    from categorizer import categorizer
+except ImportError:
+    from .categorizer import categorizer
+
+try:
+    from archive import ActivityArchive, ARCHIVE_TABLES
+except ImportError:
+    from .archive import ActivityArchive, ARCHIVE_TABLES
+
+try:
+    from metrics import metrics, instrument_methods
+except ImportError:
+    from .metrics import metrics, instrument_methods
+
+try:
+    from timestamps import to_epoch_ms, from_epoch_ms
+except ImportError:
+    from .timestamps import to_epoch_ms, from_epoch_ms
+
+try:
+    from retention import RetentionEngine, CHUNK_SIZE, CHUNK_PAUSE
+except ImportError:
+    from .retention import RetentionEngine, CHUNK_SIZE, CHUNK_PAUSE
+
+logger = logging.getLogger(__name__)
+
+# Layout of the raw tables. Older databases are migrated in the background,
+# see init_database().
+SCHEMA_VERSION = 4
+
+# Rows copied per transaction by the background migration, and the pause
+# in seconds between batches that lets the tracker's writes through
+MIGRATION_BATCH_SIZE = 5000
+MIGRATION_PAUSE = 0.05
+
+# Bump to rebuild the rollup tables from the raw tables on next start
+ROLLUP_VERSION = '3'
+
+# Text columns stored once in a lookup table and referenced by id:
+# column -> (lookup table, id column)
+LOOKUP_COLUMNS = {
+    'app_name': ('apps', 'app_id'),
+    'window_title': ('window_titles', 'title_id'),
+    'url': ('urls', 'url_id')
+}
+
+# Raw table -> columns, with interned columns under their text name. Each
+# table has a "<table>_named" view returning exactly these columns.
+RAW_TABLES = {
+    'activities': ['id', 'timestamp', 'app_name', 'window_title', 'duration'],
+    'app_sessions': ['id', 'app_name', 'window_title', 'start_time', 'end_time', 'duration'],
+    'enhanced_activities': [
+        'id', 'timestamp', 'app_name', 'window_title', 'duration', 'url', 'file_path',
+        'category', 'productivity_score', 'activity_intensity', 'is_idle',
+        'cpu_percent', 'memory_percent', 'idle_time', 'samples'
+    ]
+}
+
+# Indexes of earlier versions that no query needs any more
+RETIRED_INDEXES = (
+    'idx_activities_app_id', 'idx_sessions_app_id', 'idx_enhanced_timestamp',
+    'idx_enhanced_app_id', 'idx_enhanced_category', 'idx_enhanced_time_category',
+    'idx_enhanced_browser'
+)
+
+# Raw table columns holding integer milliseconds since the Unix epoch
+TIME_COLUMNS = ('timestamp', 'start_time', 'end_time')
+
+def _local_time(column: str) -> str:
+    """SQL date/time function arguments reading an epoch-ms column as local time."""
+    return f"{column} / 1000.0, 'unixepoch', 'localtime'"
+
+def _wall_seconds(moment: datetime) -> float:
+    """Seconds from 1970-01-01 to a local datetime on the wall clock, ignoring UTC offsets."""
+    return (moment - datetime(1970, 1, 1)).total_seconds()
+
+# Rollup table -> strftime format of its bucket key
+ROLLUP_TABLES = {
+    'hourly_rollups': '%Y-%m-%d %H:00:00',
+    'daily_rollups': '%Y-%m-%d'
+}
+
+# Session time split across the clock hours it covers, per (hour, app)
+USAGE_TABLE = 'hourly_usage'
+
+# Lower bounds in seconds of the session-length histogram bins, and labels
+SESSION_LENGTH_BINS = [0, 60, 300, 900, 1800, 3600, 7200]
+SESSION_LENGTH_LABELS = ['<1m', '1-5m', '5-15m', '15-30m', '30-60m', '1-2h', '2h+']
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+ROLLUP_SAMPLE_COLUMNS = [
+    'sample_count', 'sample_duration', 'active_duration', 'idle_duration',
+    'productivity_sum', 'intensity_sum', 'cpu_sum', 'memory_sum'
+]
+
+# Exportable tables: name -> (table, time column, exported columns). The
+# id column comes first and breaks ties between equal timestamps.
+EXPORT_TABLES = {
+    'sessions': ('app_sessions', 'start_time', [
+        'id', 'app_name', 'window_title', 'start_time', 'end_time', 'duration'
+    ]),
+    'enhanced': ('enhanced_activities', 'timestamp', [
+        'id', 'timestamp', 'app_name', 'window_title', 'duration', 'url', 'file_path',
+        'category', 'productivity_score', 'activity_intensity', 'is_idle',
+        'cpu_percent', 'memory_percent', 'idle_time', 'samples'
+    ])
+}
+
+class ConnectionPool:
+    """Thread-aware SQLite connection pool.
+    
+    Holds one writer connection, serialized behind a lock, and up to
+    ``readers`` reader connections that are handed out to concurrent
+    threads. All connections run in WAL mode so readers never block the
+    writer (and vice versa). Connections are opened lazily and reused
+    across calls until ``close()`` is called; the pool reopens them on
+    the next use after that.
+    """
+    
+    def __init__(self, db_path: Path, readers: int = 4, cache_size_kb: int = 8192,
+                 mmap_size_mb: int = 64, busy_timeout: float = 5.0,
+                 on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+                 on_rollback: Optional[Callable[[], None]] = None):
+        self.db_path = db_path
+        self.max_readers = max(1, readers)
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.busy_timeout = busy_timeout
+        self.on_connect = on_connect
+        self.on_rollback = on_rollback
+        
+        self._writer = None
+        self._write_lock = threading.RLock()
+        self._idle_readers = LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(self.max_readers)
+        self._local = threading.local()
+        self._generation = 0
+        self._lock = threading.Lock()
+    
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """Open a new connection with the pool's PRAGMA configuration."""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        # Must precede journal_mode, which initializes a new file; on an existing
+        # file it changes nothing until RetentionEngine.convert() runs VACUUM
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size_mb) * 1024 * 1024}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        if read_only:
+            conn.execute('PRAGMA query_only=ON')
+        if self.on_connect:
+            self.on_connect(conn)
+        return conn
+    
+    @contextmanager
+    def writer(self):
+        """Borrow the writer connection inside a transaction.
+        
+        The writer is re-entrant for the owning thread; the outermost
+        block commits on success and rolls back on error, then calls
+        ``on_rollback``.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            if conn.in_transaction:
+                # Nested use from the same thread joins the outer transaction
+                yield conn
+                return
+            try:
+                with conn:
+                    yield conn
+            except BaseException:
+                if self.on_rollback:
+                    self.on_rollback()
+                raise
+    
+    @contextmanager
+    def reader(self):
+        """Borrow a reader connection for the current thread.
+        
+        Nested borrows from the same thread reuse the connection that
+        thread already holds, so a query helper calling another one
+        cannot exhaust the pool.
+        """
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+        
+        self._reader_slots.acquire()
+        generation = self._generation
+        try:
+            try:
+                conn = self._idle_readers.get_nowait()
+            except Empty:
+                conn = self._connect(read_only=True)
+            self._local.conn = conn
+            self._local.depth = 1
+            try:
+                yield conn
+            finally:
+                self._local.conn = None
+                self._local.depth = 0
+                if conn.in_transaction:
+                    conn.rollback()
+                with self._lock:
+                    if generation == self._generation:
+                        self._idle_readers.put(conn)
+                    else:
+                        conn.close()
+        finally:
+            self._reader_slots.release()
+    
+    def close(self):
+        """Close the writer and every idle reader connection.
+        
+        Readers still borrowed by other threads are closed when they are
+        returned.
+        """
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.close()
+                except sqlite3.Error as e:
+                    logger.error(f"Error closing writer connection: {e}")
+                self._writer = None
+        
+        with self._lock:
+            self._generation += 1
+            while True:
+                try:
+                    conn = self._idle_readers.get_nowait()
+                except Empty:
+                    break
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logger.error(f"Error closing reader connection: {e}")
+
+class LookupCache:
+    """In-process cache of lookup table ids for interned text values.
+    
+    Only used on the writer connection. Ids assigned inside a transaction
+    that is rolled back are invalid, so the pool clears the cache on
+    rollback. Each column's cache is emptied once it reaches
+    ``max_entries`` to bound memory.
+    """
+    
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._ids = {column: {} for column in LOOKUP_COLUMNS}
+    
+    def intern(self, conn: sqlite3.Connection, column: str, value: Optional[str]) -> Optional[int]:
+        """Id of ``value`` in the lookup table of ``column``, adding it if new."""
+        if value is None:
+            return None
+        ids = self._ids[column]
+        value_id = ids.get(value)
+        if value_id is None:
+            table = LOOKUP_COLUMNS[column][0]
+            conn.execute(f'INSERT OR IGNORE INTO {table} (value) VALUES (?)', (value,))
+            value_id = conn.execute(f'SELECT id FROM {table} WHERE value = ?', (value,)).fetchone()[0]
+            if len(ids) >= self.max_entries:
+                ids.clear()
+            ids[value] = value_id
+        return value_id
+    
+    def clear(self):
+        """Forget every cached id."""
+        for ids in self._ids.values():
+            ids.clear()
+
+@instrument_methods(metrics, 'db_call_seconds', errors='db_call_errors_total', exclude=('add_change_listener',))
 class ActivityDatabase:
     """Database manager for activity tracking."""
     
-    def __init__(self, db_path: Optional[Path] = None):
+    def __init__(self, db_path: Optional[Path] = None, archive_dir: Optional[Path] = None):
         self.db_path = db_path or config.db_file
+        self.archive = ActivityArchive(archive_dir or config.data_dir / 'archive')
+        self.lookups = LookupCache()
+        self.pool = ConnectionPool(
+            self.db_path,
+            readers=config.get('db_reader_connections', 4),
+            cache_size_kb=config.get('db_cache_size_kb', 8192),
+            mmap_size_mb=config.get('db_mmap_size_mb', 64),
+            on_connect=self._prepare_connection,
+            on_rollback=self.lookups.clear
+        )
+        self._change_listeners = []
+        self._migration_thread = None
+        self.retention = RetentionEngine(self)
         self.init_database()
+        
+        metrics.register_callback('db_idle_reader_connections', self.pool._idle_readers.qsize,
+                                  help='Pooled SQLite reader connections not in use')
+    
+    @staticmethod
+    def _prepare_connection(conn: sqlite3.Connection):
+        """Register SQL functions used by the rollup queries."""
+        conn.create_function(
+            'activity_category', 2,
+            lambda app_name, window_title: categorizer.classify(app_name, window_title).category,
+            deterministic=True
+        )
+    
+    def close(self):
+        """Close all pooled connections."""
+        self.pool.close()
+    
+    def add_change_listener(self, listener: Callable[[Tuple[str, ...]], None]):
+        """Register a callback invoked with the changed table names after each write commits."""
+        self._change_listeners.append(listener)
+    
+    def remove_change_listener(self, listener: Callable[[Tuple[str, ...]], None]):
+        """Unregister a change callback."""
+        if listener in self._change_listeners:
+            self._change_listeners.remove(listener)
+    
+    def _notify_change(self, *tables: str):
+        """Tell listeners which tables a committed write touched."""
+        for listener in list(self._change_listeners):
+            try:
+                listener(tables)
+            except Exception as e:
+                logger.error(f"Error in database change listener: {e}")
     
     def init_database(self):
-        """Initialize database with required tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Initialize database with required tables.
+        
+        Raw tables in an older layout (text timestamps, or text app names,
+        titles and URLs) are renamed to ``<table>_legacy`` and new empty
+        tables take their place, so tracking continues right away while a
+        background thread copies the old rows over in batches, newest
+        first. The copy resumes where it left off after a restart. Until
+        it finishes, queries over raw rows only see what has been copied.
+        """
+        with self.pool.writer() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS db_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+            detached = self._detach_legacy_tables(conn)
+            
+            # Interned text values, see LOOKUP_COLUMNS
+            for table, _ in LOOKUP_COLUMNS.values():
+                conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY,
+                        value TEXT NOT NULL UNIQUE
+                    )
+                ''')
+            
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS activities (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME NOT NULL,
-                    app_name TEXT NOT NULL,
-                    window_title TEXT,
-                    duration INTEGER DEFAULT 0,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    timestamp INTEGER NOT NULL,  -- epoch ms
+                    app_id INTEGER NOT NULL REFERENCES apps(id),
+                    title_id INTEGER REFERENCES window_titles(id),
+                    duration INTEGER DEFAULT 0
                 )
             ''')
             
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS app_sessions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    app_name TEXT NOT NULL,
-                    window_title TEXT,
-                    start_time DATETIME NOT NULL,
-                    end_time DATETIME,
-                    duration INTEGER DEFAULT 0,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    app_id INTEGER NOT NULL REFERENCES apps(id),
+                    title_id INTEGER REFERENCES window_titles(id),
+                    start_time INTEGER NOT NULL,  -- epoch ms
+                    end_time INTEGER,  -- epoch ms
+                    duration INTEGER DEFAULT 0
                 )
             ''')
             
@@ -43,20 +400,24 @@ class ActivityDatabase:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     date DATE NOT NULL UNIQUE,
                     total_time INTEGER DEFAULT 0,
-                    app_breakdown TEXT,  -- JSON string
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    app_breakdown TEXT  -- JSON string
                 )
             ''')
+            # Earlier layouts kept an unused text creation timestamp; DROP COLUMN
+            # needs SQLite 3.35, older versions keep it
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(daily_summaries)')]
+            if 'created_at' in columns and sqlite3.sqlite_version_info >= (3, 35, 0):
+                conn.execute('ALTER TABLE daily_summaries DROP COLUMN created_at')
             
             # Enhanced activity tracking table
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS enhanced_activities (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME NOT NULL,
-                    app_name TEXT NOT NULL,
-                    window_title TEXT,
+                    timestamp INTEGER NOT NULL,  -- epoch ms
+                    app_id INTEGER NOT NULL REFERENCES apps(id),
+                    title_id INTEGER REFERENCES window_titles(id),
                     duration INTEGER DEFAULT 0,
-                    url TEXT,
+                    url_id INTEGER REFERENCES urls(id),
                     file_path TEXT,
                     category TEXT,
                     productivity_score REAL,
@@ -65,90 +426,631 @@ class ActivityDatabase:
                     cpu_percent REAL,
                     memory_percent REAL,
                     idle_time REAL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    samples INTEGER NOT NULL DEFAULT 1  -- tracker ticks merged into this row
                 )
             ''')
+            # Tables from before consecutive samples were merged hold one tick per row
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(enhanced_activities)')]
+            if 'samples' not in columns:
+                conn.execute('ALTER TABLE enhanced_activities ADD COLUMN samples INTEGER NOT NULL DEFAULT 1')
+                conn.execute('DROP VIEW IF EXISTS enhanced_activities_named')
+            
+            # New rows must get ids above every legacy row still to be copied
+            for table in detached:
+                conn.execute('''
+                    INSERT INTO sqlite_sequence (name, seq)
+                    SELECT ?, seq FROM sqlite_sequence WHERE name = ?
+                ''', (table, f'{table}_legacy'))
             
-            # Create indexes for better performance
+            # Indexes, matched to the queries below; benchmarks/plans.py checks
+            # that no get_* query falls back to a full table scan
+            for index in RETIRED_INDEXES:
+                conn.execute(f'DROP INDEX IF EXISTS {index}')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_activities_timestamp ON activities(timestamp)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_activities_app_name ON activities(app_name)')
+            # Open sessions, exports and retention
             conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON app_sessions(start_time)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_app_name ON app_sessions(app_name)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_enhanced_timestamp ON enhanced_activities(timestamp)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_enhanced_app_name ON enhanced_activities(app_name)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_enhanced_category ON enhanced_activities(category)')
+            # Per-app totals of closed sessions; end_time is a key column so the
+            # index alone answers the query, without visiting table rows
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sessions_closed
+                ON app_sessions(start_time, app_id, duration, end_time) WHERE end_time IS NOT NULL
+            ''')
+            # Window titles of one app's closed sessions
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sessions_app_closed
+                ON app_sessions(app_id, start_time, title_id, duration, end_time) WHERE end_time IS NOT NULL
+            ''')
+            # Sample ranges, covering the category breakdown
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_enhanced_category_samples
+                ON enhanced_activities(timestamp, category, duration, productivity_score, samples)
+            ''')
+            # Browser samples only, covering the top URLs
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_enhanced_browser_samples
+                ON enhanced_activities(timestamp, url_id, title_id, duration, activity_intensity, samples)
+                WHERE url_id IS NOT NULL
+            ''')
+            
+            # The raw tables with interned columns resolved back to text
+            for table in RAW_TABLES:
+                columns, joins = self._named_columns(table, 'r')
+                conn.execute(f'''
+                    CREATE VIEW IF NOT EXISTS {table}_named AS
+                    SELECT {", ".join(columns)} FROM {table} r {joins}
+                ''')
+            
+            # Pre-aggregated usage per (bucket, app, category). Sessions are
+            # attributed to the bucket they started in, matching the
+            # start_time filters of the raw queries.
+            for table in ROLLUP_TABLES:
+                conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        bucket TEXT NOT NULL,
+                        app_id INTEGER NOT NULL,
+                        category TEXT NOT NULL,
+                        session_count INTEGER DEFAULT 0,
+                        session_duration INTEGER DEFAULT 0,
+                        sample_count INTEGER DEFAULT 0,
+                        sample_duration INTEGER DEFAULT 0,
+                        active_duration INTEGER DEFAULT 0,
+                        idle_duration INTEGER DEFAULT 0,
+                        productivity_sum REAL DEFAULT 0,
+                        intensity_sum REAL DEFAULT 0,
+                        cpu_sum REAL DEFAULT 0,
+                        memory_sum REAL DEFAULT 0,
+                        PRIMARY KEY (bucket, app_id, category)
+                    ) WITHOUT ROWID
+                ''')
+            
+            # Sessions split at hour boundaries, so time is attributed to
+            # the hours it was actually spent in
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {USAGE_TABLE} (
+                    bucket TEXT NOT NULL,
+                    app_id INTEGER NOT NULL,
+                    seconds REAL DEFAULT 0,
+                    PRIMARY KEY (bucket, app_id)
+                ) WITHOUT ROWID
+            ''')
+            
+            # Session counts per SESSION_LENGTH_BINS bin, by start day
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS session_lengths (
+                    bucket TEXT NOT NULL,
+                    app_id INTEGER NOT NULL,
+                    bin INTEGER NOT NULL,
+                    session_count INTEGER DEFAULT 0,
+                    PRIMARY KEY (bucket, app_id, bin)
+                ) WITHOUT ROWID
+            ''')
+            
+            if self._get_meta(conn, 'rollup_version') != ROLLUP_VERSION:
+                logger.info("Backfilling rollup tables")
+                self._rebuild_rollups(conn)
+                self._set_meta(conn, 'rollup_version', ROLLUP_VERSION)
+            
+            migrating = bool(self._legacy_tables(conn))
+            if not migrating:
+                self._set_meta(conn, 'schema_version', str(SCHEMA_VERSION))
+        
+        if migrating and (self._migration_thread is None or not self._migration_thread.is_alive()):
+            self._migration_thread = threading.Thread(
+                target=self._run_migration, daemon=True, name='schema-migration'
+            )
+            self._migration_thread.start()
+    
+    def _detach_legacy_tables(self, conn: sqlite3.Connection) -> List[str]:
+        """Rename raw tables still in an older layout to ``<table>_legacy``.
+        
+        Opens the transaction the new tables are created in and drops the
+        legacy indexes, whose names the new tables reuse. Tables storing
+        text app names also had rollups keyed by name, which are dropped to
+        be rebuilt; their rows are added back as they are copied. Returns
+        the renamed tables.
+        """
+        existing = set(self._legacy_tables(conn))
+        detached = []
+        for table in RAW_TABLES:
+            columns = {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if columns and any(columns.get(column, 'INTEGER') != 'INTEGER' for column in TIME_COLUMNS):
+                if table in existing:
+                    raise sqlite3.DatabaseError(f"{table} is in an old layout but {table}_legacy exists")
+                detached.append(table)
+        if not detached:
+            return []
+        
+        logger.info(f"Migrating {', '.join(detached)} to schema version {SCHEMA_VERSION} in the background")
+        conn.execute('BEGIN IMMEDIATE')
+        indexes = conn.execute(f'''
+            SELECT name FROM sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({", ".join("?" * len(detached))})
+        ''', detached).fetchall()
+        for (index,) in indexes:
+            conn.execute(f'DROP INDEX {index}')
+        for table in RAW_TABLES:
+            conn.execute(f'DROP VIEW IF EXISTS {table}_named')
+        
+        if any(self._stores_names(conn, table) for table in detached):
+            for table in list(ROLLUP_TABLES) + [USAGE_TABLE, 'session_lengths']:
+                conn.execute(f'DROP TABLE IF EXISTS {table}')
+            conn.execute("DELETE FROM db_meta WHERE key = 'rollup_version'")
+        
+        for table in detached:
+            upper = conn.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}').fetchone()[0]
+            conn.execute(f'ALTER TABLE {table} RENAME TO {table}_legacy')
+            self._set_meta(conn, f'migration_{table}', str(upper))
+        return detached
+    
+    def _legacy_tables(self, conn: sqlite3.Connection) -> List[str]:
+        """Raw tables whose ``<table>_legacy`` rows are still being copied."""
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return [table for table in RAW_TABLES if f'{table}_legacy' in names]
+    
+    @staticmethod
+    def _stores_names(conn: sqlite3.Connection, table: str) -> bool:
+        """Whether a table (before or after renaming to _legacy) stores app names as text."""
+        for name in (f'{table}_legacy', table):
+            columns = [row[1] for row in conn.execute(f'PRAGMA table_info({name})')]
+            if columns:
+                return 'app_name' in columns
+        return False
+    
+    def _run_migration(self):
+        """Background thread body: copy legacy rows until none are left."""
+        try:
+            while self._migrate_batch():
+                time.sleep(MIGRATION_PAUSE)
+        except Exception as e:
+            logger.error(f"Error migrating database, will resume on next start: {e}")
+    
+    def complete_migration(self):
+        """Copy any remaining legacy rows now.
+        
+        Called before maintenance that deletes or rescans raw rows, which
+        must see all of them.
+        """
+        while self._migrate_batch():
+            pass
+    
+    def _migrate_batch(self, batch_size: int = MIGRATION_BATCH_SIZE) -> bool:
+        """Copy the newest uncopied batch of one legacy table in one transaction.
+        
+        Progress is the lowest id copied so far, kept in db_meta under
+        ``migration_<table>`` and committed with the batch. A table is
+        dropped once it is fully copied. Returns whether anything is left.
+        """
+        with self.pool.writer() as conn:
+            legacy_tables = self._legacy_tables(conn)
+            if not legacy_tables:
+                return False
+            table = legacy_tables[0]
+            legacy = f'{table}_legacy'
+            key = f'migration_{table}'
+            upper = int(self._get_meta(conn, key) or 2 ** 62)
+            lower = conn.execute(f'''
+                SELECT MIN(id) FROM (SELECT id FROM {legacy} WHERE id < ? ORDER BY id DESC LIMIT ?)
+            ''', (upper, batch_size)).fetchone()[0]
+            
+            if lower is None:
+                conn.execute(f'DROP TABLE {legacy}')
+                conn.execute('DELETE FROM db_meta WHERE key = ?', (key,))
+                logger.info(f"Finished migrating {table}")
+                if len(legacy_tables) == 1:
+                    self._set_meta(conn, 'schema_version', str(SCHEMA_VERSION))
+                    logger.info(f"Database migrated to schema version {SCHEMA_VERSION}")
+                return len(legacy_tables) > 1
+            
+            self._copy_legacy_rows(conn, table, lower, upper)
+            self._set_meta(conn, key, str(lower))
+        return True
+    
+    def _copy_legacy_rows(self, conn: sqlite3.Connection, table: str, lower: int, upper: int):
+        """Copy legacy rows with lower <= id < upper into the new layout, keeping ids."""
+        legacy = f'{table}_legacy'
+        stores_names = self._stores_names(conn, table)
+        legacy_columns = {row[1] for row in conn.execute(f'PRAGMA table_info({legacy})')}
+        # Columns added since the legacy layout take their defaults
+        columns = [column for column in RAW_TABLES[table]
+                   if column in legacy_columns or self._raw_columns([column])[0] in legacy_columns]
+        selects = []
+        joins = []
+        for column in columns:
+            if column in TIME_COLUMNS:
+                # Legacy text timestamps are naive local time, like datetime.timestamp() assumes;
+                # milliseconds are cut from the text so they truncate like to_epoch_ms()
+                selects.append(f"CAST(strftime('%s', substr(r.{column}, 1, 19), 'utc') AS INTEGER) * 1000 + "
+                               f"CAST(substr(r.{column}, 21, 3) AS INTEGER)")
+            elif column in LOOKUP_COLUMNS and stores_names:
+                lookup, _ = LOOKUP_COLUMNS[column]
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO {lookup} (value)
+                    SELECT DISTINCT {column} FROM {legacy}
+                    WHERE id >= ? AND id < ? AND {column} IS NOT NULL
+                ''', (lower, upper))
+                selects.append(f'{lookup}.id')
+                joins.append(f'LEFT JOIN {lookup} ON {lookup}.value = r.{column}')
+            else:
+                selects.append(f'r.{self._raw_columns([column])[0]}')
+        
+        conn.execute(f'''
+            INSERT INTO {table} ({", ".join(self._raw_columns(columns))})
+            SELECT {", ".join(selects)} FROM {legacy} r {" ".join(joins)}
+            WHERE r.id >= ? AND r.id < ?
+        ''', (lower, upper))
+        
+        # Rollups keyed by app name were dropped, so add these rows back
+        if stores_names and table == 'app_sessions':
+            self._rollup_sessions(conn, 'id >= ? AND id < ?', (lower, upper))
+        elif stores_names and table == 'enhanced_activities':
+            self._rollup_samples(conn, 'id >= ? AND id < ?', (lower, upper))
+    
+    @staticmethod
+    def _raw_columns(columns: List[str]) -> List[str]:
+        """Column names as stored, with interned columns replaced by their id columns."""
+        return [LOOKUP_COLUMNS[column][1] if column in LOOKUP_COLUMNS else column for column in columns]
+    
+    @staticmethod
+    def _named_columns(table: str, alias: str) -> Tuple[List[str], str]:
+        """Select list and joins resolving the interned columns of a raw table aliased ``alias``."""
+        columns = []
+        joins = []
+        for column in RAW_TABLES[table]:
+            if column in LOOKUP_COLUMNS:
+                lookup, id_column = LOOKUP_COLUMNS[column]
+                columns.append(f'{lookup}.value AS {column}')
+                joins.append(f'LEFT JOIN {lookup} ON {lookup}.id = {alias}.{id_column}')
+            else:
+                columns.append(f'{alias}.{column}')
+        return columns, ' '.join(joins)
+    
+    def _insert_rows(self, conn: sqlite3.Connection, table: str, columns: List[str], rows: List[Tuple]):
+        """Insert rows given with text values and datetimes.
+        
+        Interned columns are stored as lookup ids and time columns as
+        epoch milliseconds.
+        """
+        interned = [(index, column) for index, column in enumerate(columns) if column in LOOKUP_COLUMNS]
+        times = [index for index, column in enumerate(columns) if column in TIME_COLUMNS]
+        if interned or times:
+            converted = []
+            for row in rows:
+                row = list(row)
+                for index, column in interned:
+                    row[index] = self.lookups.intern(conn, column, row[index])
+                for index in times:
+                    row[index] = to_epoch_ms(row[index])
+                converted.append(row)
+            rows = converted
+        conn.executemany(
+            f'INSERT INTO {table} ({", ".join(self._raw_columns(columns))}) '
+            f'VALUES ({", ".join("?" * len(columns))})',
+            rows
+        )
+    
+    def _get_meta(self, conn: sqlite3.Connection, key: str) -> Optional[str]:
+        """Read a value from the db_meta table."""
+        row = conn.execute('SELECT value FROM db_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: str):
+        """Write a value to the db_meta table."""
+        conn.execute('''
+            INSERT INTO db_meta (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+    
+    def _rollup_sessions(self, conn: sqlite3.Connection, where: str, params: Tuple = (),
+                         source: str = 'app_sessions', before: Optional[datetime] = None, sign: int = 1):
+        """Add ended sessions matching ``where`` to the rollup tables.
+        
+        With ``before``, only the part of each session before that time is
+        added to the hourly usage. A ``sign`` of -1 subtracts them instead.
+        """
+        self._rollup_usage(conn, where, params, source, before, sign)
+        
+        bins = ' '.join(f'WHEN COALESCE(duration, 0) < {upper} THEN {index}'
+                        for index, upper in enumerate(SESSION_LENGTH_BINS[1:]))
+        conn.execute(f'''
+            INSERT INTO session_lengths (bucket, app_id, bin, session_count)
+            SELECT strftime('%Y-%m-%d', {_local_time('start_time')}), app_id,
+                   CASE {bins} ELSE {len(SESSION_LENGTH_BINS) - 1} END, {sign} * COUNT(*)
+            FROM {source}
+            WHERE end_time IS NOT NULL AND {where}
+            GROUP BY 1, 2, 3
+            ON CONFLICT(bucket, app_id, bin) DO UPDATE SET
+                session_count = session_count + excluded.session_count
+        ''', params)
+        
+        # Group by title id first, so names are only looked up and
+        # categorized once per distinct title in each bucket
+        for table, bucket_format in ROLLUP_TABLES.items():
+            conn.execute(f'''
+                INSERT INTO {table} (bucket, app_id, category, session_count, session_duration)
+                SELECT s.bucket, s.app_id, activity_category(apps.value, window_titles.value),
+                       {sign} * SUM(s.sessions), {sign} * SUM(s.duration)
+                FROM (
+                    SELECT strftime('{bucket_format}', {_local_time('start_time')}) AS bucket, app_id, title_id,
+                           COUNT(*) AS sessions, COALESCE(SUM(duration), 0) AS duration
+                    FROM {source}
+                    WHERE end_time IS NOT NULL AND {where}
+                    GROUP BY 1, 2, 3
+                ) s
+                JOIN apps ON apps.id = s.app_id
+                LEFT JOIN window_titles ON window_titles.id = s.title_id
+                GROUP BY 1, 2, 3
+                ON CONFLICT(bucket, app_id, category) DO UPDATE SET
+                    session_count = session_count + excluded.session_count,
+                    session_duration = session_duration + excluded.session_duration
+            ''', params)
+    
+    def _rollup_usage(self, conn: sqlite3.Connection, where: str, params: Tuple,
+                      source: str, before: Optional[datetime] = None, sign: int = 1):
+        """Split ended sessions matching ``where`` at hour boundaries into the usage table.
+        
+        A recursive CTE walks each session one clock hour at a time on
+        local wall-clock seconds, so all sessions are split in a single
+        statement.
+        """
+        epoch = "ROUND((julianday({}) - 2440587.5) * 86400.0, 3)"
+        next_hour = '(CAST(slice_start / 3600 AS INTEGER) + 1) * 3600.0'
+        clip = ''
+        clip_params = ()
+        if before is not None:
+            clip = 'AND slice_start < ?'
+            clip_params = (_wall_seconds(before),)
+        
+        conn.execute(f'''
+            WITH RECURSIVE slices(app_id, slice_start, session_end) AS (
+                SELECT app_id, {epoch.format(_local_time('start_time'))}, {epoch.format(_local_time('end_time'))}
+                FROM {source}
+                WHERE end_time IS NOT NULL AND {where}
+                UNION ALL
+                SELECT app_id, {next_hour}, session_end
+                FROM slices
+                WHERE {next_hour} < session_end
+            )
+            INSERT INTO {USAGE_TABLE} (bucket, app_id, seconds)
+            SELECT strftime('%Y-%m-%d %H:00:00', slice_start, 'unixepoch'), app_id,
+                   {sign} * SUM(MIN(session_end, {next_hour}) - slice_start)
+            FROM slices
+            WHERE session_end > slice_start {clip}
+            GROUP BY 1, 2
+            ON CONFLICT(bucket, app_id) DO UPDATE SET seconds = seconds + excluded.seconds
+        ''', tuple(params) + clip_params)
+    
+    def _rollup_samples(self, conn: sqlite3.Connection, where: str, params: Tuple = (),
+                        source: str = 'enhanced_activities', sign: int = 1):
+        """Add enhanced samples matching ``where`` to the rollup tables, or subtract them with ``sign`` -1.
+        
+        A row merged from several ticks counts as that many samples, so
+        averages stay per tick.
+        """
+        columns = ', '.join(ROLLUP_SAMPLE_COLUMNS)
+        updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in ROLLUP_SAMPLE_COLUMNS)
+        for table, bucket_format in ROLLUP_TABLES.items():
+            conn.execute(f'''
+                INSERT INTO {table} (bucket, app_id, category, {columns})
+                SELECT strftime('{bucket_format}', {_local_time('timestamp')}), app_id, COALESCE(category, ''),
+                       {sign} * SUM(samples), {sign} * COALESCE(SUM(duration), 0),
+                       {sign} * COALESCE(SUM(CASE WHEN is_idle = 0 THEN duration ELSE 0 END), 0),
+                       {sign} * COALESCE(SUM(CASE WHEN is_idle = 1 THEN duration ELSE 0 END), 0),
+                       {sign} * TOTAL(productivity_score * samples), {sign} * TOTAL(activity_intensity * samples),
+                       {sign} * TOTAL(cpu_percent * samples), {sign} * TOTAL(memory_percent * samples)
+                FROM {source}
+                WHERE {where}
+                GROUP BY 1, 2, 3
+                ON CONFLICT(bucket, app_id, category) DO UPDATE SET {updates}
+            ''', params)
+    
+    def _rebuild_rollups(self, conn: sqlite3.Connection, until: Optional[datetime] = None):
+        """Recompute the rollup tables from the raw tables and the archive.
+        
+        With ``until``, only buckets up to the end of that day are rebuilt.
+        """
+        if until is None:
+            for table in list(ROLLUP_TABLES) + [USAGE_TABLE, 'session_lengths']:
+                conn.execute(f'DELETE FROM {table}')
+            self._rollup_sessions(conn, '1')
+            self._rollup_samples(conn, '1')
+            self._rollup_archive(conn)
+            return
+        
+        boundary = until.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for table, bucket_format in ROLLUP_TABLES.items():
+            conn.execute(f'DELETE FROM {table} WHERE bucket < ?', (boundary.strftime(bucket_format),))
+        conn.execute(f'DELETE FROM {USAGE_TABLE} WHERE bucket < ?', (boundary.strftime(ROLLUP_TABLES['hourly_rollups']),))
+        conn.execute('DELETE FROM session_lengths WHERE bucket < ?', (boundary.strftime('%Y-%m-%d'),))
+        self._rollup_sessions(conn, 'start_time < ?', (to_epoch_ms(boundary),), before=boundary)
+        self._rollup_samples(conn, 'timestamp < ?', (to_epoch_ms(boundary),))
+        self._rollup_archive(conn, boundary)
+    
+    def _unroll_rows(self, conn: sqlite3.Connection, table: str, where: str, params: Tuple):
+        """Subtract raw rows matching ``where`` from the rollups, before deleting them."""
+        if table == 'app_sessions':
+            self._rollup_sessions(conn, where, params, sign=-1)
+        elif table == 'enhanced_activities':
+            self._rollup_samples(conn, where, params, sign=-1)
+    
+    def _prune_rollups(self, conn: sqlite3.Connection, before: datetime):
+        """Drop rollup rows left empty by ``_unroll_rows`` in days up to ``before``."""
+        boundary = before.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for table, bucket_format in ROLLUP_TABLES.items():
+            conn.execute(f'''
+                DELETE FROM {table}
+                WHERE bucket < ? AND session_count <= 0 AND sample_count <= 0
+            ''', (boundary.strftime(bucket_format),))
+        # Float sums of subtracted sessions can leave a residue instead of zero
+        conn.execute(f'DELETE FROM {USAGE_TABLE} WHERE bucket < ? AND seconds < 0.0005',
+                     (boundary.strftime(ROLLUP_TABLES['hourly_rollups']),))
+        conn.execute('DELETE FROM session_lengths WHERE bucket < ? AND session_count <= 0',
+                     (boundary.strftime('%Y-%m-%d'),))
+    
+    def _rollup_archive(self, conn: sqlite3.Connection, before: Optional[datetime] = None):
+        """Add archived rows (optionally only those before ``before``) to the rollup tables.
+        
+        Each batch is interned and staged in a temp table so the regular
+        rollup SQL can aggregate it.
+        """
+        for table in ARCHIVE_TABLES:
+            if not self.archive.has_data(table):
+                continue
+            time_column, columns = ARCHIVE_TABLES[table]
+            names = [name for name, _ in columns]
+            staging = f'archived_{table}'
+            conn.execute(f'''
+                CREATE TEMP TABLE IF NOT EXISTS {staging} AS
+                SELECT {", ".join(self._raw_columns(names))} FROM {table} WHERE 0
+            ''')
+            for rows in self.archive.iter_rows(table, end=before):
+                conn.execute(f'DELETE FROM temp.{staging}')
+                self._insert_rows(conn, f'temp.{staging}', names, [[row[name] for name in names] for row in rows])
+                if table == 'app_sessions':
+                    self._rollup_sessions(conn, '1', source=f'temp.{staging}', before=before)
+                else:
+                    self._rollup_samples(conn, '1', source=f'temp.{staging}')
+            conn.execute(f'DROP TABLE temp.{staging}')
+    
+    def _rollup_union(self, raw_select: str, rollup_select: str, time_column: str,
+                      start: datetime) -> Tuple[str, List]:
+        """Build a UNION ALL covering everything from ``start`` onwards.
+        
+        ``raw_select`` reads the unaligned head up to the next full hour
+        from the raw table; ``rollup_select`` reads the hourly rollups up
+        to the next day boundary and the daily rollups after that. Both
+        take a ``{span}`` placeholder for the range condition, and
+        ``rollup_select`` a ``{table}`` placeholder.
+        """
+        hour = start.replace(minute=0, second=0, microsecond=0)
+        if hour < start:
+            hour += timedelta(hours=1)
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        if day < start:
+            day += timedelta(days=1)
+        
+        sql = ' UNION ALL '.join([
+            raw_select.format(span=f'{time_column} >= ? AND {time_column} < ?'),
+            rollup_select.format(table='hourly_rollups', span='bucket >= ? AND bucket < ?'),
+            rollup_select.format(table='daily_rollups', span='bucket >= ?')
+        ])
+        hour_bucket = hour.strftime(ROLLUP_TABLES['hourly_rollups'])
+        day_bucket = day.strftime(ROLLUP_TABLES['daily_rollups'])
+        return sql, [to_epoch_ms(start), to_epoch_ms(hour), hour_bucket, day_bucket, day_bucket]
     
     def record_activity(self, app_name: str, window_title: str = None, duration: int = 0):
         """Record a single activity entry."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                INSERT INTO activities (timestamp, app_name, window_title, duration)
-                VALUES (?, ?, ?, ?)
-            ''', (datetime.now(), app_name, window_title, duration))
+        with self.pool.writer() as conn:
+            self._insert_rows(conn, 'activities', ['timestamp', 'app_name', 'window_title', 'duration'],
+                              [(datetime.now(), app_name, window_title, duration)])
     
     def record_enhanced_activity(self, activity_data: Dict):
         """Record enhanced activity data with additional context."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                INSERT INTO enhanced_activities (
-                    timestamp, app_name, window_title, duration, url, file_path,
-                    category, productivity_score, activity_intensity, is_idle,
-                    cpu_percent, memory_percent, idle_time
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                activity_data['timestamp'],
-                activity_data['app_name'],
-                activity_data['window_title'],
-                activity_data['duration'],
-                activity_data.get('url'),
-                activity_data.get('file_path'),
-                activity_data.get('category'),
-                activity_data.get('productivity_score'),
-                activity_data.get('activity_intensity'),
-                activity_data.get('is_idle'),
-                activity_data.get('cpu_percent'),
-                activity_data.get('memory_percent'),
-                activity_data.get('idle_time')
-            ))
-    
-    def start_session(self, app_name: str, window_title: str = None) -> int:
+        self.record_enhanced_activities([activity_data])
+    
+    def record_enhanced_activities(self, activities: List[Dict]):
+        """Record a batch of enhanced activity samples in one transaction.
+        
+        A sample may stand for a run of identical ticks, counted in its
+        ``samples`` key (default 1).
+        """
+        rows = [(
+            activity_data['timestamp'],
+            activity_data['app_name'],
+            activity_data['window_title'],
+            activity_data['duration'],
+            activity_data.get('url'),
+            activity_data.get('file_path'),
+            activity_data.get('category'),
+            activity_data.get('productivity_score'),
+            activity_data.get('activity_intensity'),
+            activity_data.get('is_idle'),
+            activity_data.get('cpu_percent'),
+            activity_data.get('memory_percent'),
+            activity_data.get('idle_time'),
+            activity_data.get('samples', 1)
+        ) for activity_data in activities]
+        
+        with self.pool.writer() as conn:
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM enhanced_activities').fetchone()[0]
+            self._insert_rows(conn, 'enhanced_activities', [
+                'timestamp', 'app_name', 'window_title', 'duration', 'url', 'file_path',
+                'category', 'productivity_score', 'activity_intensity', 'is_idle',
+                'cpu_percent', 'memory_percent', 'idle_time', 'samples'
+            ], rows)
+            self._rollup_samples(conn, 'id > ?', (last_id,))
+        self._notify_change('enhanced_activities')
+    
+    def start_session(self, app_name: str, window_title: str = None,
+                      start_time: Optional[datetime] = None) -> int:
         """Start a new session and return session ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        start_time = start_time or datetime.now()
+        with self.pool.writer() as conn:
             cursor = conn.execute('''
-                INSERT INTO app_sessions (app_name, window_title, start_time)
+                INSERT INTO app_sessions (app_id, title_id, start_time)
                 VALUES (?, ?, ?)
-            ''', (app_name, window_title, datetime.now()))
+            ''', (self.lookups.intern(conn, 'app_name', app_name),
+                  self.lookups.intern(conn, 'window_title', window_title), to_epoch_ms(start_time)))
             return cursor.lastrowid
     
-    def end_session(self, session_id: int):
+    def end_session(self, session_id: int, end_time: Optional[datetime] = None):
         """End a session and calculate duration."""
-        with sqlite3.connect(self.db_path) as conn:
+        end_time = end_time or datetime.now()
+        with self.pool.writer() as conn:
             cursor = conn.execute('''
                 UPDATE app_sessions 
-                SET end_time = ?, duration = CAST((julianday(?) - julianday(start_time)) * 86400 AS INTEGER)
-                WHERE id = ?
-            ''', (datetime.now(), datetime.now(), session_id))
+                SET end_time = ?, duration = (? - start_time) / 1000
+                WHERE id = ? AND end_time IS NULL
+            ''', (to_epoch_ms(end_time), to_epoch_ms(end_time), session_id))
+            ended = cursor.rowcount > 0
+            if ended:
+                self._rollup_sessions(conn, 'id = ?', (session_id,))
+        if ended:
+            self._notify_change('app_sessions')
     
     def _delete_session(self, session_id: int):
         """Delete a session (used for very short sessions)."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.writer() as conn:
             conn.execute('DELETE FROM app_sessions WHERE id = ?', (session_id,))
     
+    def _session_totals_union(self, start: datetime) -> Tuple[str, List]:
+        """Per-app session duration and count from ``start`` onwards, as a UNION ALL."""
+        return self._rollup_union(
+            '''
+                SELECT app_id, SUM(duration) as duration, COUNT(*) as sessions
+                FROM app_sessions
+                WHERE {span} AND end_time IS NOT NULL
+                GROUP BY app_id
+            ''',
+            '''
+                SELECT app_id, SUM(session_duration), SUM(session_count)
+                FROM {table}
+                WHERE {span}
+                GROUP BY app_id
+            ''',
+            'start_time', start
+        )
+    
     def get_app_stats(self, days: int = 7) -> List[Dict]:
         """Get application usage statistics for the last N days."""
         start_date = datetime.now() - timedelta(days=days)
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute('''
-                SELECT app_name, 
-                       SUM(duration) as total_duration,
-                       COUNT(*) as session_count,
-                       AVG(duration) as avg_duration
-                FROM app_sessions 
-                WHERE start_time >= ? AND end_time IS NOT NULL
-                GROUP BY app_name
-                ORDER BY total_duration DESC
-            ''', (start_date,))
+        union, params = self._session_totals_union(start_date)
+        
+        with self.pool.reader() as conn:
+            cursor = conn.execute(f'''
+                SELECT apps.value, totals.total_duration, totals.session_count, totals.avg_duration
+                FROM (
+                    SELECT app_id, 
+                           SUM(duration) as total_duration,
+                           SUM(sessions) as session_count,
+                           CAST(SUM(duration) AS REAL) / SUM(sessions) as avg_duration
+                    FROM ({union})
+                    GROUP BY app_id
+                    HAVING session_count > 0
+                ) totals
+                JOIN apps ON apps.id = totals.app_id
+                ORDER BY totals.total_duration DESC
+            ''', params)
             
             results = []
             for row in cursor.fetchall():
@@ -165,29 +1067,25 @@ class ActivityDatabase:
         if date is None:
             date = datetime.now().strftime('%Y-%m-%d')
         
-        start_time = datetime.strptime(date, '%Y-%m-%d')
-        end_time = start_time + timedelta(days=1)
+        # A calendar day is exactly one daily rollup bucket
+        bucket = datetime.strptime(date, '%Y-%m-%d').strftime(ROLLUP_TABLES['daily_rollups'])
         
-        with sqlite3.connect(self.db_path) as conn:
-            # Get total time
-            cursor = conn.execute('''
-                SELECT SUM(duration) as total_time
-                FROM app_sessions 
-                WHERE start_time >= ? AND start_time < ? AND end_time IS NOT NULL
-            ''', (start_time, end_time))
-            
-            total_time = cursor.fetchone()[0] or 0
-            
-            # Get app breakdown
+        with self.pool.reader() as conn:
             cursor = conn.execute('''
-                SELECT app_name, SUM(duration) as duration
-                FROM app_sessions 
-                WHERE start_time >= ? AND start_time < ? AND end_time IS NOT NULL
-                GROUP BY app_name
-                ORDER BY duration DESC
-            ''', (start_time, end_time))
+                SELECT apps.value, totals.duration
+                FROM (
+                    SELECT app_id, SUM(session_duration) as duration
+                    FROM daily_rollups 
+                    WHERE bucket = ?
+                    GROUP BY app_id
+                    HAVING SUM(session_count) > 0
+                ) totals
+                JOIN apps ON apps.id = totals.app_id
+                ORDER BY totals.duration DESC
+            ''', (bucket,))
             
             app_breakdown = [{'app_name': row[0], 'duration': row[1]} for row in cursor.fetchall()]
+            total_time = sum(app['duration'] for app in app_breakdown)
             
             return {
                 'date': date,
@@ -197,35 +1095,164 @@ class ActivityDatabase:
     
     def get_weekly_stats(self) -> List[Dict]:
         """Get weekly statistics."""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=7)
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.get_range_breakdown(today - timedelta(days=7), today + timedelta(days=1))
+    
+    def get_range_breakdown(self, start: datetime, end: datetime, granularity: str = 'day') -> List[Dict]:
+        """Get per-day (or per-hour) totals and app breakdowns for [start, end).
+        
+        ``start`` is rounded down to the granularity. Every bucket in the
+        range is returned, including empty ones, from a single GROUP BY
+        over the rollup tables.
+        """
+        if granularity == 'day':
+            table, step = 'daily_rollups', timedelta(days=1)
+            start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        elif granularity == 'hour':
+            table, step = 'hourly_rollups', timedelta(hours=1)
+            start = start.replace(minute=0, second=0, microsecond=0)
+        else:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        bucket_format = ROLLUP_TABLES[table]
+        
+        buckets = {}
+        current = start
+        while current < end:
+            entry = {'date': current.strftime('%Y-%m-%d'), 'total_time': 0, 'app_breakdown': []}
+            if granularity == 'hour':
+                entry['hour'] = current.hour
+            buckets[current.strftime(bucket_format)] = entry
+            current += step
+        
+        with self.pool.reader() as conn:
+            cursor = conn.execute(f'''
+                SELECT totals.bucket, apps.value, totals.duration
+                FROM (
+                    SELECT bucket, app_id, SUM(session_duration) as duration
+                    FROM {table}
+                    WHERE bucket >= ? AND bucket < ?
+                    GROUP BY bucket, app_id
+                    HAVING SUM(session_count) > 0
+                ) totals
+                JOIN apps ON apps.id = totals.app_id
+                ORDER BY totals.bucket, totals.duration DESC
+            ''', (start.strftime(bucket_format), end.strftime(bucket_format)))
+            
+            for bucket, app_name, duration in cursor.fetchall():
+                entry = buckets.get(bucket)
+                if entry is None:
+                    continue
+                entry['app_breakdown'].append({'app_name': app_name, 'duration': duration})
+                entry['total_time'] += duration
+        
+        return list(buckets.values())
+    
+    def get_hourly_breakdown(self, date: str) -> List[Dict]:
+        """Get the time spent in each clock hour of a day, with per-app durations.
+        
+        Sessions crossing an hour boundary count towards each hour they
+        cover.
+        """
+        day = datetime.strptime(date, '%Y-%m-%d')
+        bucket_format = ROLLUP_TABLES['hourly_rollups']
+        
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT CAST(substr(usage.bucket, 12, 2) AS INTEGER), apps.value, usage.seconds
+                FROM {USAGE_TABLE} usage
+                JOIN apps ON apps.id = usage.app_id
+                WHERE usage.bucket >= ? AND usage.bucket < ?
+                ORDER BY usage.seconds DESC
+            ''', (day.strftime(bucket_format), (day + timedelta(days=1)).strftime(bucket_format))).fetchall()
+        
+        hours = [{'hour': hour, 'usage': 0.0, 'apps': []} for hour in range(24)]
+        for hour, app_name, seconds in rows:
+            hours[hour]['usage'] += seconds
+            hours[hour]['apps'].append({'app_name': app_name, 'duration': round(seconds)})
+        for entry in hours:
+            entry['usage'] = round(entry['usage'])
+        return hours
+    
+    def get_usage_patterns(self, days: int = 7, app_name: Optional[str] = None) -> Dict:
+        """Get when and how long an app (or everything) is used over the last ``days``.
+        
+        Returns a weekday x hour heatmap of seconds (Monday first), the
+        peak hours, the session-length histogram and the number of days
+        with any usage. Reads only the usage rollups, counting whole hours.
+        """
+        start = (datetime.now() - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+        app_filter = ' AND app_id = (SELECT id FROM apps WHERE value = ?)' if app_name else ''
+        params = [start.strftime(ROLLUP_TABLES['hourly_rollups'])] + ([app_name] if app_name else [])
+        
+        with self.pool.reader() as conn:
+            # Grouping on the primary key prefix needs no sort; weekdays are
+            # resolved once per day below rather than per row in SQL
+            hours = conn.execute(f'''
+                SELECT bucket, SUM(seconds)
+                FROM {USAGE_TABLE}
+                WHERE bucket >= ?{app_filter}
+                GROUP BY bucket
+            ''', params).fetchall()
+            
+            params[0] = start.strftime('%Y-%m-%d')
+            bins = dict(conn.execute(f'''
+                SELECT bin, SUM(session_count)
+                FROM session_lengths
+                WHERE bucket >= ?{app_filter}
+                GROUP BY bin
+            ''', params).fetchall())
         
-        daily_stats = []
-        current_date = start_date
+        heatmap = [[0.0] * 24 for _ in WEEKDAY_NAMES]
+        weekdays = {}
+        for bucket, seconds in hours:
+            date = bucket[:10]
+            weekday = weekdays.get(date)
+            if weekday is None:
+                weekday = weekdays[date] = datetime.strptime(date, '%Y-%m-%d').weekday()
+            heatmap[weekday][int(bucket[11:13])] += seconds
+        heatmap = [[round(seconds) for seconds in row] for row in heatmap]
+        active_days = len(weekdays)
+        hourly_totals = [sum(row[hour] for row in heatmap) for hour in range(24)]
         
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            stats = self.get_daily_stats(date_str)
-            daily_stats.append(stats)
-            current_date += timedelta(days=1)
+        # Hours with at least half the usage of the busiest hour
+        busiest = max(hourly_totals)
+        peak_hours = [hour for hour, total in enumerate(hourly_totals) if busiest and total * 2 >= busiest]
         
-        return daily_stats
+        return {
+            'heatmap': heatmap,
+            'weekdays': WEEKDAY_NAMES,
+            'hourly_totals': hourly_totals,
+            'peak_hours': peak_hours,
+            'session_length_histogram': [
+                {'label': label, 'min_seconds': lower, 'sessions': bins.get(index, 0)}
+                for index, (label, lower) in enumerate(zip(SESSION_LENGTH_LABELS, SESSION_LENGTH_BINS))
+            ],
+            'active_days': active_days,
+            'total_duration': sum(hourly_totals)
+        }
     
     def get_top_apps(self, days: int = 7, limit: int = 10) -> List[Dict]:
         """Get top applications by usage time."""
         start_date = datetime.now() - timedelta(days=days)
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute('''
-                SELECT app_name, 
-                       SUM(duration) as total_duration,
-                       COUNT(*) as session_count
-                FROM app_sessions 
-                WHERE start_time >= ? AND end_time IS NOT NULL
-                GROUP BY app_name
-                ORDER BY total_duration DESC
-                LIMIT ?
-            ''', (start_date, limit))
+        union, params = self._session_totals_union(start_date)
+        
+        with self.pool.reader() as conn:
+            cursor = conn.execute(f'''
+                SELECT apps.value, top.total_duration, top.session_count
+                FROM (
+                    SELECT app_id, 
+                           SUM(duration) as total_duration,
+                           SUM(sessions) as session_count
+                    FROM ({union})
+                    GROUP BY app_id
+                    HAVING session_count > 0
+                    ORDER BY total_duration DESC
+                    LIMIT ?
+                ) top
+                JOIN apps ON apps.id = top.app_id
+                ORDER BY top.total_duration DESC
+            ''', params + [limit])
             
             return [{'app_name': row[0], 'total_duration': row[1], 'session_count': row[2]} 
                    for row in cursor.fetchall()]
@@ -234,87 +1261,232 @@ class ActivityDatabase:
         """Get window titles for a specific app."""
         start_date = datetime.now() - timedelta(days=days)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.reader() as conn:
             cursor = conn.execute('''
-                SELECT window_title, 
-                       SUM(duration) as total_duration,
-                       COUNT(*) as session_count
-                FROM app_sessions 
-                WHERE app_name = ? AND start_time >= ? AND end_time IS NOT NULL
-                GROUP BY window_title
-                ORDER BY total_duration DESC
-            ''', (app_name, start_date))
-            
+                SELECT window_titles.value, totals.total_duration, totals.session_count
+                FROM (
+                    SELECT title_id, 
+                           SUM(duration) as total_duration,
+                           COUNT(*) as session_count
+                    FROM app_sessions 
+                    WHERE app_id = (SELECT id FROM apps WHERE value = ?)
+                      AND start_time >= ? AND end_time IS NOT NULL
+                    GROUP BY title_id
+                ) totals
+                LEFT JOIN window_titles ON window_titles.id = totals.title_id
+                ORDER BY totals.total_duration DESC
+            ''', (app_name, to_epoch_ms(start_date)))
+            rows = cursor.fetchall()
+        
+        if not self.archive.has_data('app_sessions', start_date):
             return [{'window_title': row[0], 'total_duration': row[1], 'session_count': row[2]} 
-                   for row in cursor.fetchall()]
+                   for row in rows]
+        
+        titles = {row[0]: [row[1] or 0, row[2]] for row in rows}
+        for row in self.archive.aggregate('app_sessions', ['window_title'], [('duration', 'sum'), ('id', 'count')],
+                                          start=start_date, where={'app_name': app_name}, not_null=['end_time']):
+            entry = titles.setdefault(row['window_title'], [0, 0])
+            entry[0] += row['duration_sum'] or 0
+            entry[1] += row['id_count']
+        
+        return [{'window_title': title, 'total_duration': total, 'session_count': count}
+                for title, (total, count) in sorted(titles.items(), key=lambda item: item[1][0], reverse=True)]
     
-    def cleanup_old_data(self, days_to_keep: int = 90):
-        """Clean up old data to prevent database bloat."""
-        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+    def archive_old_data(self, days_to_keep: Optional[int] = None, chunk_size: int = CHUNK_SIZE,
+                         pause: float = CHUNK_PAUSE,
+                         should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, int]:
+        """Move closed days older than ``days_to_keep`` into the columnar archive.
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('DELETE FROM activities WHERE timestamp < ?', (cutoff_date,))
-            conn.execute('DELETE FROM app_sessions WHERE start_time < ?', (cutoff_date,))
-            conn.execute('DELETE FROM daily_summaries WHERE date < ?', (cutoff_date.strftime('%Y-%m-%d'),))
+        Sessions still open are left in place. Rollups are untouched since
+        they keep covering archived rows. Once a day's file is written its
+        rows are deleted ``chunk_size`` at a time with a ``pause`` between
+        chunks. ``should_stop`` is checked between chunks; when it returns
+        True the move ends early and the next run picks up where it left
+        off. Returns rows moved per table.
+        """
+        if not self.archive.available:
+            logger.warning("pyarrow is not installed, skipping archiving")
+            return {}
+        if days_to_keep is None:
+            days_to_keep = config.get('archive_after_days', 30)
+        self.complete_migration()
+        cutoff = (datetime.now() - timedelta(days=days_to_keep)).replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        moved = {}
+        stopped = False
+        for table, (time_column, columns) in ARCHIVE_TABLES.items():
+            names = [name for name, _ in columns]
+            closed = ' AND end_time IS NOT NULL' if table == 'app_sessions' else ''
+            with self.pool.reader() as conn:
+                days = [row[0] for row in conn.execute(
+                    f'SELECT DISTINCT DATE({_local_time(time_column)}) FROM {table} '
+                    f'WHERE {time_column} < ?{closed}', (to_epoch_ms(cutoff),)
+                )]
+            
+            moved[table] = 0
+            for day in sorted(days):
+                day_start = datetime.strptime(day, '%Y-%m-%d')
+                with self.pool.reader() as conn:
+                    rows = conn.execute(f'''
+                        SELECT {", ".join(names)} FROM {table}_named
+                        WHERE {time_column} >= ? AND {time_column} < ?{closed}
+                    ''', (to_epoch_ms(day_start), to_epoch_ms(min(day_start + timedelta(days=1), cutoff)))).fetchall()
+                rows = [dict(zip(names, row)) for row in rows]
+                
+                # Delete only once the day's file is in place; ids already
+                # archived by an interrupted run are skipped when writing
+                self.archive.write_day(table, day, rows)
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+                    with self.pool.writer() as conn:
+                        conn.executemany(f'DELETE FROM {table} WHERE id = ?', ((row['id'],) for row in chunk))
+                    moved[table] += len(chunk)
+                    stopped = bool(should_stop and should_stop())
+                    if stopped:
+                        break
+                    time.sleep(pause)
+                if stopped:
+                    break
+            
+            if moved[table]:
+                logger.info(f"Archived {moved[table]} rows of {table} before {cutoff:%Y-%m-%d}")
+            if stopped:
+                break
+        return moved
+    
+    def cleanup_old_data(self, days_to_keep: Optional[int] = None) -> Dict[str, int]:
+        """Clean up old data to prevent database bloat.
+        
+        Rows older than ``days_to_keep`` (default: the configured per-table
+        retention) are deleted in small chunks and the freed space is
+        returned to the file system. With archiving enabled, ended sessions
+        and samples are moved to the archive instead of being deleted, so
+        the rollups stay valid and only abandoned open sessions are
+        dropped. Returns rows deleted per table.
+        """
+        return self.retention.run(days_to_keep)
     
     def reset_all_data(self):
         """Reset all data by clearing all tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        self.complete_migration()
+        with self.pool.writer() as conn:
             conn.execute('DELETE FROM activities')
             conn.execute('DELETE FROM app_sessions')
             conn.execute('DELETE FROM daily_summaries')
-            conn.commit()
+            self.archive.clear('app_sessions')
+            self._rebuild_rollups(conn)
+        self._notify_change('activities', 'app_sessions', 'daily_summaries')
     
     def export_data(self, start_date: str, end_date: str) -> Dict:
         """Export data for a date range."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute('''
-                SELECT * FROM app_sessions 
-                WHERE start_time >= ? AND start_time <= ?
-                ORDER BY start_time
-            ''', (start_date, end_date))
-            
-            sessions = []
-            for row in cursor.fetchall():
-                sessions.append({
-                    'id': row[0],
-                    'app_name': row[1],
-                    'window_title': row[2],
-                    'start_time': row[3],
-                    'end_time': row[4],
-                    'duration': row[5]
-                })
-            
-            return {'sessions': sessions}
+        return {'sessions': list(self.iter_export_rows(start_date, end_date))}
+    
+    def get_export_page(self, start_date: str, end_date: str, after: Optional[Tuple[int, int]] = None,
+                        limit: int = 1000, table: str = 'sessions') -> Tuple[List[Dict], Optional[Tuple[int, int]]]:
+        """Get one page of rows in a date range, ordered by (time, id).
+        
+        Pages are keyed on the last row's (epoch ms, id) rather than an
+        offset, so every page is an index range scan however deep it is.
+        Returns the rows, with times as ISO text, and the ``after`` key for
+        the next page, or None after the last page.
+        """
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unknown export table: {table}")
+        name, time_column, columns = EXPORT_TABLES[table]
+        
+        sql = f'SELECT {", ".join(columns)} FROM {name}_named WHERE {time_column} >= ? AND {time_column} <= ?'
+        params = [to_epoch_ms(start_date), to_epoch_ms(end_date)]
+        if after is not None:
+            after = (to_epoch_ms(after[0]), after[1])
+            sql += f' AND ({time_column}, id) > (?, ?)'
+            params.extend(after)
+        sql += f' ORDER BY {time_column}, id LIMIT ?'
+        params.append(limit)
+        
+        with self.pool.reader() as conn:
+            rows = [dict(zip(columns, row)) for row in conn.execute(sql, params).fetchall()]
+        
+        if self.archive.has_data(name, start_date):
+            archived = self.archive.read_page(name, start_date, end_date, after, limit, columns)
+            rows = sorted(archived + rows, key=lambda row: (row[time_column], row['id']))[:limit]
+        
+        next_key = None
+        if len(rows) == limit:
+            next_key = (rows[-1][time_column], rows[-1]['id'])
+        
+        for row in rows:
+            for column in TIME_COLUMNS:
+                if row.get(column) is not None:
+                    row[column] = from_epoch_ms(row[column]).isoformat(' ')
+        return rows, next_key
+    
+    def iter_export_rows(self, start_date: str, end_date: str, table: str = 'sessions',
+                         batch_size: int = 1000) -> Iterator[Dict]:
+        """Yield every row in a date range with constant memory.
+        
+        Rows are read a page at a time, so a slow consumer never holds a
+        pooled connection or a read transaction between pages.
+        """
+        after = None
+        while True:
+            rows, after = self.get_export_page(start_date, end_date, after, batch_size, table)
+            yield from rows
+            if after is None:
+                return
     
     def get_enhanced_stats(self, days: int = 7) -> Dict:
         """Get enhanced statistics including productivity and activity patterns."""
         start_date = datetime.now() - timedelta(days=days)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.reader() as conn:
             # Get productivity stats
-            cursor = conn.execute('''
-                SELECT AVG(productivity_score) as avg_productivity,
-                       AVG(activity_intensity) as avg_intensity,
-                       SUM(CASE WHEN is_idle = 0 THEN duration ELSE 0 END) as active_time,
-                       SUM(CASE WHEN is_idle = 1 THEN duration ELSE 0 END) as idle_time
-                FROM enhanced_activities 
-                WHERE timestamp >= ?
-            ''', (start_date,))
+            union, params = self._rollup_union('''
+                SELECT TOTAL(productivity_score * samples) as productivity,
+                       TOTAL(activity_intensity * samples) as intensity,
+                       SUM(samples) as samples,
+                       SUM(CASE WHEN is_idle = 0 THEN duration ELSE 0 END) as active,
+                       SUM(CASE WHEN is_idle = 1 THEN duration ELSE 0 END) as idle
+                FROM enhanced_activities
+                WHERE {span}
+            ''', '''
+                SELECT SUM(productivity_sum), SUM(intensity_sum), SUM(sample_count),
+                       SUM(active_duration), SUM(idle_duration)
+                FROM {table}
+                WHERE {span}
+            ''', 'timestamp', start_date)
+            cursor = conn.execute(f'''
+                SELECT SUM(productivity) / SUM(samples) as avg_productivity,
+                       SUM(intensity) / SUM(samples) as avg_intensity,
+                       SUM(active) as active_time,
+                       SUM(idle) as idle_time
+                FROM ({union})
+            ''', params)
             
             productivity_data = cursor.fetchone()
             
             # Get category breakdown
-            cursor = conn.execute('''
+            union, params = self._rollup_union('''
+                SELECT category, SUM(duration) as duration,
+                       TOTAL(productivity_score * samples) as productivity, SUM(samples) as samples
+                FROM enhanced_activities
+                WHERE {span} AND category IS NOT NULL
+                GROUP BY category
+            ''', '''
+                SELECT category, SUM(sample_duration), SUM(productivity_sum), SUM(sample_count)
+                FROM {table}
+                WHERE {span} AND category <> ''
+                GROUP BY category
+            ''', 'timestamp', start_date)
+            cursor = conn.execute(f'''
                 SELECT category, 
                        SUM(duration) as total_duration,
-                       AVG(productivity_score) as avg_productivity,
-                       COUNT(*) as activity_count
-                FROM enhanced_activities 
-                WHERE timestamp >= ? AND category IS NOT NULL
+                       SUM(productivity) / SUM(samples) as avg_productivity,
+                       SUM(samples) as activity_count
+                FROM ({union})
                 GROUP BY category
+                HAVING activity_count > 0
                 ORDER BY total_duration DESC
-            ''', (start_date,))
+            ''', params)
             
             category_breakdown = []
             for row in cursor.fetchall():
@@ -326,17 +1498,34 @@ class ActivityDatabase:
                 })
             
             # Get system resource usage patterns
-            cursor = conn.execute('''
-                SELECT app_name,
-                       AVG(cpu_percent) as avg_cpu,
-                       AVG(memory_percent) as avg_memory,
-                       SUM(duration) as total_duration
-                FROM enhanced_activities 
-                WHERE timestamp >= ? AND cpu_percent IS NOT NULL
-                GROUP BY app_name
-                ORDER BY total_duration DESC
-                LIMIT 10
-            ''', (start_date,))
+            union, params = self._rollup_union('''
+                SELECT app_id, TOTAL(cpu_percent * samples) as cpu, TOTAL(memory_percent * samples) as memory,
+                       SUM(samples) as samples, SUM(duration) as duration
+                FROM enhanced_activities
+                WHERE {span} AND cpu_percent IS NOT NULL
+                GROUP BY app_id
+            ''', '''
+                SELECT app_id, SUM(cpu_sum), SUM(memory_sum), SUM(sample_count), SUM(sample_duration)
+                FROM {table}
+                WHERE {span}
+                GROUP BY app_id
+            ''', 'timestamp', start_date)
+            cursor = conn.execute(f'''
+                SELECT apps.value, top.avg_cpu, top.avg_memory, top.total_duration
+                FROM (
+                    SELECT app_id,
+                           SUM(cpu) / SUM(samples) as avg_cpu,
+                           SUM(memory) / SUM(samples) as avg_memory,
+                           SUM(duration) as total_duration
+                    FROM ({union})
+                    GROUP BY app_id
+                    HAVING SUM(samples) > 0
+                    ORDER BY total_duration DESC
+                    LIMIT 10
+                ) top
+                JOIN apps ON apps.id = top.app_id
+                ORDER BY top.total_duration DESC
+            ''', params)
             
             resource_usage = []
             for row in cursor.fetchall():
@@ -362,38 +1551,102 @@ class ActivityDatabase:
         """Get browser activity with URLs."""
         start_date = datetime.now() - timedelta(days=days)
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute('''
-                SELECT url, window_title, 
-                       SUM(duration) as total_duration,
-                       COUNT(*) as visit_count,
-                       AVG(activity_intensity) as avg_intensity
-                FROM enhanced_activities 
-                WHERE timestamp >= ? AND url IS NOT NULL
-                GROUP BY url
-                ORDER BY total_duration DESC
-                LIMIT 20
-            ''', (start_date,))
-            
-            return [{'url': row[0], 'title': row[1], 'duration': row[2], 
-                    'visits': row[3], 'intensity': row[4]} for row in cursor.fetchall()]
+        if self.archive.has_data('enhanced_activities', start_date):
+            rows = self._browser_activity_with_archive(start_date)
+        else:
+            with self.pool.reader() as conn:
+                cursor = conn.execute('''
+                    SELECT urls.value, window_titles.value, top.total_duration, top.visit_count, top.avg_intensity
+                    FROM (
+                        SELECT url_id, MAX(title_id) as title_id,
+                               SUM(duration) as total_duration,
+                               COUNT(*) as visit_count,
+                               TOTAL(activity_intensity * samples) / SUM(samples) as avg_intensity
+                        FROM enhanced_activities 
+                        WHERE timestamp >= ? AND url_id IS NOT NULL
+                        GROUP BY url_id
+                        ORDER BY total_duration DESC
+                        LIMIT 20
+                    ) top
+                    JOIN urls ON urls.id = top.url_id
+                    LEFT JOIN window_titles ON window_titles.id = top.title_id
+                    ORDER BY top.total_duration DESC
+                ''', (to_epoch_ms(start_date),))
+                rows = cursor.fetchall()
+        
+        return [{'url': row[0], 'title': row[1], 'duration': row[2], 
+                'visits': row[3], 'intensity': row[4]} for row in rows]
+    
+    def _browser_activity_with_archive(self, start_date: datetime) -> List[Tuple]:
+        """Top URLs over the live table and the archive, as (url, title, duration, visits, intensity)."""
+        with self.pool.reader() as conn:
+            live_rows = conn.execute('''
+                SELECT urls.value, window_titles.value, live.duration, live.visits,
+                       live.intensity_sum, live.intensity_count
+                FROM (
+                    SELECT url_id, MAX(title_id) as title_id, SUM(duration) as duration, COUNT(*) as visits,
+                           TOTAL(activity_intensity * samples) as intensity_sum, SUM(samples) as intensity_count
+                    FROM enhanced_activities
+                    WHERE timestamp >= ? AND url_id IS NOT NULL
+                    GROUP BY url_id
+                ) live
+                JOIN urls ON urls.id = live.url_id
+                LEFT JOIN window_titles ON window_titles.id = live.title_id
+            ''', (to_epoch_ms(start_date),)).fetchall()
+        
+        urls = {row[0]: list(row[1:]) for row in live_rows}
+        archived = self.archive.aggregate(
+            'enhanced_activities', ['url'],
+            [('window_title', 'max'), ('duration', 'sum'), ('id', 'count'),
+             ('activity_intensity', 'sum'), ('samples', 'sum')],
+            start=start_date, not_null=['url'], weights={'activity_intensity': 'samples'}
+        )
+        for row in archived:
+            entry = urls.setdefault(row['url'], [None, 0, 0, 0.0, 0])
+            entry[0] = entry[0] or row['window_title_max']
+            entry[1] = (entry[1] or 0) + (row['duration_sum'] or 0)
+            entry[2] += row['id_count']
+            entry[3] += row['activity_intensity_sum'] or 0.0
+            entry[4] += row['samples_sum']
+        
+        top = sorted(urls.items(), key=lambda item: item[1][1] or 0, reverse=True)[:20]
+        return [(url, title, duration, visits, intensity_sum / intensity_count if intensity_count else None)
+                for url, (title, duration, visits, intensity_sum, intensity_count) in top]
     
     def get_productivity_trends(self, days: int = 30) -> List[Dict]:
         """Get productivity trends over time."""
         start_date = datetime.now() - timedelta(days=days)
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute('''
-                SELECT DATE(timestamp) as date,
-                       AVG(productivity_score) as avg_productivity,
-                       AVG(activity_intensity) as avg_intensity,
+        # The raw head ends at the next full hour, so all of it falls on the
+        # start date and needs no per-row date conversion
+        union, params = self._rollup_union('''
+            SELECT ? as date, TOTAL(productivity_score * samples) as productivity,
+                   TOTAL(activity_intensity * samples) as intensity, SUM(samples) as samples,
+                   SUM(duration) as duration,
+                   SUM(CASE WHEN is_idle = 0 THEN duration ELSE 0 END) as active
+            FROM enhanced_activities
+            WHERE {span}
+        ''', '''
+            SELECT substr(bucket, 1, 10), SUM(productivity_sum), SUM(intensity_sum),
+                   SUM(sample_count), SUM(sample_duration), SUM(active_duration)
+            FROM {table}
+            WHERE {span}
+            GROUP BY substr(bucket, 1, 10)
+        ''', 'timestamp', start_date)
+        params.insert(0, start_date.strftime('%Y-%m-%d'))
+        
+        with self.pool.reader() as conn:
+            cursor = conn.execute(f'''
+                SELECT date,
+                       SUM(productivity) / SUM(samples) as avg_productivity,
+                       SUM(intensity) / SUM(samples) as avg_intensity,
                        SUM(duration) as total_duration,
-                       SUM(CASE WHEN is_idle = 0 THEN duration ELSE 0 END) as active_duration
-                FROM enhanced_activities 
-                WHERE timestamp >= ?
-                GROUP BY DATE(timestamp)
+                       SUM(active) as active_duration
+                FROM ({union})
+                GROUP BY date
+                HAVING SUM(samples) > 0
                 ORDER BY date
-            ''', (start_date,))
+            ''', params)
             
             return [{'date': row[0], 'productivity': row[1], 'intensity': row[2], 
                     'total_duration': row[3], 'active_duration': row[4]} 
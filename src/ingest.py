@@ -0,0 +1,163 @@
+"""
+Write-behind ingest buffer
+
+Samples produced by the tracker thread are queued in memory and committed
+to the database in batches by a background flusher thread, so a slow disk
+never stalls the sampler.
+"""
+
+import time
+import logging
+from collections import deque
+from threading import Thread, Condition, Lock
+from typing import Callable, Dict, List
+
+try:
+    from metrics import metrics
+except ImportError:
+    from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """Bounded in-memory buffer flushed to storage by a background thread.
+    
+    Rows are handed to ``flush_fn`` as a list once ``batch_size`` rows are
+    pending or ``flush_interval`` seconds have passed since the last flush,
+    whichever comes first. When the buffer is full the oldest pending row
+    is dropped so the producer never blocks.
+    """
+    
+    def __init__(self, flush_fn: Callable[[List[Dict]], None], capacity: int = 10000,
+                 batch_size: int = 50, flush_interval: float = 30.0, name: str = 'write-behind'):
+        self.flush_fn = flush_fn
+        self.capacity = max(1, capacity)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.name = name
+        
+        self._pending = deque()
+        self._cond = Condition()
+        self._flush_lock = Lock()
+        self._thread = None
+        self._stopping = False
+        
+        # Counters for sizing the buffer
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.flush_count = 0
+        self.rows_flushed = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+        self.last_batch_size = 0
+    
+    def start(self):
+        """Start the background flusher thread if it is not running."""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = Thread(target=self._flush_loop, name=self.name, daemon=True)
+            self._thread.start()
+    
+    def put(self, row: Dict):
+        """Queue a row for writing without blocking on I/O."""
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        
+        with self._cond:
+            if len(self._pending) >= self.capacity:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+    
+    def flush(self) -> int:
+        """Synchronously write every pending row. Returns the number written."""
+        with self._flush_lock:
+            with self._cond:
+                rows = list(self._pending)
+                self._pending.clear()
+            return self._write(rows)
+    
+    def stop(self, timeout: float = 5.0):
+        """Flush pending rows and stop the flusher thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        self.flush()
+    
+    def depth(self) -> int:
+        """Number of rows waiting to be written."""
+        with self._cond:
+            return len(self._pending)
+    
+    def stats(self) -> Dict:
+        """Queue depth and flush latency counters."""
+        return {
+            'queue_depth': self.depth(),
+            'capacity': self.capacity,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            'dropped': self.dropped,
+            'failed_flushes': self.failed_flushes,
+            'flush_count': self.flush_count,
+            'rows_flushed': self.rows_flushed,
+            'last_batch_size': self.last_batch_size,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency,
+            'avg_flush_latency': self.total_flush_latency / self.flush_count if self.flush_count else 0.0
+        }
+    
+    def _flush_loop(self):
+        """Wait for a full batch or the flush interval, then write."""
+        deadline = time.monotonic() + self.flush_interval
+        backoff = False
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or (not backoff and len(self._pending) >= self.batch_size):
+                        break
+                    self._cond.wait(timeout=remaining)
+                if self._stopping:
+                    return
+            
+            written = self.flush()
+            # After a failed write, hold off until the next interval instead of retrying hot
+            backoff = written == 0 and self.depth() > 0
+            deadline = time.monotonic() + self.flush_interval
+    
+    def _write(self, rows: List[Dict]) -> int:
+        """Hand rows to the flush function, re-queueing them on failure."""
+        if not rows:
+            return 0
+        
+        start = time.perf_counter()
+        try:
+            self.flush_fn(rows)
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.error(f"Error flushing {len(rows)} rows from {self.name}: {e}")
+            with self._cond:
+                # Put the batch back in front of anything queued meanwhile
+                room = self.capacity - len(self._pending)
+                keep = rows[-room:] if room > 0 else []
+                self.dropped += len(rows) - len(keep)
+                self._pending.extendleft(reversed(keep))
+            return 0
+        
+        latency = time.perf_counter() - start
+        metrics.observe('ingest_flush_seconds', latency, buffer=self.name)
+        self.flush_count += 1
+        self.rows_flushed += len(rows)
+        self.last_batch_size = len(rows)
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self.total_flush_latency += latency
+        return len(rows)
\ No newline at end of file
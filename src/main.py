@@ -8,8 +8,11 @@ across applications locally without sending any data externally.
 
 import sys
 import os
+import json
 import logging
 import argparse
+import urllib.request
+from datetime import datetime, timedelta
 from pathlib import Path
 
 # Add the src directory to the Python path
@@ -23,6 +26,7 @@ try:
     from database import db
     from window_tracker import activity_tracker
     from web_dashboard import create_app
+    from web_server import serve_dashboard
     from reports import report_generator
     
     # Try to import system tray, but don't fail if display is not available
@@ -41,6 +45,7 @@ except ImportError as e:
         from .database import db
         from .window_tracker import activity_tracker
         from .web_dashboard import create_app
+        from .web_server import serve_dashboard
         from .reports import report_generator
         
         try:
@@ -117,13 +122,49 @@ def check_dependencies():
     
     return True
 
+def run_scheduled_retention():
+    """Background retention job, deferred while the user is active."""
+    logger = logging.getLogger(__name__)
+    
+    def user_active():
+        state = activity_tracker.state
+        return state.tracking and not state.is_idle
+    
+    try:
+        if user_active() or not db.retention.is_due():
+            return
+        db.retention.run(should_stop=user_active)
+    except Exception as e:
+        logger.error(f"Error in scheduled retention: {e}")
+
+def start_scheduler():
+    """Start background maintenance jobs. Returns the scheduler, or None."""
+    logger = logging.getLogger(__name__)
+    if not config.get('retention_enabled', True):
+        return None
+    
+    try:
+        from apscheduler.schedulers.background import BackgroundScheduler
+    except ImportError:
+        logger.warning("apscheduler is not installed, old data will not be cleaned up automatically")
+        return None
+    
+    scheduler = BackgroundScheduler(daemon=True)
+    # Check often so a run starts soon after the user goes idle once it is due
+    scheduler.add_job(run_scheduled_retention, 'interval', minutes=10, id='retention',
+                      next_run_time=datetime.now() + timedelta(minutes=1),
+                      max_instances=1, coalesce=True)
+    scheduler.start()
+    logger.info("Background retention scheduled")
+    return scheduler
+
 def run_cli_mode(args):
     """Run in CLI mode for debugging or reporting."""
     logger = logging.getLogger(__name__)
     
     if args.command == 'test':
         logger.info("Testing window tracking...")
-        current_window = activity_tracker.get_current_window()
+        current_window = activity_tracker.refresh_state().current_window
         if current_window:
             app_name, window_title = current_window
             print(f"Current window: {app_name} - {window_title}")
@@ -192,13 +233,57 @@ def run_cli_mode(args):
     elif args.command == 'cleanup':
         logger.info("Cleaning up old data...")
         try:
-            days_to_keep = args.days or 90
-            db.cleanup_old_data(days_to_keep)
-            print(f"Cleaned up data older than {days_to_keep} days")
+            deleted = db.cleanup_old_data(args.days)
+            for table, count in deleted.items():
+                print(f"  {table}: {count} rows deleted")
+            if args.vacuum:
+                print("Converting the database to incremental vacuum...")
+                db.retention.convert()
         except Exception as e:
             logger.error(f"Error cleaning up data: {e}")
             print(f"Error: {e}")
     
+    elif args.command == 'archive':
+        logger.info("Archiving old data...")
+        try:
+            moved = db.archive_old_data(args.days)
+            if not moved:
+                print("Archiving requires pyarrow (pip install pyarrow)")
+            for table, count in moved.items():
+                print(f"  {table}: {count} rows archived")
+        except Exception as e:
+            logger.error(f"Error archiving data: {e}")
+            print(f"Error: {e}")
+    
+    elif args.command == 'metrics':
+        port = args.port or config.get('web_port', 5000)
+        url = f"http://127.0.0.1:{port}/api/metrics" + ('' if args.prometheus else '?format=json')
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode('utf-8')
+        except OSError as e:
+            print(f"Could not reach the dashboard on port {port} ({e}); is ActivityWatcher running?")
+            return
+        
+        if args.prometheus:
+            print(body, end='')
+            return
+        
+        snapshot = json.loads(body)
+        print("Latency (ms)")
+        print("=" * 50)
+        print(f"  {'metric':60} {'count':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for name, summary in snapshot.get('histograms', {}).items():
+            print(f"  {name:60} {summary['count']:8d} {summary['p50'] * 1000:9.2f} "
+                  f"{summary['p95'] * 1000:9.2f} {summary['p99'] * 1000:9.2f} {summary['max'] * 1000:9.2f}")
+        
+        values = {**snapshot.get('counters', {}), **snapshot.get('gauges', {})}
+        if values:
+            print("\nCounters and gauges")
+            print("=" * 50)
+            for name, value in values.items():
+                print(f"  {name:60} {value:g}")
+    
     elif args.command == 'enhanced':
         logger.info("Showing enhanced statistics...")
         try:
@@ -268,7 +353,11 @@ def run_cli_mode(args):
             app = create_app()
             port = config.get('web_port', 5000)
             print(f"Starting web dashboard on http://localhost:{port}")
-            app.run(host='127.0.0.1', port=port, debug=args.debug)
+            if args.debug:
+                # The development server's reloader and debugger are only useful while developing
+                app.run(host='127.0.0.1', port=port, debug=True)
+            else:
+                serve_dashboard(app, host='127.0.0.1', port=port)
         except Exception as e:
             logger.error(f"Error starting web dashboard: {e}")
             print(f"Error: {e}")
@@ -305,8 +394,21 @@ def main():
     
     # Cleanup command
     cleanup_parser = subparsers.add_parser('cleanup', help='Clean up old data')
-    cleanup_parser.add_argument('--days', type=int, default=90, 
-                               help='Keep data for this many days')
+    cleanup_parser.add_argument('--days', type=int, 
+                               help='Keep data for this many days (default: retention settings)')
+    cleanup_parser.add_argument('--vacuum', action='store_true',
+                               help='Rewrite the database once so freed space can be returned in the background')
+    
+    # Archive command
+    archive_parser = subparsers.add_parser('archive', help='Move old sessions and samples to the columnar archive')
+    archive_parser.add_argument('--days', type=int, 
+                               help='Archive closed days older than this many days')
+    
+    # Metrics command
+    metrics_parser = subparsers.add_parser('metrics', help='Show latency metrics of the running application')
+    metrics_parser.add_argument('--port', type=int, help='Port of the running web dashboard')
+    metrics_parser.add_argument('--prometheus', action='store_true', 
+                               help='Print the raw Prometheus text format')
     
     # Web command
     web_parser = subparsers.add_parser('web', help='Start web dashboard only')
@@ -349,6 +451,8 @@ def main():
         run_cli_mode(args)
         return
     
+    start_scheduler()
+    
     # Default: Run system tray application
     if args.no_tray:
         logger.info("System tray disabled, running tracking only")
@@ -0,0 +1,290 @@
+"""
+Runtime metrics
+
+Low-overhead counters, gauges and latency histograms for the tracker,
+database, ingest and web hot paths. Latencies go into fixed log-spaced
+buckets, so recording is a bisect and a few additions under a lock and
+memory stays constant; p50/p95/p99 are estimated from the buckets when
+metrics are read. Exposed in the Prometheus text format on /api/metrics
+and summarized by ``main.py metrics``.
+"""
+
+import time
+import bisect
+import functools
+import inspect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+PREFIX = 'activitywatcher_'
+
+# Histogram bucket upper bounds in seconds: 10us to ~60s, 1.5x apart
+LATENCY_BUCKETS = tuple(1e-5 * 1.5 ** i for i in range(39))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRIC_HELP = {
+    'tracker_tick_seconds': 'Time spent in one window tracker tick',
+    'tracker_tick_overruns_total': 'Tracker ticks that took longer than the tracking interval',
+    'tracker_focus_event_seconds': 'Time spent handling one focus change event',
+    'tracker_snapshot_seconds': 'Time spent reading OS signals (idle time, pointer, processes) for a tick',
+    'process_scan_seconds': 'Time spent in the psutil process table scan',
+    'enhanced_sample_seconds': 'Time spent recording one enhanced activity sample',
+    'ingest_flush_seconds': 'Time spent writing one batch from the write-behind buffer',
+    'db_call_seconds': 'Time spent in ActivityDatabase methods',
+    'db_call_errors_total': 'ActivityDatabase method calls that raised',
+    'http_request_seconds': 'Time spent handling dashboard HTTP requests',
+    'http_requests_total': 'Dashboard HTTP requests by endpoint and status'
+}
+
+class Histogram:
+    """Latency distribution over fixed buckets."""
+    
+    __slots__ = ('counts', 'count', 'sum', 'max', '_lock')
+    
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect.bisect_left(LATENCY_BUCKETS, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+    
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket."""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+            maximum = self.max
+        if not total:
+            return 0.0
+        
+        target = q * total
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= target:
+                lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+                upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else maximum
+                upper = min(upper, maximum)
+                return lower + (upper - lower) * (target - seen) / bucket_count
+            seen += bucket_count
+        return maximum
+    
+    def summary(self) -> Dict:
+        summary = {'count': self.count, 'sum': self.sum, 'max': self.max}
+        for q in QUANTILES:
+            summary[f'p{int(q * 100)}'] = self.quantile(q)
+        return summary
+
+class Counter:
+    """Monotonically increasing count."""
+    
+    __slots__ = ('value', '_lock')
+    
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class MetricsRegistry:
+    """Named, labeled counters and histograms plus gauges read on demand."""
+    
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._histograms = {}  # name -> {label key: Histogram}
+        self._counters = {}  # name -> {label key: Counter}
+        self._callbacks = {}  # name -> (kind, help, fn)
+        self._lock = threading.Lock()
+    
+    def _child(self, families: Dict, name: str, labels: Dict, factory):
+        key = _label_key(labels)
+        family = families.get(name)
+        child = family.get(key) if family is not None else None
+        if child is None:
+            with self._lock:
+                family = families.setdefault(name, {})
+                child = family.setdefault(key, factory())
+        return child
+    
+    def observe(self, name: str, seconds: float, **labels):
+        """Record a latency in seconds."""
+        if self.enabled:
+            self._child(self._histograms, name, labels, Histogram).observe(seconds)
+    
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase a counter."""
+        if self.enabled:
+            self._child(self._counters, name, labels, Counter).inc(amount)
+    
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time a block into a histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    
+    def timed(self, name: str, **labels):
+        """Decorator timing every call of a function into a histogram."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+    
+    def register_callback(self, name: str, fn: Callable[[], float], kind: str = 'gauge', help: str = ''):
+        """Expose a value read at scrape time, e.g. a queue depth or an existing counter.
+        
+        Registering the same name again replaces the previous callback.
+        """
+        with self._lock:
+            self._callbacks[name] = (kind, help, fn)
+    
+    def snapshot(self) -> Dict:
+        """Current values as plain data, keyed by metric name and label string."""
+        with self._lock:
+            histograms = {name: dict(family) for name, family in self._histograms.items()}
+            counters = {name: dict(family) for name, family in self._counters.items()}
+            callbacks = dict(self._callbacks)
+        
+        gauges = {}
+        for name, (kind, _, fn) in sorted(callbacks.items()):
+            try:
+                gauges[name] = fn()
+            except Exception:
+                continue
+        
+        return {
+            'histograms': {
+                f'{name}{_format_labels(key)}': histogram.summary()
+                for name, family in sorted(histograms.items())
+                for key, histogram in sorted(family.items())
+            },
+            'counters': {
+                f'{name}{_format_labels(key)}': counter.value
+                for name, family in sorted(counters.items())
+                for key, counter in sorted(family.items())
+            },
+            'gauges': gauges
+        }
+    
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format.
+        
+        Histograms are exposed as summaries with estimated quantiles.
+        """
+        with self._lock:
+            histograms = {name: dict(family) for name, family in self._histograms.items()}
+            counters = {name: dict(family) for name, family in self._counters.items()}
+            callbacks = dict(self._callbacks)
+        
+        lines = []
+        
+        def header(name: str, kind: str, help: str):
+            lines.append(f'# HELP {PREFIX}{name} {help or METRIC_HELP.get(name, name)}')
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+        
+        for name, family in sorted(histograms.items()):
+            header(name, 'summary', '')
+            for key, histogram in sorted(family.items()):
+                summary = histogram.summary()
+                for q in QUANTILES:
+                    labels = _format_labels(key, ('quantile', str(q)))
+                    lines.append(f'{PREFIX}{name}{labels} {summary[f"p{int(q * 100)}"]:.9g}')
+                lines.append(f'{PREFIX}{name}_sum{_format_labels(key)} {summary["sum"]:.9g}')
+                lines.append(f'{PREFIX}{name}_count{_format_labels(key)} {summary["count"]}')
+        
+        for name, family in sorted(counters.items()):
+            header(name, 'counter', '')
+            for key, counter in sorted(family.items()):
+                lines.append(f'{PREFIX}{name}{_format_labels(key)} {counter.value:.9g}')
+        
+        for name, (kind, help, fn) in sorted(callbacks.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            header(name, kind, help)
+            lines.append(f'{PREFIX}{name} {float(value):.9g}')
+        
+        return '\n'.join(lines) + '\n'
+
+def instrument_methods(registry: MetricsRegistry, name: str, errors: Optional[str] = None,
+                       exclude: Iterable[str] = ()):
+    """Class decorator timing every public method into ``name``, labeled by method.
+    
+    Generator methods are left alone, since timing them would only
+    measure creating the generator. With ``errors``, calls that raise
+    are also counted there.
+    """
+    excluded = set(exclude)
+    
+    def wrap(method_name: str, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                if errors:
+                    registry.inc(errors, method=method_name)
+                raise
+            finally:
+                registry.observe(name, time.perf_counter() - start, method=method_name)
+        return wrapper
+    
+    def decorator(cls):
+        for method_name, fn in list(vars(cls).items()):
+            if (method_name.startswith('_') or method_name in excluded or not inspect.isfunction(fn)
+                    or inspect.isgeneratorfunction(fn)):
+                continue
+            setattr(cls, method_name, wrap(method_name, fn))
+        return cls
+    
+    return decorator
+
+def load_metrics() -> MetricsRegistry:
+    """Build the registry from config.json settings."""
+    try:
+        from config import config
+    except ImportError:
+        from .config import config
+    
+    return MetricsRegistry(enabled=config.get('metrics_enabled', True))
+
+# Global metrics registry
+metrics = load_metrics()
\ No newline at end of file
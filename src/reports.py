@@ -41,7 +41,7 @@ class ReportGenerator:
         start_datetime = end_datetime - timedelta(days=6)
         
         # Get weekly stats
-        weekly_stats = self.db.get_weekly_stats()
+        weekly_stats = self.db.get_range_breakdown(start_datetime, end_datetime + timedelta(days=1))
         
         # Calculate totals and averages
         total_time = sum(day.get('total_time', 0) for day in weekly_stats)
@@ -79,16 +79,8 @@ class ReportGenerator:
             end_date = datetime(year, month_num + 1, 1) - timedelta(days=1)
         
         # Collect daily stats for the month
-        daily_stats = []
-        current_date = start_date
-        total_time = 0
-        
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            day_stats = self.db.get_daily_stats(date_str)
-            daily_stats.append(day_stats)
-            total_time += day_stats.get('total_time', 0)
-            current_date += timedelta(days=1)
+        daily_stats = self.db.get_range_breakdown(start_date, end_date + timedelta(days=1))
+        total_time = sum(day.get('total_time', 0) for day in daily_stats)
         
         # Get top apps for the month
         days_in_month = (end_date - start_date).days + 1
@@ -139,9 +131,7 @@ class ReportGenerator:
     
     def _get_hourly_breakdown(self, date: str) -> List[Dict]:
         """Get hourly breakdown of usage for a specific date."""
-        # This would require more detailed database queries
-        # For now, return a placeholder
-        return [{'hour': i, 'usage': 0} for i in range(24)]
+        return self.db.get_hourly_breakdown(date)
     
     def _calculate_productivity_metrics(self, date: str) -> Dict:
         """Calculate productivity metrics for a date."""
@@ -233,13 +223,40 @@ class ReportGenerator:
     
     def _calculate_app_usage_patterns(self, app_name: str, days: int) -> Dict:
         """Calculate usage patterns for an app."""
-        # This would require more detailed analysis
-        # For now, return basic patterns
-        return {
-            'peak_hours': [9, 10, 11, 14, 15, 16],  # Common work hours
-            'usage_frequency': 'daily',
-            'session_pattern': 'regular'
-        }
+        patterns = self.db.get_usage_patterns(days, app_name)
+        
+        # How regularly the app is used
+        active_ratio = patterns['active_days'] / days if days else 0
+        if active_ratio >= 5 / 7:
+            usage_frequency = 'daily'
+        elif active_ratio >= 1 / 7:
+            usage_frequency = 'weekly'
+        elif active_ratio > 0:
+            usage_frequency = 'occasional'
+        else:
+            usage_frequency = 'none'
+        
+        # Typical session length from the median histogram bin
+        histogram = patterns['session_length_histogram']
+        total_sessions = sum(entry['sessions'] for entry in histogram)
+        session_pattern = 'none'
+        seen = 0
+        for entry in histogram:
+            seen += entry['sessions']
+            if total_sessions and seen * 2 >= total_sessions:
+                if entry['min_seconds'] < 300:
+                    session_pattern = 'short bursts'
+                elif entry['min_seconds'] >= 1800:
+                    session_pattern = 'long sessions'
+                else:
+                    session_pattern = 'regular'
+                break
+        
+        patterns.update({
+            'usage_frequency': usage_frequency,
+            'session_pattern': session_pattern
+        })
+        return patterns
     
     def _generate_daily_summary(self, daily_stats: Dict) -> str:
         """Generate a human-readable daily summary."""
@@ -0,0 +1,134 @@
+"""
+Response cache for dashboard API endpoints
+
+Serialized JSON payloads are kept in memory per endpoint and query
+arguments, each with a TTL and the set of tables it was computed from.
+Entries are dropped as soon as the database reports a write to one of
+those tables, so the TTL only bounds staleness from the passage of time
+(e.g. "today" rolling over).
+"""
+
+import json
+import time
+import hashlib
+from threading import Lock
+from typing import Callable, Dict, Hashable, Iterable, Optional
+
+try:
+    from metrics import metrics
+except ImportError:
+    from .metrics import metrics
+
+# Seconds an endpoint's payload may be served from cache; override per
+# endpoint with the api_cache_ttls setting.
+DEFAULT_TTLS = {
+    'stats_today': 30,
+    'stats_weekly': 300,
+    'apps_top': 300,
+    'enhanced_stats': 300,
+    'productivity_trends': 600
+}
+
+class CachedPayload:
+    """A serialized response body and its validator."""
+    
+    __slots__ = ('body', 'etag', 'expires', 'tables')
+    
+    def __init__(self, body: bytes, expires: float, tables: frozenset):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.expires = expires
+        self.tables = tables
+
+class ResponseCache:
+    """Thread-safe TTL cache of JSON payloads with table-based invalidation."""
+    
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, default_ttl: float = 30.0):
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        
+        self._entries = {}
+        self._lock = Lock()
+        self._generation = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+    
+    def ttl(self, name: str) -> float:
+        """TTL in seconds for an endpoint."""
+        return self.ttls.get(name, self.default_ttl)
+    
+    def get(self, name: str, key: Hashable, compute: Callable[[], object],
+            tables: Iterable[str] = ()) -> CachedPayload:
+        """Return the cached payload for (name, key), computing it on a miss.
+        
+        ``tables`` lists the tables the payload is derived from; a write to
+        any of them evicts the entry.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((name, key))
+            if entry is not None and entry.expires > now:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            generation = self._generation
+        
+        body = json.dumps(compute(), default=str).encode('utf-8')
+        entry = CachedPayload(body, now + self.ttl(name), frozenset(tables))
+        
+        with self._lock:
+            # Don't store a result that may predate an invalidation
+            if generation == self._generation:
+                self._entries[(name, key)] = entry
+        return entry
+    
+    def invalidate(self, tables: Optional[Iterable[str]] = None):
+        """Drop entries derived from any of ``tables``, or everything."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if tables is None:
+                self._entries.clear()
+                return
+            tables = set(tables)
+            for cache_key in [k for k, entry in self._entries.items() if entry.tables & tables]:
+                del self._entries[cache_key]
+    
+    def record_not_modified(self):
+        """Count a request answered with 304 Not Modified."""
+        self.not_modified += 1
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters."""
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'not_modified': self.not_modified,
+            'invalidations': self.invalidations
+        }
+
+def load_response_cache() -> ResponseCache:
+    """Build the response cache from config.json overrides."""
+    try:
+        from config import config
+    except ImportError:
+        from .config import config
+    
+    return ResponseCache(ttls=config.get('api_cache_ttls'))
+
+# Global response cache instance
+response_cache = load_response_cache()
+
+metrics.register_callback('response_cache_hits_total', lambda: response_cache.hits, kind='counter',
+                          help='Dashboard API responses served from cache')
+metrics.register_callback('response_cache_misses_total', lambda: response_cache.misses, kind='counter',
+                          help='Dashboard API responses computed on a cache miss')
\ No newline at end of file
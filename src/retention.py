@@ -0,0 +1,210 @@
+"""
+Retention and compaction
+
+Deletes rows past their table's retention period in small id-bounded
+chunks. Each chunk is its own short write transaction followed by a
+pause, so the tracker's writes interleave with a large cleanup instead
+of waiting behind one long DELETE. Deleted sessions and samples are
+subtracted from the rollups in the same transaction, so reports stay
+consistent with what is left. Freed pages are then handed back to the
+file system with incremental vacuum, a few at a time.
+"""
+
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+try:
+    from config import config
+except ImportError:
+    from .config import config
+
+try:
+    from archive import ARCHIVE_TABLES
+except ImportError:
+    from .archive import ARCHIVE_TABLES
+
+try:
+    from timestamps import to_epoch_ms
+except ImportError:
+    from .timestamps import to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+# Tables under retention: table -> time column
+RETENTION_TABLES = {
+    'activities': 'timestamp',
+    'app_sessions': 'start_time',
+    'enhanced_activities': 'timestamp',
+    'daily_summaries': 'date'
+}
+
+# Rows deleted per transaction, and the pause in seconds after each chunk
+CHUNK_SIZE = 2000
+CHUNK_PAUSE = 0.05
+
+# Pages released per incremental vacuum step
+VACUUM_STEP_PAGES = 1024
+
+# db_meta key holding the time of the last completed run
+LAST_RUN_KEY = 'retention_last_run'
+
+class RetentionEngine:
+    """Apply per-table retention policies to an ActivityDatabase and compact its file."""
+    
+    def __init__(self, database, chunk_size: int = CHUNK_SIZE, pause: float = CHUNK_PAUSE,
+                 vacuum_step_pages: int = VACUUM_STEP_PAGES):
+        self.db = database
+        self.chunk_size = max(1, chunk_size)
+        self.pause = pause
+        self.vacuum_step_pages = max(1, vacuum_step_pages)
+    
+    def policies(self, days_to_keep: Optional[int] = None) -> Dict[str, Optional[int]]:
+        """Days to keep per table; None keeps a table forever.
+        
+        ``days_to_keep`` applies to every table. Otherwise ``retention_days``
+        is the default and ``retention_table_days`` overrides it per table.
+        """
+        if days_to_keep is not None:
+            return {table: days_to_keep for table in RETENTION_TABLES}
+        default = config.get('retention_days', 90)
+        overrides = config.get('retention_table_days', {})
+        return {table: overrides.get(table, default) for table in RETENTION_TABLES}
+    
+    def is_due(self) -> bool:
+        """Whether ``retention_interval_hours`` have passed since the last completed run."""
+        with self.db.pool.reader() as conn:
+            last_run = self.db._get_meta(conn, LAST_RUN_KEY)
+        if last_run is None:
+            return True
+        interval = timedelta(hours=config.get('retention_interval_hours', 24))
+        return datetime.now() - datetime.fromisoformat(last_run) >= interval
+    
+    def run(self, days_to_keep: Optional[int] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, int]:
+        """Delete expired rows from every table, then compact. Returns rows deleted per table.
+        
+        With archiving enabled, ended sessions and samples are moved to the
+        archive first and only abandoned open sessions are deleted from
+        those tables. ``should_stop`` is checked between chunks; when it
+        returns True the run ends early and the rest is left for the next
+        run.
+        """
+        self.db.complete_migration()
+        policies = self.policies(days_to_keep)
+        archiving = config.get('archive_enabled', True) and self.db.archive.available
+        if archiving:
+            kept = [policies[table] for table in ARCHIVE_TABLES if policies.get(table) is not None]
+            self.db.archive_old_data(min(kept + [config.get('archive_after_days', 30)]),
+                                     self.chunk_size, self.pause, should_stop)
+            if should_stop and should_stop():
+                return {}
+        
+        deleted = {}
+        for table, days in policies.items():
+            if days is None:
+                continue
+            # The archive takes every ended row; only sessions that never ended stay behind
+            if archiving and table in ARCHIVE_TABLES and table != 'app_sessions':
+                continue
+            cutoff = datetime.now() - timedelta(days=days)
+            deleted[table] = self.purge(table, cutoff, open_only=archiving and table == 'app_sessions',
+                                        should_stop=should_stop)
+            if deleted[table]:
+                logger.info(f"Deleted {deleted[table]} rows of {table} older than {days} days")
+            if should_stop and should_stop():
+                break
+        else:
+            self.compact(should_stop)
+            with self.db.pool.writer() as conn:
+                self.db._set_meta(conn, LAST_RUN_KEY, datetime.now().isoformat(timespec='seconds'))
+        
+        changed = [table for table, count in deleted.items() if count]
+        if changed:
+            self.db._notify_change(*changed)
+        return deleted
+    
+    def purge(self, table: str, cutoff: datetime, open_only: bool = False,
+              should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """Delete rows of ``table`` older than ``cutoff`` a chunk at a time. Returns rows deleted.
+        
+        Each chunk is an id range taken from the oldest matching rows, so
+        it is found through the time index and deleted through the
+        primary key. With ``open_only``, only sessions that never ended
+        are deleted.
+        """
+        time_column = RETENTION_TABLES[table]
+        condition = f'{time_column} < ?'
+        if open_only:
+            condition += ' AND end_time IS NULL'
+        bound = cutoff.strftime('%Y-%m-%d') if time_column == 'date' else to_epoch_ms(cutoff)
+        
+        deleted = 0
+        while True:
+            with self.db.pool.writer() as conn:
+                lower, upper = conn.execute(f'''
+                    SELECT MIN(id), MAX(id) FROM (
+                        SELECT id FROM {table} WHERE {condition} ORDER BY {time_column} LIMIT ?
+                    )
+                ''', (bound, self.chunk_size)).fetchone()
+                if lower is None:
+                    break
+                where = f'id >= ? AND id <= ? AND {condition}'
+                params = (lower, upper, bound)
+                self.db._unroll_rows(conn, table, where, params)
+                deleted += conn.execute(f'DELETE FROM {table} WHERE {where}', params).rowcount
+            
+            if should_stop and should_stop():
+                break
+            time.sleep(self.pause)
+        
+        if deleted:
+            with self.db.pool.writer() as conn:
+                self.db._prune_rollups(conn, cutoff)
+        return deleted
+    
+    def compact(self, should_stop: Optional[Callable[[], bool]] = None) -> int:
+        """Return free pages to the file system. Returns the number of pages released.
+        
+        Free pages are released in steps of ``vacuum_step_pages`` with a
+        pause between steps. Databases created before incremental vacuum
+        was enabled are left alone, since converting them rewrites the
+        whole file; see ``convert()``.
+        """
+        with self.db.pool.writer() as conn:
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                if free_pages:
+                    logger.warning(f"{free_pages} free database pages cannot be released until the "
+                                   f"database is converted with 'cleanup --vacuum'")
+                return 0
+        
+        released = 0
+        while free_pages:
+            with self.db.pool.writer() as conn:
+                # execute() only steps this pragma once, releasing a single page
+                conn.executescript(f'PRAGMA incremental_vacuum({self.vacuum_step_pages})')
+                remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            released += free_pages - remaining
+            if remaining >= free_pages or (should_stop and should_stop()):
+                break
+            free_pages = remaining
+            time.sleep(self.pause)
+        
+        if released:
+            logger.info(f"Released {released} free database pages")
+        return released
+    
+    def convert(self):
+        """Switch the database to incremental vacuum with a full VACUUM.
+        
+        Rewrites the whole file while holding the writer, so it is only
+        run on request, never from the background job.
+        """
+        with self.db.pool.writer() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                return
+            logger.info("Converting the database to incremental vacuum")
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
\ No newline at end of file
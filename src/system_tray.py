@@ -407,16 +407,15 @@ All data stays on your local machine - no cloud sync or external servers."""
             return  # Already running
         
         try:
-            def run_server():
-                try:
-                    from web_dashboard import create_app
-                except ImportError:
-                    from web_dashboard import create_app
-                app = create_app()
-                app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False)
+            try:
+                from web_dashboard import create_app
+                from web_server import WebServer
+            except ImportError:
+                from web_dashboard import create_app
+                from web_server import WebServer
             
-            self.web_server_thread = threading.Thread(target=run_server, daemon=True)
-            self.web_server_thread.start()
+            self.web_server = WebServer(create_app(), host='127.0.0.1', port=5000)
+            self.web_server_thread = self.web_server.start()
             logger.info("Web server started on http://localhost:5000")
             
         except Exception as e:
@@ -430,6 +429,11 @@ All data stays on your local machine - no cloud sync or external servers."""
         if self.tracking_enabled:
             activity_tracker.stop_tracking()
         
+        # Close open dashboard streams and let in-flight requests finish
+        if self.web_server:
+            self.web_server.stop()
+            self.web_server = None
+        
         # Stop the icon
         icon.stop()
         
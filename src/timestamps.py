@@ -0,0 +1,28 @@
+"""
+Epoch-millisecond timestamps
+
+The raw activity tables store times as integer milliseconds since the
+Unix epoch (UTC). The rest of the application works with naive local
+datetimes; these helpers convert between the two exactly, without going
+through floats.
+"""
+
+from datetime import datetime
+from typing import Optional, Union
+
+TimeValue = Union[datetime, str, int]
+
+def to_epoch_ms(value: Optional[TimeValue]) -> Optional[int]:
+    """Milliseconds since the epoch for a local datetime, ISO string or epoch ms."""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.replace(microsecond=0).timestamp()) * 1000 + value.microsecond // 1000
+
+def from_epoch_ms(value: Optional[int]) -> Optional[datetime]:
+    """Local naive datetime for milliseconds since the epoch."""
+    if value is None:
+        return None
+    seconds, millis = divmod(int(value), 1000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=millis * 1000)
\ No newline at end of file
@@ -1,11 +1,84 @@
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, Response, render_template, jsonify, request, send_from_directory
 from flask_cors import CORS
+import io
+import csv
 import json
+import base64
 from datetime import datetime, timedelta
 from config import config
-from database import db
+from database import db, EXPORT_TABLES
+from response_cache import response_cache
+from timestamps import to_epoch_ms
+from metrics import metrics
+from web_server import enable_compression, enable_request_metrics
 import os
 
+# Drop cached payloads whenever the tables they were computed from change
+db.add_change_listener(response_cache.invalidate)
+
+def encode_cursor(key) -> str:
+    """Encode a pagination key as an opaque URL-safe token."""
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_cursor(token: str):
+    """Decode a token from encode_cursor; raises ValueError if malformed."""
+    if not token:
+        return None
+    try:
+        time_value, row_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return time_value, int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def _csv_lines(columns, rows, chunk_size: int = 65536):
+    """Render rows as CSV text in chunks of about ``chunk_size`` characters."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _ndjson_lines(rows, chunk_size: int = 65536):
+    """Render rows as newline-delimited JSON in chunks of about ``chunk_size`` characters."""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, default=str) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield ''.join(lines)
+
+def cached_json(name: str, compute, tables=()):
+    """Serve ``compute()`` as JSON through the shared response cache.
+    
+    Responses carry an ETag; a request whose If-None-Match still matches
+    gets an empty 304 Not Modified.
+    """
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    payload = response_cache.get(name, key, compute, tables)
+    
+    if request.if_none_match.contains_weak(payload.etag):
+        response_cache.record_not_modified()
+        response = Response(status=304)
+    else:
+        response = Response(payload.body, mimetype='application/json')
+    response.set_etag(payload.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 def create_app():
     """Create and configure the Flask application."""
     app = Flask(__name__)
@@ -15,6 +88,11 @@ def create_app():
     app.config['SECRET_KEY'] = 'local-activity-watcher-secret'
     app.config['TEMPLATES_AUTO_RELOAD'] = True
     
+    if metrics.enabled:
+        enable_request_metrics(app)
+    if config.get('web_compression', True):
+        enable_compression(app, min_size=config.get('web_compression_min_size', 1024))
+    
     @app.route('/')
     def index():
         """Main dashboard page."""
@@ -24,8 +102,7 @@ def create_app():
     def get_today_stats():
         """Get today's statistics."""
         try:
-            stats = db.get_daily_stats()
-            return jsonify(stats)
+            return cached_json('stats_today', db.get_daily_stats, ('app_sessions',))
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
@@ -33,8 +110,7 @@ def create_app():
     def get_weekly_stats():
         """Get weekly statistics."""
         try:
-            stats = db.get_weekly_stats()
-            return jsonify(stats)
+            return cached_json('stats_weekly', db.get_weekly_stats, ('app_sessions',))
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
@@ -44,8 +120,7 @@ def create_app():
         try:
             days = request.args.get('days', 7, type=int)
             limit = request.args.get('limit', 10, type=int)
-            apps = db.get_top_apps(days=days, limit=limit)
-            return jsonify(apps)
+            return cached_json('apps_top', lambda: db.get_top_apps(days=days, limit=limit), ('app_sessions',))
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
@@ -69,11 +144,46 @@ def create_app():
             if not start_date or not end_date:
                 return jsonify({'error': 'start_date and end_date are required'}), 400
             
-            data = db.export_data(start_date, end_date)
-            return jsonify(data)
+            limit = min(max(request.args.get('limit', 1000, type=int), 1), 10000)
+            after = decode_cursor(request.args.get('cursor'))
+            sessions, next_key = db.get_export_page(start_date, end_date, after, limit)
+            return jsonify({'sessions': sessions, 'next_cursor': encode_cursor(next_key)})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/export')
+    def export_rows():
+        """Stream sessions or enhanced samples for a date range as NDJSON or CSV."""
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        table = request.args.get('table', 'sessions')
+        export_format = request.args.get('format', 'ndjson')
+        
+        if not start_date or not end_date:
+            return jsonify({'error': 'start_date and end_date are required'}), 400
+        if table not in EXPORT_TABLES:
+            return jsonify({'error': f"table must be one of {', '.join(EXPORT_TABLES)}"}), 400
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': 'format must be ndjson or csv'}), 400
+        # Rows are read lazily once the headers are sent, so bad dates must fail here
+        try:
+            to_epoch_ms(start_date)
+            to_epoch_ms(end_date)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        rows = db.iter_export_rows(start_date, end_date, table)
+        if export_format == 'csv':
+            body, mimetype = _csv_lines(EXPORT_TABLES[table][2], rows), 'text/csv'
+        else:
+            body, mimetype = _ndjson_lines(rows), 'application/x-ndjson'
+        
+        filename = f"{table}_{start_date}_{end_date}.{export_format}"
+        return Response(body, mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    
     @app.route('/api/config')
     def get_config():
         """Get current configuration."""
@@ -95,12 +205,11 @@ def create_app():
         """Get tracking status."""
         from window_tracker import activity_tracker
         
-        is_tracking = activity_tracker.is_tracking()
-        current_window = activity_tracker.get_current_window()
-        
+        state = activity_tracker.state
         return jsonify({
-            'tracking': is_tracking,
-            'current_window': current_window
+            'tracking': state.tracking,
+            'current_window': state.current_window,
+            'is_idle': state.is_idle
         })
     
     @app.route('/api/tracking/session-time')
@@ -108,13 +217,12 @@ def create_app():
         """Get current session time."""
         from window_tracker import activity_tracker
         
-        # Get session start time from activity tracker
-        session_start = getattr(activity_tracker, 'session_start_time', None)
+        # Get session start time from the tracker's state snapshot
+        state = activity_tracker.state
         
-        if session_start and activity_tracker.is_tracking():
-            from datetime import datetime
+        if state.session_start and state.tracking:
             current_time = datetime.now()
-            session_duration = (current_time - session_start).total_seconds()
+            session_duration = (current_time - state.session_start).total_seconds()
             
             hours = int(session_duration // 3600)
             minutes = int((session_duration % 3600) // 60)
@@ -136,6 +244,25 @@ def create_app():
                 'formatted': "00:00:00"
             })
     
+    @app.route('/api/stream')
+    def stream_events():
+        """Push live tracker events to the dashboard as Server-Sent Events."""
+        from window_tracker import activity_tracker
+        from broadcaster import broadcaster, format_event
+        
+        # Start each client from the current state, then follow the tracker
+        initial = [format_event('tick', activity_tracker.get_live_status())]
+        try:
+            initial.append(format_event('totals', db.get_daily_stats()))
+        except Exception as e:
+            initial.append(format_event('error', {'error': str(e)}))
+        
+        return Response(
+            broadcaster.stream(initial, heartbeat=config.get('stream_heartbeat', 15)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
     @app.route('/api/tracking/toggle', methods=['POST'])
     def toggle_tracking():
         """Toggle tracking on/off."""
@@ -167,8 +294,7 @@ def create_app():
         """Get enhanced statistics including productivity and activity patterns."""
         try:
             days = request.args.get('days', 7, type=int)
-            stats = db.get_enhanced_stats(days=days)
-            return jsonify(stats)
+            return cached_json('enhanced_stats', lambda: db.get_enhanced_stats(days=days), ('enhanced_activities',))
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
@@ -187,25 +313,50 @@ def create_app():
         """Get productivity trends over time."""
         try:
             days = request.args.get('days', 30, type=int)
-            trends = db.get_productivity_trends(days=days)
-            return jsonify(trends)
+            return cached_json('productivity_trends', lambda: db.get_productivity_trends(days=days),
+                               ('enhanced_activities',))
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     @app.route('/api/enhanced/activity-intensity')
     def get_activity_intensity():
-        """Get current activity intensity."""
+        """Get current activity intensity and recent averages from memory."""
         try:
             from activity_monitor import enhanced_activity_tracker
-            intensity = enhanced_activity_tracker.get_activity_intensity()
-            is_idle = enhanced_activity_tracker.is_user_idle()
+            seconds = request.args.get('seconds', 300, type=int)
+            recent = enhanced_activity_tracker.get_recent_activity(seconds)
             return jsonify({
-                'intensity': intensity,
-                'is_idle': is_idle
+                'intensity': recent['intensity'],
+                'is_idle': recent['is_idle'],
+                'avg_intensity': recent['mean_intensity'],
+                'idle_fraction': recent['idle_fraction'],
+                'samples': recent['samples'],
+                'window_seconds': seconds
             })
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/enhanced/ingest-stats')
+    def get_ingest_stats():
+        """Get write-behind ingest queue depth and flush latency."""
+        try:
+            from activity_monitor import enhanced_activity_tracker
+            return jsonify(enhanced_activity_tracker.get_ingest_stats())
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/cache/stats')
+    def get_cache_stats():
+        """Get response cache hit/miss counters."""
+        return jsonify(response_cache.stats())
+    
+    @app.route('/api/metrics')
+    def get_metrics():
+        """Get runtime latency histograms and counters in Prometheus text format."""
+        if request.args.get('format') == 'json':
+            return jsonify(metrics.snapshot())
+        return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+    
     @app.route('/api/session/current')
     def get_current_session():
         """Get current session information."""
@@ -488,7 +639,7 @@ def create_templates():
             <button class="btn btn-warning" onclick="showSettings()">Settings</button>
         </div>
     </div>
-
+    
     <script>
         let trackingStatus = false;
         
@@ -0,0 +1,268 @@
+"""
+Dashboard web server
+
+Serves the Flask dashboard with a production server instead of Flask's
+development server. Three backends are available:
+
+- ``waitress``: a threaded production WSGI server (optional dependency)
+- ``werkzeug``: Werkzeug's threaded WSGI server, always available
+- ``asgi``: uvicorn serving the app through asgiref's WSGI-to-ASGI adapter
+  (optional dependencies)
+
+``auto`` picks waitress when installed and falls back to werkzeug. Each
+open dashboard stream holds one connection (and, in the WSGI backends,
+one thread) for as long as the tab is open.
+"""
+
+import gzip
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from flask import g, request
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    from waitress.server import create_server as create_waitress_server
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+try:
+    import uvicorn
+    from asgiref.wsgi import WsgiToAsgi
+    ASGI_AVAILABLE = True
+except ImportError:
+    ASGI_AVAILABLE = False
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+try:
+    from config import config
+    from metrics import metrics
+except ImportError:
+    from .config import config
+    from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain',
+    'application/javascript', 'text/javascript'
+}
+
+def enable_compression(app, min_size: int = 1024, level: int = 6, memo_size: int = 64):
+    """Compress eligible responses with brotli or gzip.
+    
+    Streamed responses (such as the live event stream) are left alone.
+    Compressed bodies of responses that carry an ETag are memoized, so a
+    cached payload is only compressed once per encoding. The ETag is made
+    weak because the bytes on the wire differ per encoding.
+    """
+    memo = OrderedDict()
+    memo_lock = threading.Lock()
+    
+    def choose_encoding() -> Optional[str]:
+        accepted = request.accept_encodings
+        if BROTLI_AVAILABLE and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+    
+    def compress(body: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(body, quality=min(level, 11))
+        return gzip.compress(body, compresslevel=level)
+    
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+        
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        
+        etag, _ = response.get_etag()
+        if etag:
+            key = (etag, encoding)
+            with memo_lock:
+                compressed = memo.get(key)
+                if compressed is not None:
+                    memo.move_to_end(key)
+            if compressed is None:
+                compressed = compress(body, encoding)
+                with memo_lock:
+                    memo[key] = compressed
+                    while len(memo) > memo_size:
+                        memo.popitem(last=False)
+            response.set_etag(etag, weak=True)
+        else:
+            compressed = compress(body, encoding)
+        
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+    
+    return app
+
+def enable_request_metrics(app):
+    """Time every request into the http_request_seconds histogram.
+    
+    Requests are labeled by route pattern rather than path, so URL
+    parameters do not create a series per value. Register this before
+    enable_compression() so the timing includes compressing the body.
+    """
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+    
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.observe('http_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+            metrics.inc('http_requests_total', endpoint=endpoint, status=response.status_code)
+        return response
+    
+    return app
+
+class WebServer:
+    """Run the dashboard app on a selectable backend with graceful shutdown."""
+    
+    def __init__(self, app, host: str = '127.0.0.1', port: int = 5000,
+                 backend: Optional[str] = None, threads: Optional[int] = None,
+                 keep_alive: Optional[float] = None):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.backend = self._resolve_backend(backend or config.get('web_backend', 'auto'))
+        self.threads = threads or config.get('web_threads', 16)
+        self.keep_alive = keep_alive if keep_alive is not None else config.get('web_keep_alive', 5)
+        
+        self._server = None
+        self._thread = None
+        self._serving = False
+    
+    def _resolve_backend(self, backend: str) -> str:
+        """Map the configured backend to one that can run here."""
+        if backend == 'auto':
+            return 'waitress' if WAITRESS_AVAILABLE else 'werkzeug'
+        if backend == 'waitress' and not WAITRESS_AVAILABLE:
+            logger.warning("waitress is not installed, falling back to werkzeug")
+            return 'werkzeug'
+        if backend == 'asgi' and not ASGI_AVAILABLE:
+            logger.warning("uvicorn/asgiref are not installed, falling back to werkzeug")
+            return 'werkzeug'
+        if backend not in ('waitress', 'werkzeug', 'asgi'):
+            logger.warning(f"Unknown web backend {backend!r}, using werkzeug")
+            return 'werkzeug'
+        return backend
+    
+    def _create_server(self):
+        """Bind the listening socket for the selected backend."""
+        if self.backend == 'waitress':
+            return create_waitress_server(
+                self.app, host=self.host, port=self.port,
+                threads=self.threads, channel_timeout=max(1, int(self.keep_alive))
+            )
+        
+        if self.backend == 'asgi':
+            return uvicorn.Server(uvicorn.Config(
+                WsgiToAsgi(self.app), host=self.host, port=self.port,
+                timeout_keep_alive=int(self.keep_alive), log_level='warning'
+            ))
+        
+        # Werkzeug starts one thread per connection; HTTP/1.1 enables keep-alive
+        handler = WSGIRequestHandler
+        if self.keep_alive:
+            handler = type('KeepAliveRequestHandler', (WSGIRequestHandler,), {
+                'protocol_version': 'HTTP/1.1',
+                'timeout': self.keep_alive
+            })
+        return make_server(self.host, self.port, self.app, threaded=True, request_handler=handler)
+    
+    def serve_forever(self):
+        """Serve requests on the current thread until stop() is called."""
+        if self._server is None:
+            self._server = self._create_server()
+        self._serving = True
+        logger.info(f"Web dashboard serving on http://{self.host}:{self.port} ({self.backend})")
+        
+        if self.backend == 'waitress':
+            try:
+                self._server.run()
+            except OSError:
+                # Raised from the event loop once the sockets are closed by stop()
+                pass
+        elif self.backend == 'asgi':
+            self._server.run()
+        else:
+            self._server.serve_forever()
+    
+    def start(self) -> threading.Thread:
+        """Serve requests on a background thread."""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        # Bind before returning so port conflicts surface to the caller
+        self._server = self._create_server()
+        self._thread = threading.Thread(target=self.serve_forever, name='web-server', daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self, timeout: float = 5.0):
+        """Stop accepting requests, end open event streams and wait for the server."""
+        try:
+            from broadcaster import broadcaster
+        except ImportError:
+            from .broadcaster import broadcaster
+        broadcaster.close_streams()
+        
+        server = self._server
+        if server is not None:
+            try:
+                if self.backend == 'waitress':
+                    server.close()
+                elif self.backend == 'asgi':
+                    server.should_exit = True
+                else:
+                    # shutdown() waits for serve_forever(), so only call it once serving began
+                    if self._serving:
+                        server.shutdown()
+                    server.server_close()
+            except Exception as e:
+                logger.error(f"Error stopping web server: {e}")
+        
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self._server = None
+        self._thread = None
+        self._serving = False
+        logger.info("Web dashboard stopped")
+
+def serve_dashboard(app, host: str = '127.0.0.1', port: int = 5000, **kwargs) -> WebServer:
+    """Serve the dashboard on the current thread until interrupted."""
+    server = WebServer(app, host=host, port=port, **kwargs)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return server
\ No newline at end of file
@@ -1,19 +1,41 @@
 import sys
 import time
+import select
 import platform
 import logging
+from collections import namedtuple, OrderedDict
+from queue import Queue, Empty
 from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 from abc import ABC, abstractmethod
 
+try:
+    from metrics import metrics
+except ImportError:
+    from .metrics import metrics
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# A change of active window pushed by an event-driven tracker.
+# ``window`` is (app_name, window_title) or None when nothing is focused.
+FocusEvent = namedtuple('FocusEvent', ['timestamp', 'window'])
+
+# Last observed tracker state. The tracker replaces the whole tuple on every
+# change, so readers on other threads get a consistent view without locking
+# and never touch the windowing system.
+TrackerState = namedtuple('TrackerState', [
+    'tracking', 'current_window', 'session_id', 'session_start', 'is_idle', 'idle_time', 'updated_at'
+])
+
 class WindowTracker(ABC):
     """Abstract base class for window tracking."""
     
+    # Pid owning the window last returned by get_active_window, if known
+    active_pid: Optional[int] = None
+    
     @abstractmethod
     def get_active_window(self) -> Optional[Tuple[str, str]]:
         """Get the active window information.
@@ -57,6 +79,7 @@ class WindowsWindowTracker(WindowTracker):
             
             # Get process ID
             _, pid = self.win32process.GetWindowThreadProcessId(hwnd)
+            self.active_pid = pid
             
             # Get process name
             try:
@@ -101,6 +124,7 @@ class MacOSWindowTracker(WindowTracker):
                 return None
             
             app_name = active_app.get('NSApplicationName', 'Unknown')
+            self.active_pid = active_app.get('NSApplicationProcessIdentifier')
             
             # Get window information
             window_list = self.CGWindowListCopyWindowInfo(
@@ -124,90 +148,272 @@ class MacOSWindowTracker(WindowTracker):
             return None
 
 class LinuxWindowTracker(WindowTracker):
-    """Linux-specific window tracker using python-xlib."""
+    """Linux-specific window tracker using python-xlib.
     
-    def __init__(self):
+    Holds a single long-lived X display connection. In polling mode each
+    ``get_active_window`` call reuses it; in event mode (``start_events``)
+    a listener thread subscribes to ``PropertyNotify`` on the root window's
+    ``_NET_ACTIVE_WINDOW`` and the active window's title and queues a
+    ``FocusEvent`` for every change, so no polling is needed at all.
+    
+    Interned atoms are cached per connection, and resolved windows are kept
+    in an LRU keyed by X window id. Cached windows are subscribed to title
+    and destroy notifications, which invalidate their entry, so a
+    steady-state lookup is a single round trip for the active window id.
+    
+    ``display_name`` selects the X server (e.g. ``":99"`` for a local Xvfb);
+    it defaults to ``$DISPLAY``.
+    """
+    
+    TITLE_ATOMS = ('_NET_WM_NAME', 'WM_NAME')
+    
+    def __init__(self, display_name: Optional[str] = None, window_cache_size: int = 128):
+        self.display_name = display_name
+        self.window_cache_size = window_cache_size
+        self._display = None
+        self._atoms = {}
+        self._window_cache = OrderedDict()  # window id -> (app_name, pid, window_title)
+        self._lock = Lock()
+        self.events = None
+        self._event_thread = None
+        self._event_stop = Event()
+        self._current = None
+        self._watched_window = None
         try:
-            from Xlib import display
+            from Xlib import display, X
             from Xlib.error import XError
             self.display = display
+            self.X = X
             self.XError = XError
             self.available = True
         except ImportError:
             logger.error("python-xlib not available for Linux")
             self.available = False
     
+    def _get_display(self):
+        """Return the persistent display connection, opening it if needed."""
+        if self._display is None:
+            self._display = self.display.Display(self.display_name)
+        return self._display
+    
+    def _reset_display(self):
+        """Drop the display connection so the next call reconnects."""
+        if self._display is not None:
+            try:
+                self._display.close()
+            except Exception:
+                pass
+        self._display = None
+        self._atoms.clear()
+        self._window_cache.clear()
+        self._watched_window = None
+    
+    def _atom(self, name: str) -> int:
+        """Intern an atom once per connection."""
+        atom = self._atoms.get(name)
+        if atom is None:
+            atom = self._get_display().intern_atom(name)
+            self._atoms[name] = atom
+        return atom
+    
     def get_active_window(self) -> Optional[Tuple[str, str]]:
         """Get active window on Linux."""
         if not self.available:
             return None
         
+        # The listener thread owns the connection and keeps the answer current
+        if self._event_thread and self._event_thread.is_alive():
+            return self._current
+        
+        with self._lock:
+            try:
+                d = self._get_display()
+                # Apply invalidations queued since the last poll (no round trip)
+                while d.pending_events():
+                    self._process_x_event(d.next_event())
+                return self._resolve(self._get_active_x_window(d))
+            except Exception as e:
+                logger.error(f"Error getting active window on Linux: {e}")
+                self._reset_display()
+                return None
+    
+    def _get_active_x_window(self, d):
+        """Get the focused X window, preferring the EWMH active window hint."""
+        root = d.screen().root
         try:
-            # Connect to X server
-            d = self.display.Display()
-            
-            # Get the root window
-            root = d.screen().root
-            
-            # Get the currently focused window
-            focus = d.get_input_focus()
-            if focus.focus:
-                window = focus.focus
-                
-                # Get window properties
-                window_title = self._get_window_title(window)
-                app_name = self._get_app_name(window)
+            prop = root.get_full_property(self._atom('_NET_ACTIVE_WINDOW'), self.X.AnyPropertyType)
+            if prop and prop.value and prop.value[0]:
+                return d.create_resource_object('window', prop.value[0])
+        except self.XError:
+            pass
+        
+        # Fall back to the input focus for window managers without EWMH
+        focus = d.get_input_focus().focus
+        if focus and not isinstance(focus, int):
+            return focus
+        return None
+    
+    def _resolve(self, window) -> Optional[Tuple[str, str]]:
+        """Resolve an X window to (app_name, window_title), using the cache."""
+        if window is None:
+            self.active_pid = None
+            return None
+        
+        entry = self._window_cache.get(window.id)
+        if entry is not None:
+            self._window_cache.move_to_end(window.id)
+        else:
+            app_name, pid = self._get_app_info(window)
+            entry = (app_name, pid, self._get_window_title(window))
+            self._cache_window(window, entry)
+        self.active_pid = entry[1]
+        return (entry[0], entry[2])
+    
+    def _cache_window(self, window, entry: Tuple):
+        """Add a resolved window to the LRU and subscribe to its invalidations."""
+        if window.id not in self._window_cache:
+            window.change_attributes(event_mask=self.X.PropertyChangeMask | self.X.StructureNotifyMask,
+                                     onerror=self._ignore_x_error)
+        self._window_cache[window.id] = entry
+        
+        while len(self._window_cache) > self.window_cache_size:
+            evicted_id, _ = self._window_cache.popitem(last=False)
+            evicted = self._get_display().create_resource_object('window', evicted_id)
+            evicted.change_attributes(event_mask=self.X.NoEventMask, onerror=self._ignore_x_error)
+    
+    def _process_x_event(self, event) -> bool:
+        """Apply an X event to the caches.
+        
+        Returns True if the active window or its title may have changed.
+        """
+        X = self.X
+        watched_id = self._watched_window.id if self._watched_window is not None else None
+        
+        if event.type == X.DestroyNotify:
+            self._window_cache.pop(event.window.id, None)
+            return event.window.id == watched_id
+        
+        if event.type == X.PropertyNotify:
+            if event.atom == self._atom('_NET_ACTIVE_WINDOW') and event.window.id == self._get_display().screen().root.id:
+                return True
+            if event.atom in (self._atom(name) for name in self.TITLE_ATOMS):
+                self._window_cache.pop(event.window.id, None)
+                return event.window.id == watched_id
+        
+        return False
+    
+    def start_events(self) -> Queue:
+        """Start the event listener and return the queue it feeds.
+        
+        The queue receives a ``FocusEvent`` whenever the active window or
+        its title changes, and ``None`` when the listener stops.
+        """
+        if self._event_thread and self._event_thread.is_alive():
+            return self.events
+        
+        self.events = Queue()
+        self._event_stop.clear()
+        self._event_thread = Thread(target=self._event_loop, name='x11-focus-events', daemon=True)
+        self._event_thread.start()
+        return self.events
+    
+    def stop_events(self):
+        """Stop the event listener thread."""
+        self._event_stop.set()
+        if self._event_thread and self._event_thread.is_alive():
+            self._event_thread.join(timeout=2)
+        self._event_thread = None
+    
+    def _event_loop(self):
+        """Listen for focus and title changes on the X connection."""
+        while not self._event_stop.is_set():
+            try:
+                with self._lock:
+                    d = self._get_display()
+                    d.screen().root.change_attributes(event_mask=self.X.PropertyChangeMask)
+                    self._refresh_focus(d)
                 
-                return (app_name, window_title)
+                while not self._event_stop.is_set():
+                    # Block on the socket rather than polling the server; events may
+                    # already be buffered by the last request's reply
+                    if not d.pending_events():
+                        readable, _, _ = select.select([d.fileno()], [], [], 0.5)
+                        if not readable:
+                            continue
+                    
+                    changed = False
+                    with self._lock:
+                        while d.pending_events():
+                            if self._process_x_event(d.next_event()):
+                                changed = True
+                        if changed:
+                            self._refresh_focus(d)
             
-            return None
+            except Exception as e:
+                logger.error(f"Error in X11 event loop: {e}")
+                with self._lock:
+                    self._reset_display()
+                self._event_stop.wait(timeout=1)
         
-        except Exception as e:
-            logger.error(f"Error getting active window on Linux: {e}")
-            return None
+        self.events.put(None)
+    
+    def _refresh_focus(self, d):
+        """Re-read the active window and queue a change if there is one."""
+        window = self._get_active_x_window(d)
+        self._watched_window = window
+        
+        current = self._resolve(window)
+        if current != self._current:
+            self._current = current
+            self.events.put(FocusEvent(datetime.now(), current))
+    
+    def _ignore_x_error(self, *args):
+        """Ignore asynchronous errors for windows destroyed under us."""
+        pass
     
     def _get_window_title(self, window) -> str:
         """Get window title from X window."""
         try:
             # Try different properties for window title
-            for prop in ['_NET_WM_NAME', 'WM_NAME']:
+            for prop in self.TITLE_ATOMS:
                 try:
-                    atom = window.display.intern_atom(prop)
-                    title = window.get_full_property(atom, 0)
+                    title = window.get_full_property(self._atom(prop), 0)
                     if title and title.value:
-                        return title.value.decode('utf-8', errors='ignore')
+                        value = title.value
+                        return value.decode('utf-8', errors='ignore') if isinstance(value, bytes) else str(value)
                 except:
                     continue
             return "Unknown Window"
         except:
             return "Unknown Window"
     
-    def _get_app_name(self, window) -> str:
-        """Get application name from X window."""
+    def _get_app_info(self, window) -> Tuple[str, Optional[int]]:
+        """Get (application name, pid) from X window."""
+        pid = None
+        try:
+            pid_prop = window.get_full_property(self._atom('_NET_WM_PID'), 0)
+            if pid_prop and pid_prop.value:
+                pid = int(pid_prop.value[0])
+        except:
+            pass
+        
         try:
             # Try to get WM_CLASS
             wm_class = window.get_wm_class()
             if wm_class:
-                return wm_class[1] if len(wm_class) > 1 else wm_class[0]
-            
-            # Try to get process name
+                return (wm_class[1] if len(wm_class) > 1 else wm_class[0], pid)
+        except:
+            pass
+        
+        # Try to get process name
+        if pid:
             try:
-                atom = window.display.intern_atom('_NET_WM_PID')
-                pid_prop = window.get_full_property(atom, 0)
-                if pid_prop:
-                    pid = pid_prop.value[0]
-                    try:
-                        import psutil
-                        process = psutil.Process(pid)
-                        return process.name()
-                    except:
-                        pass
+                import psutil
+                return (psutil.Process(pid).name(), pid)
             except:
                 pass
-            
-            return "Unknown App"
-        except:
-            return "Unknown App"
+        
+        return ("Unknown App", pid)
 
 class ActivityTracker:
     """Main activity tracker that monitors active windows."""
@@ -222,17 +428,27 @@ class ActivityTracker:
         self.session_start_time = None
         self.session_data = {}  # Store session-specific data
         self.focus_sessions = []  # Track focused work sessions
+        self.focus_events = None  # Queue of FocusEvent when the tracker is event-driven
+        self.state = TrackerState(False, None, None, None, False, 0.0, None)
+        self._state_lock = Lock()  # serializes writers; readers just take self.state
         
         # Import database here to avoid circular imports
         try:
+            from config import config
             from database import db
             from activity_monitor import enhanced_activity_tracker
+            from broadcaster import broadcaster
         except ImportError:
+            from config import config
             from database import db
             from activity_monitor import enhanced_activity_tracker
+            from broadcaster import broadcaster
         
         self.db = db
         self.enhanced_tracker = enhanced_activity_tracker
+        self.events = broadcaster
+        self.is_idle = False
+        self.use_focus_events = config.get('linux_event_tracking', True)
         
         # Session management settings
         self.min_session_duration = 30  # Minimum session duration in seconds
@@ -261,6 +477,13 @@ class ActivityTracker:
         
         self.stop_event.clear()
         self.session_start_time = datetime.now()
+        self._update_state(tracking=self.tracking_enabled, session_start=self.session_start_time)
+        
+        # Prefer pushed focus changes over polling when the platform supports it
+        self.focus_events = None
+        if self.use_focus_events and hasattr(self.tracker, 'start_events'):
+            self.focus_events = self.tracker.start_events()
+        
         self.thread = Thread(target=self._tracking_loop, args=(interval,))
         self.thread.daemon = True
         self.thread.start()
@@ -269,74 +492,134 @@ class ActivityTracker:
     def stop_tracking(self):
         """Stop tracking activity."""
         self.stop_event.set()
+        if self.focus_events is not None:
+            self.tracker.stop_events()
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=2)
+        self.focus_events = None
         
         # End current session if exists
         if self.current_session:
             self.db.end_session(self.current_session)
             self.current_session = None
+        self._update_state(tracking=False, session_id=None)
+        
+        # Write out buffered samples before releasing pooled database connections
+        if self.enhanced_tracker:
+            self.enhanced_tracker.stop()
+        self.db.close()
         
         logger.info("Activity tracking stopped")
     
     def pause_tracking(self):
         """Pause tracking."""
         self.tracking_enabled = False
+        if self.enhanced_tracker:
+            self.enhanced_tracker.flush()
+        self._update_state(tracking=False)
+        self._publish_tick()
         logger.info("Activity tracking paused")
     
     def resume_tracking(self):
         """Resume tracking."""
         self.tracking_enabled = True
         self.session_start_time = datetime.now()
+        self._update_state(tracking=bool(self.thread and self.thread.is_alive()),
+                           session_start=self.session_start_time)
+        self._publish_tick()
         logger.info("Activity tracking resumed")
     
     def _tracking_loop(self, interval: int):
-        """Main tracking loop."""
+        """Main tracking loop.
+        
+        With an event-driven tracker, focus changes are handled as soon as
+        they are queued and the interval tick only samples activity data.
+        """
+        next_tick = time.monotonic()
         while not self.stop_event.is_set():
             try:
+                if self.focus_events is not None:
+                    timeout = next_tick - time.monotonic()
+                    if timeout > 0:
+                        try:
+                            event = self.focus_events.get(timeout=timeout)
+                        except Empty:
+                            event = None
+                        if event is not None and self.tracking_enabled:
+                            self._handle_focus_event(event)
+                        continue
+                
                 if self.tracking_enabled and self.tracker:
+                    tick_start = time.monotonic()
                     self._check_window_change()
+                    if time.monotonic() - tick_start > interval:
+                        metrics.inc('tracker_tick_overruns_total')
+                next_tick = time.monotonic() + interval
                 
                 # Wait for the specified interval
-                if self.stop_event.wait(timeout=interval):
+                if self.focus_events is None and self.stop_event.wait(timeout=interval):
                     break
                     
             except Exception as e:
                 logger.error(f"Error in tracking loop: {e}")
                 time.sleep(interval)
     
+    @metrics.timed('tracker_focus_event_seconds')
+    def _handle_focus_event(self, event):
+        """Handle a focus change pushed by an event-driven tracker."""
+        if event.window != self.last_window_info:
+            self._handle_window_change(event.window, event.timestamp)
+            self.last_window_info = event.window
+    
+    @metrics.timed('tracker_tick_seconds')
     def _check_window_change(self):
         """Check if the active window has changed."""
         try:
             current_window = self.tracker.get_active_window()
             
+            # Read idle time, pointer and process stats once for the whole tick
+            snapshot = None
+            if self.enhanced_tracker:
+                snapshot = self.enhanced_tracker.take_snapshot(current_window, self.tracker.active_pid)
+            
             # Always record enhanced activity data for current window
-            if current_window and self.enhanced_tracker:
+            if current_window and snapshot:
                 app_name, window_title = current_window
-                self.enhanced_tracker.record_enhanced_activity(app_name, window_title, 0)
+                self.enhanced_tracker.record_enhanced_activity(app_name, window_title, snapshot=snapshot)
             
             # Check for idle state and handle session management
-            if self.enhanced_tracker:
-                is_idle = self.enhanced_tracker.is_user_idle()
+            if snapshot:
+                is_idle = self.enhanced_tracker.is_user_idle(snapshot)
                 self._handle_idle_state(is_idle)
+                if is_idle != self.is_idle:
+                    self.is_idle = is_idle
+                    self.events.publish('idle', {'is_idle': is_idle, 'idle_time': snapshot.idle_time})
+                self._update_state(is_idle=is_idle, idle_time=snapshot.idle_time)
             
             if current_window != self.last_window_info:
-                self._handle_window_change(current_window)
+                self._handle_window_change(current_window, snapshot.timestamp if snapshot else None)
                 self.last_window_info = current_window
+            
+            self._publish_tick()
         
         except Exception as e:
             logger.error(f"Error checking window change: {e}")
     
-    def _handle_window_change(self, current_window):
-        """Handle window change with improved session management."""
+    def _handle_window_change(self, current_window, timestamp: Optional[datetime] = None):
+        """Handle window change with improved session management.
+        
+        ``timestamp`` is when the change happened; it defaults to now.
+        """
+        timestamp = timestamp or datetime.now()
         try:
             # End current session if it exists
             if self.current_session and self.session_start_time:
-                session_duration = (datetime.now() - self.session_start_time).total_seconds()
+                session_duration = (timestamp - self.session_start_time).total_seconds()
                 
                 # Only record sessions that meet minimum duration
                 if session_duration >= self.min_session_duration:
-                    self.db.end_session(self.current_session)
+                    self.db.end_session(self.current_session, timestamp)
+                    self._publish_totals()
                     
                     # Check if this was a focus session
                     if session_duration >= self.focus_threshold:
@@ -352,8 +635,8 @@ class ActivityTracker:
             # Start new session if we have a current window
             if current_window:
                 app_name, window_title = current_window
-                self.current_session = self.db.start_session(app_name, window_title)
-                self.session_start_time = datetime.now()
+                self.current_session = self.db.start_session(app_name, window_title, timestamp)
+                self.session_start_time = timestamp
                 
                 # Initialize session data
                 self.session_data = {
@@ -364,10 +647,17 @@ class ActivityTracker:
                     'idle_time': 0
                 }
                 
+                self.events.publish('focus', {
+                    'current_window': current_window,
+                    'session_start': timestamp.isoformat()
+                })
                 logger.debug(f"New session started: {app_name} - {window_title}")
         
         except Exception as e:
             logger.error(f"Error handling window change: {e}")
+        
+        self._update_state(current_window=current_window, session_id=self.current_session,
+                           session_start=self.session_start_time)
     
     def _handle_idle_state(self, is_idle):
         """Handle idle state changes."""
@@ -394,6 +684,27 @@ class ActivityTracker:
             self.current_session = None
             self.session_start_time = None
             self.session_data = {}
+            self._update_state(session_id=None, session_start=None)
+            self._publish_totals()
+    
+    def _update_state(self, **changes):
+        """Swap in a new state snapshot with ``changes`` applied."""
+        with self._state_lock:
+            self.state = self.state._replace(updated_at=datetime.now(), **changes)
+    
+    def _publish_tick(self):
+        """Publish tracking status and the current session's elapsed time."""
+        if self.events.has_subscribers():
+            self.events.publish('tick', self.get_live_status())
+    
+    def _publish_totals(self):
+        """Publish today's totals after a session has been written."""
+        if not self.events.has_subscribers():
+            return
+        try:
+            self.events.publish('totals', self.db.get_daily_stats())
+        except Exception as e:
+            logger.error(f"Error publishing daily totals: {e}")
     
     def _record_focus_session(self, duration):
         """Record a focus session for productivity tracking."""
@@ -438,11 +749,33 @@ class ActivityTracker:
         
         return stats
     
+    def get_live_status(self) -> Dict:
+        """Get tracking status from the state snapshot."""
+        state = self.state
+        session_duration = 0
+        if state.tracking and state.session_start:
+            session_duration = (datetime.now() - state.session_start).total_seconds()
+        
+        return {
+            'tracking': state.tracking,
+            'current_window': state.current_window,
+            'session_duration': session_duration,
+            'is_idle': state.is_idle
+        }
+    
     def get_current_window(self) -> Optional[Tuple[str, str]]:
-        """Get current active window information."""
+        """Get the active window as last observed by the tracker thread."""
+        return self.state.current_window
+    
+    def refresh_state(self) -> TrackerState:
+        """Query the window system once and update the snapshot.
+        
+        For callers such as the CLI that need the current window while the
+        tracker thread is not running.
+        """
         if self.tracker:
-            return self.tracker.get_active_window()
-        return None
+            self._update_state(current_window=self.tracker.get_active_window())
+        return self.state
     
     def is_tracking(self) -> bool:
         """Check if tracking is currently active."""
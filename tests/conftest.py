@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+# Importing the application creates its global database and config under
+# HOME, so point it at a scratch directory before any test imports them
+os.environ['HOME'] = os.environ['USERPROFILE'] = tempfile.mkdtemp(prefix='aw-tests-')
+
+@pytest.fixture
+def db(tmp_path):
+    """An empty ActivityDatabase in a temporary directory."""
+    import database
+    activity_db = database.ActivityDatabase(tmp_path / 'activity.db', archive_dir=tmp_path / 'archive')
+    yield activity_db
+    activity_db.close()
+
+ROLLUP_STATE_TABLES = ['hourly_rollups', 'daily_rollups', 'hourly_usage', 'session_lengths']
+
+@pytest.fixture
+def rollup_state():
+    """Function returning every rollup row of a database, floats rounded, for comparison."""
+    def state(activity_db):
+        with activity_db.pool.reader() as conn:
+            return {
+                table: sorted(
+                    tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+                    for row in conn.execute(f'SELECT * FROM {table}')
+                )
+                for table in ROLLUP_STATE_TABLES
+            }
+    return state
\ No newline at end of file
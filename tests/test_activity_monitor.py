@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import time
+
+import pytest
+
+from activity_monitor import ActivityRingBuffer, SampleMerger
+
+START = datetime(2026, 3, 2, 9, 0, 0)
+INTERVAL = 5
+
+def sample(tick, app='code', title='main.py', is_idle=False, intensity=0.5, cpu=10.0):
+    return {
+        'timestamp': START + timedelta(seconds=tick * INTERVAL),
+        'app_name': app, 'window_title': title, 'duration': 0,
+        'url': None, 'file_path': None, 'category': 'development', 'productivity_score': 0.9,
+        'activity_intensity': intensity, 'is_idle': is_idle,
+        'cpu_percent': cpu, 'memory_percent': 20.0, 'idle_time': 0.0
+    }
+
+@pytest.fixture
+def merged():
+    rows = []
+    merger = SampleMerger(rows.append, max_gap=2 * INTERVAL, max_duration=300)
+    return merger, rows
+
+def test_identical_ticks_merge_into_one_averaged_run(merged):
+    merger, rows = merged
+    for tick, intensity in enumerate([0.2, 0.4, 0.6]):
+        merger.add(sample(tick, intensity=intensity, cpu=10.0 * (tick + 1)), INTERVAL)
+    assert rows == []
+    
+    merger.flush()
+    assert len(rows) == 1
+    assert rows[0]['timestamp'] == START
+    assert rows[0]['samples'] == 3
+    assert rows[0]['duration'] == 15
+    assert rows[0]['activity_intensity'] == pytest.approx(0.4)
+    assert rows[0]['cpu_percent'] == pytest.approx(20.0)
+
+@pytest.mark.parametrize('change', [{'app': 'firefox'}, {'title': 'utils.py'}, {'is_idle': True}])
+def test_changed_key_closes_run_at_the_new_tick(merged, change):
+    merger, rows = merged
+    merger.add(sample(0), INTERVAL)
+    merger.add(sample(1), INTERVAL)
+    merger.add(sample(2, **change), INTERVAL)
+    
+    assert len(rows) == 1
+    assert (rows[0]['samples'], rows[0]['duration']) == (2, 10)
+    
+    merger.flush()
+    assert len(rows) == 2
+    assert rows[1]['timestamp'] == START + timedelta(seconds=10)
+    assert (rows[1]['samples'], rows[1]['duration']) == (1, INTERVAL)
+
+def test_gap_closes_run_at_its_last_tick(merged):
+    merger, rows = merged
+    merger.add(sample(0), INTERVAL)
+    merger.add(sample(1), INTERVAL)
+    merger.add(sample(10), INTERVAL)
+    
+    assert (rows[0]['samples'], rows[0]['duration']) == (2, 10)
+
+def test_long_run_is_split_at_max_duration(merged):
+    merger, rows = merged
+    for tick in range(300 // INTERVAL + 1):
+        merger.add(sample(tick), INTERVAL)
+    
+    assert len(rows) == 1
+    assert rows[0]['duration'] == 300
+
+def test_flush_without_open_run_emits_nothing(merged):
+    merger, rows = merged
+    merger.flush()
+    assert rows == []
+
+def test_ring_buffer_overwrites_oldest_samples():
+    buffer = ActivityRingBuffer(capacity=3)
+    now = time.time()
+    for n in range(5):
+        buffer.append(now - 5 + n, n / 10, n % 2 == 1, 0.0, float(n), 0.0)
+    
+    assert len(buffer) == 3
+    assert buffer.latest()['cpu_percent'] == 4.0
+    assert buffer.summary(60)['samples'] == 3
+    assert buffer.mean_intensity(60) == pytest.approx(0.3)
+
+def test_ring_buffer_windows_only_recent_samples():
+    buffer = ActivityRingBuffer(capacity=10)
+    now = time.time()
+    buffer.append(now - 120, 1.0, True, 0.0, 0.0, 0.0)
+    buffer.append(now - 1, 0.2, False, 0.0, 0.0, 0.0)
+    
+    assert buffer.summary(60)['samples'] == 1
+    assert buffer.idle_fraction(60) == 0.0
+    assert buffer.idle_fraction(300) == 0.5
+    
+    buffer.clear()
+    assert buffer.latest() is None
+    assert buffer.summary(60)['samples'] == 0
\ No newline at end of file
@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from categorizer import ActivityCategorizer, DEFAULT_CATEGORY_RULES
+
+def test_keyword_inside_longer_keyword_still_matches():
+    rules = [{'category': 'notes', 'app': ['note']}] + DEFAULT_CATEGORY_RULES
+    categorizer = ActivityCategorizer(rules=rules)
+    assert categorizer.classify('notepad', 'x').category == 'notes'
+    assert categorizer.classify('note', 'x').category == 'notes'
+
+def test_overlapping_title_keywords():
+    rules = [
+        {'category': 'docs', 'title': ['read']},
+        {'category': 'other_docs', 'title': ['readme']}
+    ]
+    categorizer = ActivityCategorizer(rules=rules)
+    assert categorizer.classify('viewer', 'README.md').category == 'docs'
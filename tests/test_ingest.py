@@ -0,0 +1,58 @@
+import pytest
+
+from ingest import WriteBehindBuffer
+
+class FlakyStore:
+    """Flush target that fails a given number of times before accepting rows."""
+    
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.batches = []
+    
+    def write(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise IOError('disk is busy')
+        self.batches.append(list(rows))
+
+@pytest.fixture
+def make_buffer():
+    buffers = []
+    
+    def make(store, capacity=100):
+        # A large batch size and interval keep the flusher thread from writing on its own
+        buffer = WriteBehindBuffer(store.write, capacity=capacity, batch_size=1000, flush_interval=3600)
+        buffers.append(buffer)
+        return buffer
+    
+    yield make
+    for buffer in buffers:
+        buffer.stop(timeout=1)
+
+def test_failed_flush_requeues_batch_in_order(make_buffer):
+    store = FlakyStore(failures=1)
+    buffer = make_buffer(store)
+    for n in range(3):
+        buffer.put({'n': n})
+    
+    assert buffer.flush() == 0
+    assert buffer.failed_flushes == 1
+    assert buffer.depth() == 3
+    
+    buffer.put({'n': 3})
+    assert buffer.flush() == 4
+    assert store.batches == [[{'n': 0}, {'n': 1}, {'n': 2}, {'n': 3}]]
+    assert buffer.dropped == 0
+
+def test_requeue_drops_oldest_rows_beyond_capacity(make_buffer):
+    store = FlakyStore(failures=1)
+    buffer = make_buffer(store, capacity=3)
+    for n in range(3):
+        buffer.put({'n': n})
+    buffer.flush()
+    
+    # The failed batch fills the buffer again, so the next put drops its oldest row
+    buffer.put({'n': 3})
+    assert buffer.dropped == 1
+    buffer.flush()
+    assert store.batches == [[{'n': 1}, {'n': 2}, {'n': 3}]]
\ No newline at end of file
@@ -0,0 +1,110 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from timestamps import from_epoch_ms
+
+START = datetime(2025, 11, 3, 9, 0, 0, 250000)
+ROWS = 10
+
+def create_legacy_database(path):
+    """A database in the original layout: text timestamps and text app names."""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME NOT NULL, app_name TEXT NOT NULL,
+            window_title TEXT, duration INTEGER DEFAULT 0, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE app_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, app_name TEXT NOT NULL, window_title TEXT,
+            start_time DATETIME NOT NULL, end_time DATETIME, duration INTEGER DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE enhanced_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME NOT NULL, app_name TEXT NOT NULL,
+            window_title TEXT, duration INTEGER DEFAULT 0, url TEXT, file_path TEXT, category TEXT,
+            productivity_score REAL, activity_intensity REAL, is_idle BOOLEAN DEFAULT 0,
+            cpu_percent REAL, memory_percent REAL, idle_time REAL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+    for n in range(ROWS):
+        start = START + timedelta(minutes=10 * n)
+        end = start + timedelta(minutes=8)
+        app = ['code', 'firefox'][n % 2]
+        conn.execute('INSERT INTO activities (timestamp, app_name, window_title, duration) VALUES (?, ?, ?, ?)',
+                     (start.isoformat(' '), app, f'title {n}', 480))
+        conn.execute('''
+            INSERT INTO app_sessions (app_name, window_title, start_time, end_time, duration)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (app, f'title {n}', start.isoformat(' '), end.isoformat(' '), 480))
+        conn.execute('''
+            INSERT INTO enhanced_activities (timestamp, app_name, window_title, duration, category,
+                                             productivity_score, activity_intensity, is_idle)
+            VALUES (?, ?, ?, 5, 'development', 0.9, 0.5, 0)
+        ''', (start.isoformat(' '), app, f'title {n}'))
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def legacy_path(tmp_path, monkeypatch):
+    # Run the copy by hand instead of on the background thread
+    monkeypatch.setattr(database.ActivityDatabase, '_run_migration', lambda self: None)
+    path = tmp_path / 'legacy.db'
+    create_legacy_database(path)
+    return path
+
+def open_database(path):
+    return database.ActivityDatabase(path, archive_dir=path.parent / 'archive')
+
+def test_migration_resumes_from_saved_progress(legacy_path, rollup_state):
+    first = open_database(legacy_path)
+    with first.pool.reader() as conn:
+        assert set(first._legacy_tables(conn)) == set(database.RAW_TABLES)
+    
+    # Newest rows are copied first; progress is the lowest id copied so far
+    assert first._migrate_batch(batch_size=4)
+    assert first._migrate_batch(batch_size=4)
+    with first.pool.reader() as conn:
+        table = first._legacy_tables(conn)[0]
+        assert first._get_meta(conn, f'migration_{table}') == str(ROWS - 8 + 1)
+        assert conn.execute(f'SELECT MIN(id), COUNT(*) FROM {table}').fetchone() == (ROWS - 8 + 1, 8)
+    first.close()
+    
+    second = open_database(legacy_path)
+    with second.pool.reader() as conn:
+        assert second._get_meta(conn, f'migration_{table}') == str(ROWS - 8 + 1)
+    second.complete_migration()
+    
+    with second.pool.reader() as conn:
+        assert second._legacy_tables(conn) == []
+        assert second._get_meta(conn, 'schema_version') == str(database.SCHEMA_VERSION)
+        for raw_table in database.RAW_TABLES:
+            assert conn.execute(f'SELECT COUNT(*), COUNT(DISTINCT id) FROM {raw_table}').fetchone() == (ROWS, ROWS)
+        sessions = conn.execute('''
+            SELECT id, app_name, start_time, end_time FROM app_sessions_named ORDER BY id
+        ''').fetchall()
+    
+    for session_id, app, start_time, end_time in sessions:
+        start = START + timedelta(minutes=10 * (session_id - 1))
+        assert app == ['code', 'firefox'][(session_id - 1) % 2]
+        assert from_epoch_ms(start_time) == start
+        assert from_epoch_ms(end_time) == start + timedelta(minutes=8)
+    
+    migrated = rollup_state(second)
+    with second.pool.writer() as conn:
+        second._rebuild_rollups(conn)
+    assert migrated == rollup_state(second)
+    second.close()
+
+def test_new_rows_get_ids_above_legacy_rows(legacy_path):
+    activity_db = open_database(legacy_path)
+    session_id = activity_db.start_session('terminal', 'bash', datetime.now())
+    activity_db.complete_migration()
+    
+    assert session_id == ROWS + 1
+    with activity_db.pool.reader() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM app_sessions').fetchone()[0] == ROWS + 1
+    activity_db.close()
\ No newline at end of file
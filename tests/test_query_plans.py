@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from plans import check_plans, full_scans
+from run import database_calls
+from workload import populate
+
+DAYS = 7
+
+def test_full_scans_detects_table_scan(db):
+    with db.pool.reader() as conn:
+        assert full_scans(conn, 'SELECT * FROM app_sessions WHERE duration > 5')
+        assert not full_scans(conn, 'SELECT id FROM app_sessions WHERE start_time >= 0')
+
+def test_no_get_query_scans_a_whole_table(db):
+    populate(db, DAYS)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    top_app = db.get_top_apps(days=DAYS, limit=1)[0]['app_name']
+    
+    results = check_plans(db, database_calls(DAYS, today, top_app))
+    
+    assert 'get_enhanced_stats' in results
+    assert {name: scans for name, scans in results.items() if scans} == {}
\ No newline at end of file
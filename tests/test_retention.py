@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from retention import RetentionEngine
+
+DAYS = 6
+
+@pytest.fixture
+def history(db):
+    """Sessions and samples every 90 minutes over the last DAYS days."""
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=DAYS)
+    samples = []
+    for n in range(DAYS * 16):
+        t = start + timedelta(minutes=90 * n)
+        app = ['code', 'firefox', 'slack'][n % 3]
+        session_id = db.start_session(app, f'title {n % 5}', t)
+        db.end_session(session_id, t + timedelta(minutes=50 + n % 30))
+        samples.append({
+            'timestamp': t, 'app_name': app, 'window_title': f'title {n % 5}', 'duration': 3000,
+            'category': 'development', 'productivity_score': 0.8, 'activity_intensity': 0.05 * (n % 20),
+            'is_idle': n % 4 == 0, 'cpu_percent': 1.5 * n, 'memory_percent': 30.0, 'idle_time': 0.0,
+            'samples': 1 + n % 4
+        })
+    db.record_enhanced_activities(samples)
+    return db
+
+def engine_for(db, chunk_size=7):
+    return RetentionEngine(db, chunk_size=chunk_size, pause=0)
+
+def count(db, table, cutoff=None):
+    column = 'start_time' if table == 'app_sessions' else 'timestamp'
+    with db.pool.reader() as conn:
+        if cutoff is None:
+            return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        return conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {column} < ?',
+                            (int(cutoff.timestamp() * 1000),)).fetchone()[0]
+
+def test_purge_stops_between_chunks(history):
+    engine = engine_for(history, chunk_size=5)
+    cutoff = datetime.now() - timedelta(days=3, hours=5)
+    expired = count(history, 'app_sessions', cutoff)
+    total = count(history, 'app_sessions')
+    assert expired > 10
+    
+    checks = []
+    def should_stop():
+        checks.append(True)
+        return len(checks) >= 2
+    
+    assert engine.purge('app_sessions', cutoff, should_stop=should_stop) == 10
+    assert count(history, 'app_sessions') == total - 10
+    # The oldest rows go first
+    assert count(history, 'app_sessions', cutoff) == expired - 10
+    
+    assert engine.purge('app_sessions', cutoff) == expired - 10
+    assert count(history, 'app_sessions', cutoff) == 0
+
+def test_chunked_purge_keeps_rollups_equal_to_rebuild(history, rollup_state):
+    engine = engine_for(history)
+    # A cutoff inside a day leaves partly subtracted hourly and daily buckets
+    cutoff = datetime.now() - timedelta(days=2, hours=7)
+    assert engine.purge('app_sessions', cutoff) > 0
+    assert engine.purge('enhanced_activities', cutoff) > 0
+    purged = rollup_state(history)
+    
+    with history.pool.writer() as conn:
+        history._rebuild_rollups(conn)
+    assert purged['daily_rollups']
+    assert purged == rollup_state(history)
+
+def test_run_respects_table_policies_and_marks_completion(history):
+    history.archive.available = False
+    engine = engine_for(history)
+    assert engine.is_due()
+    
+    deleted = engine.run(days_to_keep=2)
+    assert deleted['app_sessions'] > 0 and deleted['enhanced_activities'] > 0
+    assert count(history, 'app_sessions', datetime.now() - timedelta(days=2)) == 0
+    assert not engine.is_due()
+
+def test_new_database_releases_freed_pages(db):
+    with db.pool.reader() as conn:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    
+    old = datetime.now() - timedelta(days=30)
+    db.record_enhanced_activities([
+        {'timestamp': old + timedelta(seconds=5 * n), 'app_name': 'code', 'window_title': f'file {n}.py',
+         'duration': 5, 'file_path': f'/home/user/project/file {n}.py'}
+        for n in range(3000)
+    ])
+    engine = engine_for(db, chunk_size=1000)
+    assert engine.purge('enhanced_activities', datetime.now()) == 3000
+    with db.pool.reader() as conn:
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] > 0
+    
+    assert engine.compact() > 0
+    with db.pool.reader() as conn:
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
\ No newline at end of file
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+START = datetime(2026, 3, 2, 8, 40, 0)
+
+def record_day(db, start):
+    """Sessions and samples spanning several clock hours and apps."""
+    apps = [('code', 'main.py'), ('firefox', 'Docs - https://docs.python.org'), ('slack', '#dev')]
+    t = start
+    for n in range(12):
+        app, title = apps[n % len(apps)]
+        length = timedelta(minutes=7 + 11 * (n % 4))
+        session_id = db.start_session(app, title, t)
+        db.end_session(session_id, t + length)
+        db.record_enhanced_activities([{
+            'timestamp': t, 'app_name': app, 'window_title': title, 'duration': int(length.total_seconds()),
+            'category': 'development' if app == 'code' else 'communication', 'productivity_score': 0.7,
+            'activity_intensity': 0.1 * (n % 10), 'is_idle': n % 5 == 0, 'cpu_percent': 3.0 * n,
+            'memory_percent': 40.0, 'idle_time': 0.0, 'samples': 1 + n % 3
+        }])
+        t += length + timedelta(seconds=30)
+
+def test_incremental_rollups_match_full_rebuild(db, rollup_state):
+    record_day(db, START)
+    record_day(db, START + timedelta(days=1))
+    # An open session is not in the rollups until it ends
+    db.start_session('code', 'open.py', START + timedelta(days=2))
+    incremental = rollup_state(db)
+    
+    with db.pool.writer() as conn:
+        db._rebuild_rollups(conn)
+    
+    assert incremental['daily_rollups']
+    assert incremental == rollup_state(db)
+
+def test_rollups_are_keyed_by_interned_app_ids(db):
+    record_day(db, START)
+    with db.pool.reader() as conn:
+        apps = conn.execute('''
+            SELECT DISTINCT apps.value FROM daily_rollups JOIN apps ON apps.id = daily_rollups.app_id
+        ''').fetchall()
+    assert sorted(app for (app,) in apps) == ['code', 'firefox', 'slack']
\ No newline at end of file